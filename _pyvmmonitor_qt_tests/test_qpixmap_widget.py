@@ -26,3 +26,174 @@ def test_qpixmap_widget(qtapi, qpixmap_widget):
     pixmap = QPixmap(20, 20)
     pixmap.fill(Qt.red)
     qpixmap_widget.pixmap = pixmap
+
+
+def test_create_tiled_brush(qtapi):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor
+    from pyvmmonitor_qt.qt_pixmap_widget import create_tiled_brush, create_tiled_pixmap
+
+    brush = create_tiled_brush(10)
+    assert create_tiled_brush(10) is brush  # Cached.
+    assert create_tiled_brush(10, colors=(Qt.white, Qt.gray)) is brush
+    assert create_tiled_brush(5) is not brush
+    assert create_tiled_brush(10, colors=(Qt.black, Qt.red)) is not brush
+
+    texture = brush.texture()
+    assert (texture.width(), texture.height()) == (20, 20)
+
+    hidpi_brush = create_tiled_brush(10, device_pixel_ratio=2.)
+    assert hidpi_brush is not brush
+    texture = hidpi_brush.texture()
+    assert (texture.width(), texture.height()) == (40, 40)
+    assert texture.devicePixelRatio() == 2.
+
+    image = create_tiled_pixmap(30, 30, 10).toImage()
+    assert (image.width(), image.height()) == (30, 30)
+    assert QColor(image.pixel(5, 5)) == QColor(Qt.gray)
+    assert QColor(image.pixel(15, 5)) == QColor(Qt.white)
+    assert QColor(image.pixel(15, 15)) == QColor(Qt.gray)
+    assert QColor(image.pixel(25, 15)) == QColor(Qt.white)
+
+
+def _create_progressive_widget_class():
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QImage, QPixmap
+    from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget
+
+    class _ProgressiveWidget(QPixmapWidget):
+
+        PROGRESSIVE_REGENERATION = True
+        REGENERATE_DELAY_IN_MS = 50
+
+        def __init__(self):
+            QPixmapWidget.__init__(self)
+            self.created_sizes = []
+            self.created_in_thread = False
+
+        def _create_pixmap(self):
+            self.created_sizes.append((self._w, self._h))
+            pixmap = QPixmap(self._w, self._h)
+            pixmap.fill(Qt.red)
+            return pixmap
+
+        def _create_image_factory(self):
+            if not self.created_in_thread:
+                return None
+
+            w, h = self._w, self._h
+
+            def create_image():
+                image = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+                image.fill(Qt.blue)
+                return image
+
+            return create_image
+
+    return _ProgressiveWidget
+
+
+def test_qpixmap_widget_progressive_regeneration(qtapi):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor
+    from pyvmmonitor_qt.qt_event_loop import process_queue
+
+    widget = _create_progressive_widget_class()()
+    try:
+        widget.resize(40, 40)
+        widget.grab()
+        assert widget.created_sizes == [(40, 40)]
+
+        # While resizing the last pixmap is just scaled.
+        for size in (50, 60, 80):
+            widget.resize(size, size)
+            widget.grab()
+        assert widget.created_sizes == [(40, 40)]
+        assert widget.pixmap.width() == 80
+
+        # And it's regenerated once after the resize settles.
+        qtapi.qWait(widget.REGENERATE_DELAY_IN_MS * 4)
+        assert widget.created_sizes == [(40, 40), (80, 80)]
+
+        # The regeneration may also be done in a worker thread.
+        widget.created_in_thread = True
+        widget.resize(100, 100)
+        widget.grab()
+        for _i in range(50):
+            qtapi.qWait(20)
+            process_queue()
+            if QColor(widget.pixmap.toImage().pixel(0, 0)) == QColor(Qt.blue):
+                break
+        else:
+            raise AssertionError('Pixmap not created in worker thread.')
+        assert widget.created_sizes == [(40, 40), (80, 80)]
+        assert widget.pixmap.width() == 100
+    finally:
+        widget.deleteLater()
+
+
+def test_qpixmap_widget_shared_hidpi_pixmap(qtapi):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QPixmapCache
+    from pyvmmonitor_qt.qt_pixmap_widget import (
+        QPixmapWidget, create_device_pixmap, get_pixmap_logical_size)
+
+    created = []
+
+    class _SharedWidget(QPixmapWidget):
+
+        device_pixel_ratio = 1.
+
+        def __init__(self, color):
+            QPixmapWidget.__init__(self)
+            self.color = color
+
+        @property
+        def _device_pixel_ratio(self):
+            return self.device_pixel_ratio
+
+        def _get_pixmap_cache_params(self):
+            return (self.color,)
+
+        def _create_pixmap(self):
+            created.append((self.color, self._w, self._h, self._device_pixel_ratio))
+            pixmap = create_device_pixmap(self._w, self._h, self._device_pixel_ratio)
+            pixmap.fill(Qt.GlobalColor(self.color))
+            return pixmap
+
+    QPixmapCache.clear()
+    widgets = [_SharedWidget(color) for color in (Qt.red, Qt.red, Qt.blue)]
+    try:
+        for widget in widgets:
+            widget.resize(30, 20)
+            widget.grab()
+
+        # The widgets with the same params share the pixmap.
+        assert created == [(Qt.red, 30, 20, 1.), (Qt.blue, 30, 20, 1.)]
+        assert widgets[0].pixmap.cacheKey() == widgets[1].pixmap.cacheKey()
+        assert widgets[0].pixmap.cacheKey() != widgets[2].pixmap.cacheKey()
+
+        # A different device pixel ratio (i.e.: moved to another screen) regenerates it with the
+        # physical size (but with the same logical size).
+        widgets[0].device_pixel_ratio = 2.
+        widgets[0].grab()
+        assert created[-1] == (Qt.red, 30, 20, 2.)
+        pixmap = widgets[0].pixmap
+        assert (pixmap.width(), pixmap.height()) == (60, 40)
+        assert get_pixmap_logical_size(pixmap) == (30, 20)
+        assert widgets[0]._pixmap_offset == (0, 0)
+
+        widgets[1].device_pixel_ratio = 2.
+        widgets[1].grab()
+        assert len(created) == 3
+        assert widgets[1].pixmap.cacheKey() == pixmap.cacheKey()
+
+        # If the pixmap is evicted from the cache (i.e.: due to the cache limit), it's recreated.
+        QPixmapCache.clear()
+        widgets[1].resize(40, 20)
+        widgets[1].grab()
+        assert created[-1] == (Qt.red, 40, 20, 2.)
+    finally:
+        for widget in widgets:
+            widget.deleteLater()
+        QPixmapCache.clear()
@@ -0,0 +1,55 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+def test_animation_clock(qtapi):
+    from pyvmmonitor_qt.qt_animation_clock import AnimationClock
+
+    clock = AnimationClock()
+    frames = []
+
+    class Animation(object):
+
+        def on_frame(self, frame_time):
+            frames.append(frame_time)
+            if len(frames) == 2:
+                clock.remove_frame_callback(self.on_frame)
+
+    animation = Animation()
+    clock.add_frame_callback(animation.on_frame)
+    clock.add_frame_callback(animation.on_frame)  # Only added once.
+    assert clock.is_running()
+
+    clock.tick(1.0)
+    clock.tick(2.0)
+    clock.tick(3.0)
+    assert frames == [1.0, 2.0]
+    assert not clock.is_running()
+
+    # Only weak-references are kept.
+    clock.add_frame_callback(Animation().on_frame)
+    clock.tick(4.0)
+    assert frames == [1.0, 2.0]
+    assert not clock.is_running()
+
+
+def test_frame_time_counter():
+    from pyvmmonitor_qt.qt_animation_clock import FrameTimeCounter
+
+    counter = FrameTimeCounter(max_samples=4)
+    assert counter.get_fps() == 0
+    for frame_time in (0, 0.01, 0.02, 0.03, 0.05, 0.06):
+        counter.add_frame(frame_time)
+
+    assert counter.frames == 6
+    assert [round(t, 6) for t in counter.get_frame_times()] == [0.01, 0.01, 0.02, 0.01]
+    assert round(counter.get_fps(), 6) == 80.
+    assert round(counter.get_percentile(100), 6) == 0.02
+    assert round(counter.get_percentile(0), 6) == 0.01
+
+    counter.clear()
+    assert counter.get_frame_times() == []
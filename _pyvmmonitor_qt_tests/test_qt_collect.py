@@ -0,0 +1,70 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+class _Node(object):
+    pass
+
+
+def test_leak_analysis_growth(qtapi):
+    from pyvmmonitor_core.callback import Callback
+    from pyvmmonitor_qt.qt.QtCore import QObject
+    from pyvmmonitor_qt.qt_collect import LeakAnalysis
+
+    analysis = LeakAnalysis()
+    baseline = analysis.take_snapshot()
+
+    keep = [QObject() for _i in range(5)], [Callback() for _i in range(3)]
+    report = analysis.create_report(baseline)
+
+    assert report['focus_growth']['qt'] >= 5
+    assert report['focus_growth']['callback'] >= 3
+    assert report['growth']['pyvmmonitor_core.callback.Callback'] >= 3
+
+    with pytest.raises(AssertionError):
+        analysis.assert_no_growth(report)
+
+    analysis.assert_no_growth(report, max_growth={'tree_node': 0})
+    del keep
+
+
+def test_leak_analysis_cycles(qtapi, tmpdir):
+    import gc
+    import json
+    from pyvmmonitor_qt.qt_collect import GarbageCollector, LeakAnalysis
+
+    output_path = str(tmpdir.join('leaks.jsonl'))
+    collector = GarbageCollector()
+    collector.threshold = (0, 0, 0)
+    collector.leak_analysis = LeakAnalysis(output_path)
+
+    # Don't report the garbage left by previous tests.
+    gc.collect()
+
+    for _i in range(3):
+        node1 = _Node()
+        node2 = _Node()
+        node1.other = node2
+        node2.other = node1
+    del node1
+    del node2
+
+    collector.check()
+    assert not gc.garbage
+
+    with open(output_path, 'r') as stream:
+        reports = [json.loads(line) for line in stream.readlines()]
+    assert len(reports) == 1
+
+    node_name = '%s._Node' % (__name__,)
+    # The same cycles are reported only once (with the number of times it was found).
+    node_cycles = [cycle for cycle in reports[0]['cycles']
+                   if cycle['chain'][0] == node_name and cycle['chain'][-1] == node_name]
+    assert len(node_cycles) == 1
+    assert node_cycles[0]['count'] == 3
@@ -0,0 +1,399 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import benchmark
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+@pytest.fixture
+def view(qtapi):
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+    view = ZoomableGraphicsView()
+    view.show()
+    yield view
+    view.hide()
+    view.deleteLater()
+    view = None
+
+
+def test_cached_pens_and_brushes(qtapi):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+    from pyvmmonitor_qt.qt_graphics_items import get_cached_brush, get_cached_pen
+
+    color = QColor(Qt.red)
+    brush = get_cached_brush(color, 100)
+    assert color.alpha() == 255  # The passed color must not be changed.
+    assert brush.color().alpha() == 100
+    assert get_cached_brush(QColor(Qt.red), 100) is brush
+    assert get_cached_brush(QColor(Qt.red), 101) is not brush
+
+    pen = QPen(QColor(Qt.blue))
+    pen.setWidth(2)
+    cached_pen = get_cached_pen(pen)
+    assert cached_pen == pen
+    assert cached_pen is not pen
+    assert get_cached_pen(QPen(pen)) is cached_pen
+
+    pen.setWidth(3)
+    assert get_cached_pen(pen) is not cached_pen
+    assert get_cached_pen(None) is get_cached_pen(None)
+
+
+def test_cached_pens_and_brushes_lru(qtapi, monkeypatch):
+    from collections import OrderedDict
+
+    from pyvmmonitor_qt import qt_graphics_items
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+    from pyvmmonitor_qt.qt_graphics_items import get_cached_brush, get_cached_pen
+
+    monkeypatch.setattr(qt_graphics_items, '_MAX_CACHED_PENS_AND_BRUSHES', 3)
+    monkeypatch.setattr(qt_graphics_items, '_cached_pens', OrderedDict())
+    monkeypatch.setattr(qt_graphics_items, '_cached_brushes', OrderedDict())
+
+    brushes = [get_cached_brush(QColor(Qt.red), alpha) for alpha in range(3)]
+    pens = [get_cached_pen(QPen(QColor(Qt.blue), width)) for width in range(3)]
+
+    # Use the first ones so that the second ones are the least recently used.
+    assert get_cached_brush(QColor(Qt.red), 0) is brushes[0]
+    assert get_cached_pen(QPen(QColor(Qt.blue), 0)) is pens[0]
+
+    # Only the least recently used entry is evicted (the cache isn't cleared).
+    get_cached_brush(QColor(Qt.red), 3)
+    get_cached_pen(QPen(QColor(Qt.blue), 3))
+    assert len(qt_graphics_items._cached_brushes) == 3
+    assert len(qt_graphics_items._cached_pens) == 3
+
+    assert get_cached_brush(QColor(Qt.red), 0) is brushes[0]
+    assert get_cached_brush(QColor(Qt.red), 2) is brushes[2]
+    assert get_cached_brush(QColor(Qt.red), 1) is not brushes[1]
+
+    assert get_cached_pen(QPen(QColor(Qt.blue), 0)) is pens[0]
+    assert get_cached_pen(QPen(QColor(Qt.blue), 2)) is pens[2]
+    assert get_cached_pen(QPen(QColor(Qt.blue), 1)) is not pens[1]
+
+
+def test_hover_shares_pens_and_brushes(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+    from pyvmmonitor_qt.qt_graphics_items import (
+        _before_hover_enter_event, _before_hover_leave_event,
+        create_fixed_pixels_graphics_item_circle)
+
+    items = []
+    for i in range(2):
+        item = create_fixed_pixels_graphics_item_circle(
+            (i * 10, 0), 5, fill_color=QColor(Qt.red), graphics_widget=view)
+        item.configure_hover(QPen(QColor(Qt.yellow)), QColor(Qt.green), hover_alpha=200)
+        view.scene().addItem(item)
+        items.append(item)
+
+    # The style is shared among items.
+    assert items[0]._state.regular_style is items[1]._state.regular_style
+    assert items[0]._state.hover_style is items[1]._state.hover_style
+    assert items[0]._state.hover_style.qbrush is items[1]._state.hover_style.qbrush
+
+    item = items[0]
+    _before_hover_enter_event(item, None)
+    assert item.brush().color() == QColor(0, 255, 0, 200)
+    _before_hover_leave_event(item, None)
+    assert item.brush().color() == QColor(255, 0, 0, 200)
+
+
+def test_callbacks_created_lazily(qtapi, view):
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_square
+
+    item = create_fixed_pixels_graphics_item_square((0, 0), 5, graphics_widget=view)
+    assert item._state.on_mouse_press is None
+    assert not item.accept_mouse_press(None)
+
+    on_mouse_press = item.on_mouse_press
+    assert item._state.on_mouse_press is on_mouse_press
+    assert item.on_mouse_press is on_mouse_press
+
+    item.accept_mouse_press = lambda event: True
+    assert item.accept_mouse_press(None)
+
+
+# Number of handles created in the memory benchmark.
+_MEMORY_BENCHMARK_HANDLES = 100000
+
+
+@benchmark
+@pytest.mark.parametrize('create_item_name', [
+    'create_fixed_pixels_graphics_item_circle',
+    'create_fixed_pixels_graphics_item_square',
+])
+def test_memory_benchmark_handles(qtapi, view, create_item_name):
+    import tracemalloc
+    from pyvmmonitor_qt import qt_graphics_items
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+
+    create_item = getattr(qt_graphics_items, create_item_name)
+    hover_pen = QPen(QColor(Qt.yellow))
+
+    tracemalloc.start()
+    try:
+        initial_memory = tracemalloc.get_traced_memory()[0]
+        items = []
+        for i in range(_MEMORY_BENCHMARK_HANDLES):
+            item = create_item((i, i), 5, graphics_widget=view)
+            item.configure_hover(hover_pen)
+            items.append(item)
+        memory_per_item = (
+            tracemalloc.get_traced_memory()[0] - initial_memory) / float(len(items))
+    finally:
+        tracemalloc.stop()
+
+    assert memory_per_item < 1500, '%s: %.1f bytes (python) per item' % (
+        create_item_name, memory_per_item)
+
+
+def test_graphics_handles(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_handles
+
+    handles = create_fixed_pixels_graphics_handles(5, graphics_widget=view)
+    handles.set_handles([(0, 0), (100, 0), (100, 100)])
+    view.scene().addItem(handles)
+    assert handles.get_handles_count() == 3
+
+    assert handles.handle_at((1, 1)) == 0
+    assert handles.handle_at((99, 99)) == 2
+    assert handles.handle_at((50, 50)) is None
+    assert handles.handle_at((8, 0)) is None
+    assert handles.handle_at((8, 0), tolerance_in_px=3) == 0
+
+    # At zoom 2 the same handles (in pixels) are smaller in the scene.
+    view.zoom_to(2.0)
+    assert handles.handle_at((2, 0)) == 0
+    assert handles.handle_at((3, 0)) is None
+
+    index = handles.add_handle((50, 50), fill_color=QColor(Qt.red))
+    assert index == 3
+    assert handles.handle_at((50, 50)) == 3
+
+    handles.set_handle_center(3, (200, 200))
+    assert handles.get_handle_center(3) == (200, 200)
+    assert handles.handle_at((50, 50)) is None
+    assert handles.handle_at((200, 200)) == 3
+    assert handles.boundingRect().contains(200, 200)
+
+    hovered = []
+    handles.configure_hover(QPen(QColor(Qt.yellow)), hover_radius_in_px=10)
+
+    def on_enter_hover(item, index):
+        hovered.append(('enter', index))
+
+    def on_leave_hover(item, index):
+        hovered.append(('leave', index))
+
+    handles.on_enter_hover.register(on_enter_hover)
+    handles.on_leave_hover.register(on_leave_hover)
+    handles._set_hover_index(handles.handle_at((100, 0)))
+    # The hovered handle uses the hover radius.
+    assert handles.handle_at((104, 0)) == 1
+    handles._set_hover_index(None)
+    assert hovered == [('enter', 1), ('leave', 1)]
+
+    # Just check that painting works.
+    view.grab()
+
+
+def test_graphics_handles_max_radius(qtapi, view):
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_handles
+
+    handles = create_fixed_pixels_graphics_handles(5, graphics_widget=view)
+    handles.set_handles([(0, 0), (100, 0)])
+    view.scene().addItem(handles)
+    initial_rect = handles.boundingRect()
+    assert handles._get_max_radius_in_px() == 5
+
+    # Growing a handle grows the bounding rect.
+    handles.set_handle_radius_in_px(1, 20)
+    assert handles._get_max_radius_in_px() == 20
+    assert handles.boundingRect().contains(118, 0)
+    assert handles.handle_at((115, 0)) == 1
+
+    # Lowering the biggest handle recomputes the max.
+    handles.set_handle_radius_in_px(1, 5)
+    assert handles._get_max_radius_in_px() == 5
+    assert handles.boundingRect() == initial_rect
+    assert handles.handle_at((115, 0)) is None
+
+    handles.add_handle((50, 50), radius_in_px=30)
+    assert handles._get_max_radius_in_px() == 30
+    assert handles.boundingRect().contains(50, 78)
+
+    handles.set_handles([(0, 0)], radii_in_px=[3])
+    assert handles._get_max_radius_in_px() == 3
+
+
+def test_graphics_handles_stamps(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import QRectF, Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QImage, QPainter
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_handles
+
+    handles = create_fixed_pixels_graphics_handles(
+        5, graphics_widget=view, fill_color=QColor(Qt.red))
+    handles.set_handles([(0, 0), (100, 0)])
+    view.scene().addItem(handles)
+
+    # On HiDPI devices the stamps have the pixels of the device (so, they aren't upscaled).
+    image = QImage(400, 200, QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(2.)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    try:
+        view.scene().render(painter, QRectF(0, 0, 200, 100), QRectF(-50, -50, 200, 100))
+    finally:
+        painter.end()
+
+    assert [key[3] for key in handles._stamps] == [2.]
+    pixmap, offset = list(handles._stamps.values())[0]
+    assert pixmap.devicePixelRatio() == 2.
+    assert pixmap.width() == int(offset * 2 * 2)
+    assert QColor(image.pixel(100, 100)).red() == 255
+
+    # The stamps are bounded (the least recently used are removed).
+    max_stamps = handles.MAX_CACHED_STAMPS
+    for i in range(max_stamps + 10):
+        handles._get_stamp(5, QColor(i, 0, 0).rgba(), False)
+    assert len(handles._stamps) == max_stamps
+    assert (5, QColor(max_stamps + 9, 0, 0).rgba(), False, 1.0) in handles._stamps
+
+
+def test_view_spatial_index(qtapi, view):
+    import gc
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsEllipseItem, QGraphicsItem
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+
+    items = []
+    for i in range(3):
+        item = create_fixed_pixels_graphics_item_circle((i * 100, 0), 5, graphics_widget=view)
+        item.setFlag(QGraphicsItem.ItemIsSelectable)
+        view.scene().addItem(item)
+        items.append(item)
+
+    spatial_index = view.get_spatial_index()
+    assert spatial_index.nearest((3, 0), tolerance_px=5) is items[0]
+    assert spatial_index.nearest((7, 0), tolerance_px=5) is None
+    assert view.snap_to_items((97, 2)) == (100, 0)
+    assert view.snap_to_items((50, 50)) == (50, 50)
+
+    # The tolerance is in pixels (so, at zoom 2 it's half the size in the scene).
+    view.zoom_to(2.0)
+    assert spatial_index.nearest((3, 0), tolerance_px=5) is None
+    assert spatial_index.nearest((2, 0), tolerance_px=5) is items[0]
+
+    # Moving the item updates the index.
+    items[2].set_center((300, 300))
+    assert spatial_index.nearest((300, 300), tolerance_px=1) is items[2]
+    # At zoom 2 the default tolerance (8px) is 4 in the scene.
+    assert [item for _dist, item in view.get_items_near((103, 0))] == [items[1]]
+    assert view.get_items_near((200, 0)) == []
+
+    # Items which were garbage-collected are removed from the index when found in a query.
+    dead_item = QGraphicsEllipseItem(0, 0, 1, 1)
+    spatial_index.update_item(dead_item, (1, 0))
+    del dead_item
+    gc.collect()
+    indexed = len(spatial_index)
+    assert spatial_index.nearest((2, 0), tolerance_px=5) is items[0]
+    assert len(spatial_index) == indexed - 1
+
+    selected = view.select_items_in_scene_rect(-10, -10, 120, 20)
+    assert set(selected) == set([items[0], items[1]])
+    assert items[0].isSelected()
+    assert not items[2].isSelected()
+
+    # Items removed from the scene are no longer reported.
+    view.scene().removeItem(items[0])
+    assert spatial_index.nearest((0, 0), tolerance_px=5) is None
+
+
+def test_view_indexed_rubber_band_selection(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import QEvent, QPointF, Qt
+    from pyvmmonitor_qt.qt.QtGui import QMouseEvent
+    from pyvmmonitor_qt.qt.QtTest import QTest
+    from pyvmmonitor_qt.qt.QtWidgets import (
+        QApplication, QGraphicsItem, QGraphicsRectItem, QGraphicsView)
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+
+    items = []
+    for i in range(3):
+        item = create_fixed_pixels_graphics_item_circle((i * 100, 0), 5, graphics_widget=view)
+        item.setFlag(QGraphicsItem.ItemIsSelectable)
+        view.scene().addItem(item)
+        items.append(item)
+
+    # Not in the spatial index (so, not selected by the indexed rubber band).
+    not_indexed = QGraphicsRectItem(40, -10, 20, 20)
+    not_indexed.setFlag(QGraphicsItem.ItemIsSelectable)
+    view.scene().addItem(not_indexed)
+
+    view.INDEXED_RUBBER_BAND_SELECTION = True
+    view.setDragMode(QGraphicsView.RubberBandDrag)
+    view.resize(400, 200)
+    view.centerOn(100, 0)
+
+    viewport = view.viewport()
+
+    def drag_to(x, y):
+        pos = view.mapFromScene(x, y)
+        QApplication.sendEvent(viewport, QMouseEvent(
+            QEvent.MouseMove, QPointF(pos), QPointF(viewport.mapToGlobal(pos)),
+            Qt.NoButton, Qt.LeftButton, Qt.NoModifier))
+
+    start = view.mapFromScene(-20, -30)
+    QTest.mousePress(viewport, Qt.LeftButton, Qt.NoModifier, start)
+    assert view._rubber_band_selection is not None
+
+    drag_to(150, 30)
+    assert [item.isSelected() for item in items] == [True, True, False]
+    assert not not_indexed.isSelected()
+
+    # Shrinking the rubber band unselects the items which are no longer inside it.
+    drag_to(70, 30)
+    assert [item.isSelected() for item in items] == [True, False, False]
+
+    QTest.mouseRelease(viewport, Qt.LeftButton, Qt.NoModifier, view.mapFromScene(250, 30))
+    assert view._rubber_band_selection is None
+    assert [item.isSelected() for item in items] == [True, True, True]
+    assert not not_indexed.isSelected()
+
+    # A new rubber band replaces the selection (and with ctrl it extends it).
+    QTest.mousePress(viewport, Qt.LeftButton, Qt.NoModifier, view.mapFromScene(80, -30))
+    QTest.mouseRelease(viewport, Qt.LeftButton, Qt.NoModifier, view.mapFromScene(120, 30))
+    assert [item.isSelected() for item in items] == [False, True, False]
+
+    QTest.mousePress(viewport, Qt.LeftButton, Qt.ControlModifier, view.mapFromScene(180, -30))
+    QTest.mouseRelease(viewport, Qt.LeftButton, Qt.ControlModifier, view.mapFromScene(220, 30))
+    assert [item.isSelected() for item in items] == [False, True, True]
+
+
+def test_path_item_simplified_on_zoom(qtapi, view):
+    import numpy
+    from pyvmmonitor_qt.qt_graphics_items import create_graphics_path_item
+
+    xs = numpy.linspace(0, 100, 20000)
+    item = create_graphics_path_item(graphics_widget=view)
+    item.set_path_from_array(numpy.column_stack((xs, numpy.sin(xs) * 10)))
+    view.scene().addItem(item)
+
+    view.zoom_to(0.1)
+    zoomed_out_count = item.path().elementCount()
+    view.zoom_to(300)
+    assert item.path().elementCount() == len(xs) + 1
+    assert zoomed_out_count < len(xs) / 10
+
+    item.set_path_from_array(numpy.column_stack((xs, xs)), simplify=False)
+    view.zoom_to(0.1)
+    assert item.path().elementCount() == len(xs) + 1
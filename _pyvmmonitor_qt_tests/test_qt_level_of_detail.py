@@ -0,0 +1,41 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+
+
+def test_level_of_detail_policy():
+    from pyvmmonitor_qt.qt_level_of_detail import (
+        LOD_FULL, LOD_HIDDEN, LOD_SIMPLIFIED, LevelOfDetailPolicy, is_culled)
+
+    # The default policy doesn't change the painting (the level of detail is opt-in).
+    policy = LevelOfDetailPolicy()
+    assert policy.get_band(0.01).level == LOD_FULL
+    assert policy.get_band(0.01).antialiased
+
+    policy = LevelOfDetailPolicy(LevelOfDetailPolicy.LOW_ZOOM_BANDS)
+    assert policy.get_band(0.01).level != LOD_FULL
+    assert not policy.get_band(0.01).antialiased
+
+    policy = LevelOfDetailPolicy([
+        (0.1, LOD_SIMPLIFIED, False),
+        (0.5, LOD_FULL, True),
+    ])
+    assert policy.get_band(1.0).level == LOD_FULL
+    assert policy.get_band(0.5).level == LOD_FULL
+    assert policy.get_band(0.2).level == LOD_SIMPLIFIED
+    assert not policy.get_band(0.2).antialiased
+
+    # A band is added to cover the whole zoom range.
+    assert policy.get_band(0.05).level == LOD_FULL
+    assert policy.bands[-1].min_zoom == 0
+
+    policy = LevelOfDetailPolicy([(0.5, LOD_FULL, True), (0, LOD_HIDDEN, False)])
+    assert policy.get_band(0.05).level == LOD_HIDDEN
+    assert len(policy.bands) == 2
+
+    assert not is_culled(0, 0, 0.05, 1)
+    assert is_culled(0.1, 0, 0.05, 1)
+    assert is_culled(0, 2, 0.5, 3)
+    assert not is_culled(0, 2, 1, 3)
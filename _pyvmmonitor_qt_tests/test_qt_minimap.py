@@ -0,0 +1,100 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+@pytest.fixture
+def view(qtapi):
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+    view = ZoomableGraphicsView()
+    view.show()
+    yield view
+    view.hide()
+    view.deleteLater()
+    view = None
+
+
+def test_minimap(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import QEvent, QPoint, QPointF, Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QMouseEvent
+    from pyvmmonitor_qt.qt.QtTest import QTest
+    from pyvmmonitor_qt.qt.QtWidgets import QApplication
+    from pyvmmonitor_qt.qt_graphics_items import create_graphics_item_rect
+    from pyvmmonitor_qt.qt_minimap import MinimapWidget
+
+    view.resize(200, 200)
+    view.setSceneRect(0, 0, 1000, 1000)
+    view.centerOn(100, 100)
+
+    minimap = MinimapWidget(view)
+    minimap.resize(100, 100)
+    minimap.show()
+    minimap.grab()
+    assert minimap.full_renders == 1
+    assert minimap.get_image().width() == 100
+
+    # Changes in the scene only render the dirty regions (batched).
+    for i in range(5):
+        item = create_graphics_item_rect((600 + i * 10, 600, 10, 100), fill_color=QColor(Qt.red))
+        view.scene().addItem(item)
+    qtapi.qWait(0)  # Let the scene notify about the change.
+    minimap.update_cache()
+    assert minimap.full_renders == 1
+    assert minimap.partial_renders == 1
+    color = QColor(minimap.get_image().pixel(62, 65))
+    assert color.red() > 200 and color.green() == 0 and color.blue() == 0
+
+    # Moving the view doesn't render the cache again.
+    view.centerOn(500, 500)
+    minimap.grab()
+    assert (minimap.full_renders, minimap.partial_renders) == (1, 1)
+
+    # Clicking recenters the view.
+    QTest.mouseClick(minimap, Qt.LeftButton, Qt.NoModifier, QPoint(80, 30))
+    x0, y0, x1, y1 = view.get_scene_visible_rect()
+    assert abs((x0 + x1) / 2. - 800) < 15
+    assert abs((y0 + y1) / 2. - 300) < 15
+
+    # Dragging the visible rect moves the view by the dragged amount (the minimap is at 1/10 of
+    # the scene).
+    center_x, center_y = view.get_center()
+    x0, y0, _x1, _y1 = view.get_scene_visible_rect()
+    wx, wy = minimap.scene_to_widget(x0 + 20, y0 + 20)
+    start = QPoint(int(wx), int(wy))
+    QTest.mousePress(minimap, Qt.LeftButton, Qt.NoModifier, start)
+    end = start + QPoint(-20, 10)
+    QApplication.sendEvent(minimap, QMouseEvent(
+        QEvent.MouseMove, QPointF(end), QPointF(minimap.mapToGlobal(end)),
+        Qt.NoButton, Qt.LeftButton, Qt.NoModifier))
+    QTest.mouseRelease(minimap, Qt.LeftButton, Qt.NoModifier, end)
+    new_center_x, new_center_y = view.get_center()
+    assert abs(new_center_x - (center_x - 200)) < 15
+    assert abs(new_center_y - (center_y + 100)) < 15
+
+    # scene.changed is only connected while the minimap is visible (when connected Qt connects
+    # the view to it too).
+    scene = view.scene()
+    assert scene.receivers(scene.changed) == 2
+    minimap.hide()
+    assert scene.receivers(scene.changed) == 0
+
+    # Changes while hidden aren't tracked (so, it's fully rendered again when shown).
+    item.setPos(-100, 0)
+    qtapi.qWait(0)
+    minimap.show()
+    minimap.grab()
+    assert minimap.full_renders == 2
+    assert scene.receivers(scene.changed) == 2
+    item.setPos(0, 0)
+    qtapi.qWait(0)
+    assert scene.receivers(scene.changed) == 2
+
+    # Resizing renders everything again.
+    minimap.resize(50, 50)
+    minimap.grab()
+    assert minimap.full_renders == 3
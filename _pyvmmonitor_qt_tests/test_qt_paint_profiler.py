@@ -0,0 +1,108 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+@pytest.fixture
+def view(qtapi):
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+    view = ZoomableGraphicsView()
+    view.show()
+    yield view
+    view.hide()
+    view.deleteLater()
+    view = None
+
+
+def test_calculate_percentiles():
+    from pyvmmonitor_qt.qt_paint_profiler import (PERCENTILE_50, PERCENTILE_95, PERCENTILE_99,
+                                                  calculate_percentiles)
+
+    percentiles = calculate_percentiles(list(range(101)))
+    assert percentiles == {PERCENTILE_50: 50, PERCENTILE_95: 95, PERCENTILE_99: 99}
+    assert calculate_percentiles([])[PERCENTILE_99] == 0
+
+
+def test_paint_profiler():
+    from pyvmmonitor_qt.qt_paint_profiler import PERCENTILE_99, PaintProfiler
+
+    profiler = PaintProfiler(max_frames=3)
+    for i in range(4):
+        profiler.start_frame(dirty_area=100 * i)
+        profiler.add_section_time('drawBackground', 0.001)
+        for _j in range(i):
+            profiler.add_item_paint('Item', 0.002)
+        profiler.end_frame()
+
+    # Paints out of a frame are ignored.
+    profiler.add_item_paint('Item', 1)
+
+    frames = profiler.get_frames()
+    assert len(frames) == 3
+    assert [frame.items_painted for frame in frames] == [1, 2, 3]
+
+    stats = profiler.get_stats()
+    assert stats['frames'] == 3
+    assert stats['dirty_area'][PERCENTILE_99] == 300
+    assert stats['items_painted'][PERCENTILE_99] == 3
+    assert stats['sections']['drawBackground'][PERCENTILE_99] == 0.001
+    assert stats['item_classes']['Item']['count'] == 6
+    assert abs(stats['item_classes']['Item']['time'] - 0.012) < 1e-9
+    assert profiler.get_hud_lines()
+
+
+def test_paint_profiler_in_view(qtapi, view):
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+    from pyvmmonitor_qt.qt_paint_profiler import PERCENTILE_50, PaintProfiler
+
+    view.resize(200, 200)
+    view.setSceneRect(0, 0, 100, 100)
+    for i in range(10):
+        item = create_fixed_pixels_graphics_item_circle((i * 10, 50), 5, graphics_widget=view)
+        view.scene().addItem(item)
+
+    profiler = PaintProfiler()
+    view.set_paint_profiler(profiler)
+    view.grab()
+
+    stats = profiler.get_stats()
+    assert stats['frames'] >= 1
+    assert 'drawBackground' in stats['sections']
+    assert stats['items_painted'][PERCENTILE_50] == 10
+    assert stats['item_classes']['_CustomGraphicsEllipseItem']['count'] >= 10
+    assert stats['dirty_area'][PERCENTILE_50] > 0
+
+    view.set_paint_profiler(None)
+    frames = stats['frames']
+    view.grab()
+    assert profiler.get_stats()['frames'] == frames
+
+
+def test_paint_profiler_in_qpixmap_widget(qtapi):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QPixmap
+    from pyvmmonitor_qt.qt_paint_profiler import PaintProfiler
+    from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget
+
+    class _Widget(QPixmapWidget):
+
+        def _create_pixmap(self):
+            pixmap = QPixmap(self._w, self._h)
+            pixmap.fill(Qt.red)
+            return pixmap
+
+    widget = _Widget()
+    widget.resize(50, 50)
+    profiler = PaintProfiler()
+    widget.set_paint_profiler(profiler)
+    widget.grab()
+
+    stats = profiler.get_stats()
+    assert stats['frames'] == 1
+    assert 'create_pixmap' in stats['sections']
+    widget.deleteLater()
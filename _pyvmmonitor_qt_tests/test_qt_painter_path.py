@@ -0,0 +1,159 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+from pyvmmonitor_qt.pytest_plugin import benchmark
+
+
+def test_is_clockwise_array():
+    import numpy
+    from pyvmmonitor_core import math_utils
+    from pyvmmonitor_qt.qt_painter_path import is_clockwise_array
+
+    points = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    for pts in (points, list(reversed(points))):
+        assert is_clockwise_array(numpy.array(pts)) == math_utils.is_clockwise(pts)
+
+
+def test_create_painter_path_from_array():
+    import numpy
+    from pyvmmonitor_qt.qt_painter_path import (
+        create_painter_path_from_array, create_painter_path_from_points,
+        create_qpolygonf_from_array)
+
+    points = numpy.array([(0, 0), (10, 0), (10, 10), (0, 10)], dtype=numpy.float64)
+
+    def as_list(path):
+        return [(path.elementAt(i).x, path.elementAt(i).y) for i in range(path.elementCount())]
+
+    for clockwise in (None, True, False):
+        path = create_painter_path_from_array(points, clockwise)
+        assert as_list(path) == as_list(
+            create_painter_path_from_points(points.tolist(), clockwise))
+
+        polygon = create_qpolygonf_from_array(points, clockwise)
+        assert [(p.x(), p.y()) for p in polygon] == as_list(path)[:-1]
+
+    assert create_painter_path_from_array(numpy.empty((0, 2))).isEmpty()
+
+
+# Number of vertices in the painter path benchmark.
+_BENCHMARK_VERTICES = 1000000
+
+
+@benchmark
+def test_benchmark_create_painter_path_from_array():
+    import time
+    import numpy
+    from pyvmmonitor_qt.qt_painter_path import (
+        create_painter_path_from_array, create_painter_path_from_points)
+
+    points = numpy.random.random((_BENCHMARK_VERTICES, 2))
+    points_list = points.tolist()
+
+    initial_time = time.time()
+    path = create_painter_path_from_array(points, clockwise=True)
+    array_time = time.time() - initial_time
+    assert path.elementCount() == _BENCHMARK_VERTICES + 1
+
+    initial_time = time.time()
+    create_painter_path_from_points(points_list, clockwise=True)
+    points_time = time.time() - initial_time
+
+    print('from array: %.3fs from points: %.3fs' % (array_time, points_time))
+    # Locally creating it from the array is 8x+ faster.
+    assert array_time * 3 < points_time
+
+
+def _max_distance_to_polyline(points, polyline):
+    import numpy
+    min_dist_sq = numpy.full(len(points), numpy.inf)
+    for p0, p1 in zip(polyline[:-1], polyline[1:]):
+        segment = p1 - p0
+        len_sq = numpy.dot(segment, segment)
+        t = numpy.clip(numpy.dot(points - p0, segment) / len_sq, 0, 1) if len_sq else 0
+        diff = points - (p0 + numpy.multiply.outer(t, segment))
+        min_dist_sq = numpy.minimum(min_dist_sq, (diff ** 2).sum(axis=1))
+    return numpy.sqrt(min_dist_sq.max())
+
+
+def test_simplify_polyline_array():
+    import numpy
+    from pyvmmonitor_qt.qt_painter_path import simplify_polyline_array
+
+    xs = numpy.linspace(0, 100, 5000)
+    points = numpy.column_stack((xs, numpy.sin(xs) * 10))
+
+    for tolerance in (0.05, 0.5, 2):
+        simplified = simplify_polyline_array(points, tolerance)
+        assert len(simplified) < len(points)
+        assert tuple(simplified[0]) == tuple(points[0])
+        assert tuple(simplified[-1]) == tuple(points[-1])
+        assert _max_distance_to_polyline(points, simplified) <= tolerance
+
+    # A straight line is simplified to its extremes.
+    line = numpy.column_stack((xs, xs))
+    assert len(simplify_polyline_array(line, 0.1)) == 2
+
+
+def test_simplified_painter_paths():
+    import numpy
+    from pyvmmonitor_qt.qt_painter_path import SimplifiedPainterPaths
+
+    xs = numpy.linspace(0, 100, 20000)
+    points = numpy.column_stack((xs, numpy.sin(xs) * 10))
+    simplified_paths = SimplifiedPainterPaths(points, zoom_levels=(0.1, 1, 10))
+
+    full_count = simplified_paths.get_full_path().elementCount()
+    assert full_count == len(points) + 1
+    assert simplified_paths.get_path(0.05).elementCount() < \
+        simplified_paths.get_path(0.5).elementCount() < full_count
+    assert simplified_paths.get_path(0.5) is simplified_paths.get_path(1)  # Cached.
+    assert simplified_paths.get_path(50) is simplified_paths.get_full_path()
+    assert simplified_paths.get_path(10) is simplified_paths.get_full_path()
+
+
+def test_painter_path_cache():
+    import numpy
+    from pyvmmonitor_qt.qt_painter_path import (
+        PainterPathCache, create_painter_path_from_array, create_painter_path_from_points,
+        get_painter_path_cache)
+
+    cache = get_painter_path_cache()
+    cache.clear()
+
+    points = numpy.array([(0, 0), (10, 0), (10, 10)], dtype=numpy.float64)
+    path = create_painter_path_from_array(points)
+    assert cache.get_stats() == {'hits': 0, 'misses': 1, 'size': 1}
+
+    path2 = create_painter_path_from_array(points.copy())
+    assert cache.get_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+    assert path == path2
+
+    # Changing the returned path doesn't change the cached one.
+    path2.lineTo(20, 20)
+    assert create_painter_path_from_array(points) == path
+
+    create_painter_path_from_array(points, clockwise=True)
+    assert cache.get_stats()['misses'] == 2
+
+    # Sequences of points are keyed by a digest of the coordinates.
+    create_painter_path_from_points([(0, 0), (10, 0), (10, 10)])
+    assert cache.get_stats()['misses'] == 3
+    create_painter_path_from_points(iter([[0., 0.], [10., 0.], [10., 10.]]))
+    assert cache.get_stats() == {'hits': 3, 'misses': 3, 'size': 3}
+    assert all(len(repr(key)) < 200 for key in cache._cache)
+
+    # Long sequences aren't cached.
+    create_painter_path_from_points(
+        [(i, 0) for i in range(PainterPathCache.MAX_CACHED_SEQUENCE_POINTS + 1)])
+    assert cache.get_stats() == {'hits': 3, 'misses': 3, 'size': 3}
+
+    cache = PainterPathCache(max_size=2)
+    from pyvmmonitor_qt.qt.QtGui import QPainterPath
+    for i in range(3):
+        cache.get(i, QPainterPath)
+    assert len(cache) == 2
+    cache.get(0, QPainterPath)
+    assert cache.get_stats() == {'hits': 0, 'misses': 4, 'size': 2}
@@ -0,0 +1,138 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+@pytest.fixture
+def view(qtapi):
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+    view = ZoomableGraphicsView()
+    view.show()
+    yield view
+    view.hide()
+    view.deleteLater()
+    view = None
+
+
+def _create_array(width, height):
+    import numpy
+    arr = numpy.zeros((height, width, 4), dtype=numpy.uint8)
+    arr[:, :, 0] = 255
+    arr[:, :, 3] = 255
+    return arr
+
+
+def test_image_pyramid(qtapi):
+    import numpy
+    from pyvmmonitor_qt.qt.QtGui import QImage
+    from pyvmmonitor_qt.qt_pyramid_image import ImagePyramid
+
+    pyramid = ImagePyramid(_create_array(2000, 1500))
+    assert pyramid.num_levels == 4  # 2000, 1000, 500, 250
+    assert pyramid.get_level_size(3) == (250, 187)
+    assert pyramid.get_tiles_count(0) == (8, 6)
+    assert pyramid.get_tiles_count(3) == (1, 1)
+
+    # Not built yet: sampled from the full image.
+    assert not pyramid.is_level_built(2)
+    assert pyramid.get_tile_array(2, 1, 1).shape == (119, 244, 4)
+
+    built = []
+    pyramid.start_building_levels(built.append)
+    pyramid.wait_levels_built()
+    assert pyramid.get_built_levels_count() == 4
+    assert pyramid.is_level_built(3)
+    assert numpy.all(pyramid.get_tile_array(3, 0, 0)[:, :, 0] == 255)
+
+    image = pyramid.create_tile_image(0, 7, 5)
+    assert image.width() == 2000 - 7 * 256
+    assert image.height() == 1500 - 5 * 256
+    assert image.format() == QImage.Format_RGBA8888
+    assert image.pixelColor(0, 0).red() == 255
+
+    qtapi.qWait(10)
+    assert built == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        ImagePyramid(numpy.zeros((10, 10, 2), dtype=numpy.uint8))
+
+
+def test_image_pyramid_thin_image(qtapi):
+    import numpy
+    from pyvmmonitor_qt.qt_pyramid_image import ImagePyramid
+
+    for width, height in ((1000, 1), (1, 1000), (1001, 3)):
+        pyramid = ImagePyramid(_create_array(width, height))
+        pyramid.start_building_levels()
+        pyramid.wait_levels_built()
+        assert pyramid.get_built_levels_count() == pyramid.num_levels
+
+        # The built levels match the level sizes (the single pixel side is never empty).
+        for level in range(pyramid.num_levels):
+            level_width, level_height = pyramid.get_level_size(level)
+            assert pyramid._levels[level].shape[:2] == (level_height, level_width)
+
+        level = pyramid.num_levels - 1
+        image = pyramid.create_tile_image(level, 0, 0)
+        assert not image.isNull()
+        assert (image.width(), image.height()) == pyramid.get_level_size(level)
+        assert numpy.all(pyramid.get_tile_array(level, 0, 0)[:, :, 0] == 255)
+
+
+def test_image_pyramid_from_raw_file(qtapi, tmpdir):
+    from pyvmmonitor_qt.qt_pyramid_image import ImagePyramid
+
+    filename = str(tmpdir.join('image.raw'))
+    arr = _create_array(600, 300)
+    with open(filename, 'wb') as stream:
+        stream.write(arr.tobytes())
+
+    pyramid = ImagePyramid.from_raw_file(filename, width=600, height=300, channels=4)
+    assert pyramid.num_levels == 3
+    assert pyramid.create_tile_image(1, 1, 0).width() == 300 - 256
+
+
+def test_pyramid_image_item(qtapi, view):
+    from pyvmmonitor_qt.qt_event_loop import process_queue
+    from pyvmmonitor_qt.qt_pyramid_image import ImagePyramid, PyramidImageItem
+
+    pyramid = ImagePyramid(_create_array(2000, 1500))
+    item = PyramidImageItem(pyramid)
+    assert item.get_level_for_zoom(1) == 0
+    assert item.get_level_for_zoom(2) == 0
+    assert item.get_level_for_zoom(0.5) == 1
+    assert item.get_level_for_zoom(0.3) == 1
+    assert item.get_level_for_zoom(0.001) == 3
+
+    view.resize(300, 300)
+    view.scene().addItem(item)
+    view.scene().setSceneRect(0, 0, 2000, 1500)
+    view.zoom_to(0.25)
+    view.centerOn(0, 0)
+
+    view.grab()
+    item.get_render_queue().wait_for_done()
+    process_queue()
+
+    keys = item.get_tile_cache().keys()
+    assert keys
+    assert set(key[0] for key in keys) == set([2])
+
+    # The level isn't built, so, the tiles are approximations which are refreshed later on.
+    item.start_building_levels()
+    pyramid.wait_levels_built()
+    process_queue()
+    assert not item.get_tile_cache().keys()
+
+    view.grab()
+    item.get_render_queue().wait_for_done()
+    process_queue()
+    assert item.get_tile_cache().keys()
+
+    view.scene().removeItem(item)
+    assert not item.get_tile_cache().keys()
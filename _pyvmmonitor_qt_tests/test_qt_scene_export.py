@@ -0,0 +1,72 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+def _create_scene():
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QPen
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsScene
+
+    scene = QGraphicsScene()
+    scene.setSceneRect(0, 0, 100, 50)
+    scene.addRect(0, 0, 50, 50, QPen(Qt.NoPen), QColor(Qt.red))
+    scene.addRect(50, 0, 50, 50, QPen(Qt.NoPen), QColor(Qt.blue))
+    return scene
+
+
+def test_export_scene_raw(qtapi, tmpdir):
+    import numpy
+    from pyvmmonitor_qt.qt_scene_export import export_scene
+
+    filename = str(tmpdir.join('scene.raw'))
+    progress = []
+    exporter = export_scene(
+        _create_scene(), filename, scale=4, strip_height=30,
+        on_progress=lambda done, total: progress.append((done, total)))
+
+    assert exporter.is_finished()
+    assert not exporter.is_cancelled()
+    assert not exporter.get_errors()
+    assert (exporter.width, exporter.height) == (400, 200)
+    assert exporter.total_strips == 7
+    assert progress[-1] == (7, 7)
+    assert len(progress) == 7
+
+    arr = numpy.fromfile(filename, dtype=numpy.uint8).reshape((200, 400, 4))
+    assert tuple(arr[10, 10]) == (255, 0, 0, 255)
+    assert tuple(arr[190, 390]) == (0, 0, 255, 255)
+
+
+def test_export_scene_png(qtapi, tmpdir):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor, QImage
+    from pyvmmonitor_qt.qt_scene_export import FORMAT_PNG, export_scene
+
+    filename = str(tmpdir.join('scene.png'))
+    exporter = export_scene(_create_scene(), filename, file_format=FORMAT_PNG, strip_height=20)
+    assert exporter.total_strips == 3
+
+    image = QImage(exporter.get_strip_filename(2))
+    assert (image.width(), image.height()) == (100, 10)
+    assert QColor(image.pixel(10, 5)) == QColor(Qt.red)
+
+
+def test_export_scene_cancel(qtapi, tmpdir):
+    from pyvmmonitor_qt.qt_scene_export import export_scene
+
+    progress = []
+
+    def is_cancelled():
+        return len(progress) >= 2
+
+    exporter = export_scene(
+        _create_scene(), str(tmpdir.join('scene.raw')), scale=10, strip_height=10,
+        max_pending_strips=1, is_cancelled=is_cancelled,
+        on_progress=lambda done, total: progress.append(done))
+    assert exporter.is_finished()
+    assert exporter.is_cancelled()
+    assert progress == [1, 2]
@@ -0,0 +1,41 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+
+
+def test_grid_spatial_index():
+    from pyvmmonitor_qt.qt_spatial_index import GridSpatialIndex
+
+    index = GridSpatialIndex(cell_size=10)
+    index.add('a', (1, 1))
+    index.add('b', (15, 15))
+    index.add('c', (-12, 3))
+    assert len(index) == 3
+
+    assert index.nearest((2, 2), 5) == 'a'
+    assert index.nearest((30, 30), 5) is None
+    assert index.nearest((5, 5), 20) == 'a'
+    assert index.nearest((10, 10), 20) == 'b'
+    assert sorted(index.iter_in_rect(-20, -20, 40, 40)) == ['a', 'b', 'c']
+    assert sorted(index.iter_in_rect(0, 0, 20, 20)) == ['a', 'b']
+    assert sorted(key for _dist, key in index.iter_within_radius((0, 0), 13)) == ['a', 'c']
+
+    # Move to another cell
+    index.add('a', (100, 100))
+    assert index.get_point('a') == (100, 100)
+    assert index.nearest((2, 2), 5) is None
+    assert index.nearest((99, 99), 5) == 'a'
+    assert index.get_bounds() == (-12, 3, 112, 97)
+
+    index.rebuild(cell_size=1)
+    assert sorted(index.iter_in_rect(-20, -20, 40, 40)) == ['b', 'c']
+
+    index.remove('b')
+    assert 'b' not in index
+    assert list(index.iter_in_rect(-20, -20, 40, 40)) == ['c']
+
+    index.clear()
+    assert len(index) == 0
+    assert index.get_bounds() is None
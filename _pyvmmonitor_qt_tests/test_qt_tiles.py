@@ -0,0 +1,57 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+def test_tile_cache(qtapi):
+    from pyvmmonitor_qt.qt.QtGui import QImage
+    from pyvmmonitor_qt.qt_tiles import TileCache, get_image_bytes
+
+    def create_image():
+        return QImage(16, 16, QImage.Format_ARGB32_Premultiplied)
+
+    image_bytes = get_image_bytes(create_image())
+    assert image_bytes == 16 * 16 * 4
+
+    cache = TileCache(max_bytes=image_bytes * 2)
+    cache.put('a', create_image())
+    cache.put('b', create_image())
+    assert cache.get_bytes() == image_bytes * 2
+
+    assert cache.get('a') is not None  # 'a' is now the most recently used.
+    cache.put('c', create_image())
+    assert sorted(cache.keys()) == ['a', 'c']
+
+    cache.discard_matching(lambda key: key == 'a')
+    assert cache.keys() == ['c']
+    assert cache.get_bytes() == image_bytes
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get_bytes() == 0
+
+
+def test_tile_render_queue(qtapi):
+    from pyvmmonitor_qt.qt.QtGui import QImage
+    from pyvmmonitor_qt.qt_event_loop import process_queue
+    from pyvmmonitor_qt.qt_tiles import TileRenderQueue
+
+    rendered = []
+
+    def on_tile_rendered(key, image):
+        rendered.append((key, image.width()))
+
+    queue = TileRenderQueue(on_tile_rendered)
+    for i in range(4):
+        queue.request(i, lambda: QImage(8, 8, QImage.Format_ARGB32_Premultiplied))
+    queue.cancel(3)
+    assert queue.is_pending(0)
+    assert not queue.is_pending(3)
+
+    queue.wait_for_done()
+    process_queue()
+    assert sorted(rendered) == [(0, 8), (1, 8), (2, 8)]
+    assert not queue.get_pending_keys()
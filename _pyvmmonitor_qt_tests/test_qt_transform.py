@@ -3,6 +3,7 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+from pyvmmonitor_qt.pytest_plugin import benchmark
 
 
 def test_qt_transform_equals():
@@ -32,3 +33,129 @@ def test_iter_transform_list_tuple():
     qtransform.translate(3, 0)
     from pyvmmonitor_qt.qt_transform import iter_transform_list_tuple
     assert list(iter_transform_list_tuple([(1, 0), (0, 1)], qtransform)) == [(4.0, 0.0), (3.0, 1.0)]
+
+
+def test_transform_points_array():
+    import numpy
+    from pyvmmonitor_qt.qt.QtGui import QTransform
+    from pyvmmonitor_qt.qt_transform import (
+        iter_transform_list_tuple, qtransform_to_numpy, qtransform_to_tuple,
+        transform_points_array)
+
+    points = numpy.array([(1, 0), (0, 1), (2.5, -3)], dtype=numpy.float64)
+    qtransform = QTransform()
+    qtransform.translate(3, 2)
+    qtransform.rotate(30)
+    qtransform.scale(2, 3)
+
+    expected = list(iter_transform_list_tuple(points.tolist(), qtransform))
+    for transform in (qtransform, qtransform_to_tuple(qtransform), qtransform_to_numpy(qtransform)):
+        assert numpy.allclose(transform_points_array(points, transform), expected)
+
+    # Projective transform.
+    qtransform = QTransform(1, 0, 0.01, 0, 1, 0.02, 3, 4, 1)
+    expected = list(iter_transform_list_tuple(points.tolist(), qtransform))
+    assert numpy.allclose(transform_points_array(points, qtransform), expected)
+
+
+def test_calculate_px_to_scene_and_rotation():
+    import math
+    from pyvmmonitor_qt.qt.QtGui import QTransform
+    from pyvmmonitor_qt.qt_transform import (
+        calc_angle_in_radians_from_qtransform, calculate_px_to_scene_and_rotation,
+        calculate_size_for_value_in_px)
+
+    qtransform = QTransform()
+    qtransform.scale(4, 4)
+    qtransform.rotate(45)
+    px_to_scene, rotation_in_radians = calculate_px_to_scene_and_rotation(qtransform)
+    assert math.fabs(px_to_scene - calculate_size_for_value_in_px(qtransform, 1.0)) < 1e-9
+    assert math.fabs(
+        rotation_in_radians - calc_angle_in_radians_from_qtransform(qtransform)) < 1e-9
+
+
+def test_qpolygonf_array():
+    import numpy
+    from pyvmmonitor_qt.qt.QtGui import QPolygonF
+    from pyvmmonitor_qt.qt_transform import array_to_qpolygonf, qpolygonf_to_array
+
+    points = numpy.array([(1, 2), (3, 4), (5, 6)], dtype=numpy.float64)
+    polygon = array_to_qpolygonf(points)
+    assert [(p.x(), p.y()) for p in polygon] == [(1, 2), (3, 4), (5, 6)]
+
+    arr = qpolygonf_to_array(polygon)
+    assert numpy.array_equal(arr, points)
+    arr[0] = (10, 10)  # A copy is returned.
+    assert polygon.at(0).x() == 1
+
+    assert array_to_qpolygonf([]).size() == 0
+    assert qpolygonf_to_array(QPolygonF()).shape == (0, 2)
+
+
+# Number of points used in the transform micro-benchmarks.
+_BENCHMARK_POINTS = 100000
+
+
+def _benchmark(func, repeat=3):
+    import time
+    times = []
+    for _i in range(repeat):
+        initial_time = time.time()
+        func()
+        times.append(time.time() - initial_time)
+    return min(times)
+
+
+@benchmark
+def test_benchmark_transform():
+    import numpy
+    from pyvmmonitor_qt.qt.QtCore import QPointF
+    from pyvmmonitor_qt.qt.QtGui import QPolygonF, QTransform
+    from pyvmmonitor_qt.qt_transform import (
+        _qpolygonf_as_array, array_to_qpolygonf, calculate_px_to_scene_and_rotation,
+        calculate_size_for_value_in_px, iter_transform_list_tuple, qpolygonf_to_array,
+        transform_points_array)
+
+    points = numpy.random.random((_BENCHMARK_POINTS, 2))
+    points_list = points.tolist()
+    qtransform = QTransform()
+    qtransform.translate(10, 20)
+    qtransform.scale(2, 2)
+
+    def calculate_size_mapping_points(transform, value_in_px):
+        # The previous implementation (maps 2 points).
+        p0 = transform.map(0.0, 0.0)
+        p1 = transform.map(1.0, 0.0)
+        return value_in_px / (p1[0] - p0[0])
+
+    polygon = array_to_qpolygonf(points)
+    timings = dict([
+        ('iter_transform_list_tuple', _benchmark(
+            lambda: list(iter_transform_list_tuple(points_list, qtransform)))),
+        ('transform_points_array', _benchmark(
+            lambda: transform_points_array(points, qtransform))),
+        ('calculate_size mapping points (x1000)', _benchmark(
+            lambda: [calculate_size_mapping_points(qtransform, 1.0) for _i in range(1000)])),
+        ('calculate_size_for_value_in_px (x1000)', _benchmark(
+            lambda: [calculate_size_for_value_in_px(qtransform, 1.0) for _i in range(1000)])),
+        ('calculate_px_to_scene_and_rotation (x1000)', _benchmark(
+            lambda: [calculate_px_to_scene_and_rotation(qtransform) for _i in range(1000)])),
+        ('QPolygonF from QPointFs', _benchmark(
+            lambda: QPolygonF([QPointF(x, y) for x, y in points_list]))),
+        ('array_to_qpolygonf', _benchmark(lambda: array_to_qpolygonf(points))),
+        ('array from QPointFs', _benchmark(
+            lambda: numpy.array([(p.x(), p.y()) for p in polygon], dtype=numpy.float64))),
+        ('qpolygonf_to_array', _benchmark(lambda: qpolygonf_to_array(polygon))),
+    ])
+
+    for name, timing in sorted(timings.items()):
+        print('%s: %.4fs' % (name, timing))
+
+    # Locally the vectorized versions are 50x+ faster (and calculate_size_for_value_in_px 3x).
+    assert timings['transform_points_array'] * 5 < timings['iter_transform_list_tuple']
+    assert timings['calculate_size_for_value_in_px (x1000)'] < timings[
+        'calculate_size mapping points (x1000)']
+    if _qpolygonf_as_array(polygon) is not None:
+        # Only when the bindings give access to the polygon memory (otherwise QPointFs are used).
+        assert timings['array_to_qpolygonf'] * 5 < timings['QPolygonF from QPointFs']
+        assert timings['qpolygonf_to_array'] * 5 < timings['array from QPointFs']
@@ -9,6 +9,7 @@ import weakref
 
 from pyvmmonitor_core.log_utils import get_logger
 from pyvmmonitor_qt import compat
+from pyvmmonitor_qt.pytest_plugin import benchmark
 from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
 from pyvmmonitor_qt.qt.QtGui import QStandardItem, QStandardItemModel
 from pyvmmonitor_qt.qt_utils import count_widget_children, execute_after_millis
@@ -211,3 +212,121 @@ Curr: 9
     timer.stop()
     assert found_text[0], 'Did not find text on dialog (timed out). Current text:\n%s' % (
         last_found[0],)
+
+
+def test_set_painter_antialiased(qtapi, monkeypatch):
+    from pyvmmonitor_qt import qt_utils
+    from pyvmmonitor_qt.qt.QtGui import QImage, QPainter
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsView
+    from pyvmmonitor_qt.qt_utils import mark_gl_frame_started, set_painter_antialiased
+
+    image = QImage(10, 10, QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    try:
+        set_painter_antialiased(painter, True, None)
+        assert painter.renderHints() & QPainter.Antialiasing
+        assert painter.renderHints() & QPainter.SmoothPixmapTransform
+        set_painter_antialiased(painter, False, None)
+        assert not painter.renderHints() & QPainter.Antialiasing
+    finally:
+        painter.end()
+
+    # A QGraphicsView may also be passed (its setRenderHints has no `on` parameter).
+    view = QGraphicsView()
+    set_painter_antialiased(view, False, None)
+    assert not view.renderHints() & QPainter.Antialiasing
+    set_painter_antialiased(view, True, None)
+    assert view.renderHints() & QPainter.Antialiasing
+
+    # The GL state is only changed when needed in a frame.
+    gl_calls = []
+
+    class _GLWidget(object):
+
+        def makeCurrent(self):
+            pass
+
+    monkeypatch.setattr(qt_utils, '_is_opengl_available', lambda: True)
+    monkeypatch.setattr(
+        qt_utils, '_set_gl_antialiased',
+        lambda widget, antialias: gl_calls.append(antialias))
+
+    widget = _GLWidget()
+    set_painter_antialiased(view, True, widget)
+    set_painter_antialiased(view, True, widget)
+    assert gl_calls == [True, True]  # Not tracked (no frame marked).
+
+    del gl_calls[:]
+    for _frame in range(3):
+        mark_gl_frame_started(widget)
+        for _i in range(100):
+            set_painter_antialiased(view, True, widget)
+        set_painter_antialiased(view, False, widget)
+    assert gl_calls == [True, False] * 3
+
+
+# Number of frames/items painted per frame in the set_painter_antialiased benchmark.
+_BENCHMARK_FRAMES = 20
+_BENCHMARK_PAINTED_ITEMS = 1000
+
+
+@benchmark
+def test_benchmark_set_painter_antialiased(qtapi, monkeypatch):
+    from pyvmmonitor_qt import qt_utils
+    from pyvmmonitor_qt.qt.QtGui import QImage, QPainter
+    from pyvmmonitor_qt.qt_utils import mark_gl_frame_started, set_painter_antialiased
+
+    class _GLWidget(object):
+
+        def makeCurrent(self):
+            pass
+
+    # The GL calls are stubbed (so, the GL path is measured without an actual GL context).
+    gl_calls = []
+
+    def set_gl_antialiased(widget, antialias):
+        widget.makeCurrent()
+        gl_calls.append(antialias)
+
+    monkeypatch.setattr(qt_utils, '_is_opengl_available', lambda: True)
+    monkeypatch.setattr(qt_utils, '_set_gl_antialiased', set_gl_antialiased)
+
+    def set_painter_antialiased_without_cache(painter, antialias, widget):
+        # The previous implementation (always rebuilding and setting the render hints and
+        # changing the GL state on each call).
+        from pyvmmonitor_qt.qt.QtGui import QPainter
+        render_hints = (
+            QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
+        painter.setRenderHints(render_hints, antialias)
+        if hasattr(widget, 'makeCurrent') and qt_utils._is_opengl_available():
+            qt_utils._set_gl_antialiased(widget, antialias)
+
+    widget = _GLWidget()
+    image = QImage(10, 10, QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    try:
+        timings = {}
+        gl_calls_per_frame = {}
+        for name, func in (
+                ('without cache', set_painter_antialiased_without_cache),
+                ('with cache', set_painter_antialiased)):
+            del gl_calls[:]
+            initial_time = time.time()
+            for _frame in range(_BENCHMARK_FRAMES):
+                # Done by ZoomableGraphicsView.paintEvent.
+                mark_gl_frame_started(widget)
+                for _i in range(_BENCHMARK_PAINTED_ITEMS):
+                    func(painter, True, widget)
+            timings[name] = time.time() - initial_time
+            gl_calls_per_frame[name] = len(gl_calls) / float(_BENCHMARK_FRAMES)
+    finally:
+        painter.end()
+
+    for name, timing in sorted(timings.items()):
+        print('set_painter_antialiased %s (%s frames x %s items): %.4fs (GL calls per frame: %s)' % (
+            name, _BENCHMARK_FRAMES, _BENCHMARK_PAINTED_ITEMS, timing, gl_calls_per_frame[name]))
+
+    # The GL state is changed (and the context made current) once per frame instead of per item.
+    assert gl_calls_per_frame['without cache'] == _BENCHMARK_PAINTED_ITEMS
+    assert gl_calls_per_frame['with cache'] == 1
+    assert timings['with cache'] < timings['without cache']
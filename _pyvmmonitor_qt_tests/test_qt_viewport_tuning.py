@@ -0,0 +1,94 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import pytest
+
+from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
+
+
+@pytest.fixture
+def view(qtapi):
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+    view = ZoomableGraphicsView()
+    view.show()
+    yield view
+    view.hide()
+    view.deleteLater()
+    view = None
+
+
+def test_viewport_config():
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem, QGraphicsView
+    from pyvmmonitor_qt.qt_viewport_tuning import ViewportConfig, get_candidate_configs
+
+    config = ViewportConfig(False, QGraphicsView.SmartViewportUpdate,
+                            QGraphicsItem.DeviceCoordinateCache)
+    assert config.to_string() == 'raster;smart;device'
+    assert ViewportConfig.from_string(config.to_string()) == config
+    assert ViewportConfig.from_string('opengl;full;none') == ViewportConfig(
+        True, QGraphicsView.FullViewportUpdate, QGraphicsItem.NoCache)
+    assert ViewportConfig.from_string('raster;foo;none') is None
+    assert ViewportConfig.from_string(None) is None
+
+    candidates = get_candidate_configs(use_opengl=False)
+    assert len(candidates) == 6
+    assert not any(candidate.use_opengl for candidate in candidates)
+    assert len(set(get_candidate_configs(use_opengl=True))) == 12
+
+
+def test_set_viewport_config(qtapi, view):
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem, QGraphicsView
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+    from pyvmmonitor_qt.qt_viewport_tuning import ViewportConfig
+
+    circle = create_fixed_pixels_graphics_item_circle((10, 10), 5, graphics_widget=view)
+    view.scene().addItem(circle)
+    assert circle.cacheMode() == QGraphicsItem.NoCache
+
+    config = ViewportConfig(
+        False, QGraphicsView.FullViewportUpdate, QGraphicsItem.DeviceCoordinateCache)
+    view.set_viewport_config(config)
+    assert view.get_viewport_config() == config
+    assert view.viewportUpdateMode() == QGraphicsView.FullViewportUpdate
+    assert not hasattr(view.viewport(), 'makeCurrent')
+    assert circle.cacheMode() == QGraphicsItem.DeviceCoordinateCache
+
+    # New custom items use the cache mode of the view.
+    circle2 = create_fixed_pixels_graphics_item_circle((20, 20), 5, graphics_widget=view)
+    assert circle2.cacheMode() == QGraphicsItem.DeviceCoordinateCache
+
+
+def test_tuned_viewport_config(qtapi, tmpdir):
+    from pyvmmonitor_qt import qt_viewport_tuning
+    from pyvmmonitor_qt.qt.QtCore import QSettings
+    from pyvmmonitor_qt.qt_viewport_tuning import (
+        SETTINGS_KEY_CONFIG, clear_tuned_viewport_config, get_candidate_configs,
+        get_tuned_viewport_config, populate_benchmark_scene)
+
+    settings = QSettings(str(tmpdir.join('settings.ini')), QSettings.IniFormat)
+    candidates = get_candidate_configs(use_opengl=False)[:3]
+    benchmarked = []
+
+    def populate_scene(scene):
+        benchmarked.append(True)
+        return populate_benchmark_scene(scene, items_count=40)
+
+    try:
+        config = get_tuned_viewport_config(
+            settings, force=True, candidates=candidates, frames=3, populate_scene=populate_scene)
+        assert config in candidates
+        assert len(benchmarked) == 3
+        assert settings.value(SETTINGS_KEY_CONFIG) == config.to_string()
+
+        # The chosen config is kept in memory and persisted in the settings (so, the candidates
+        # aren't benchmarked again).
+        assert get_tuned_viewport_config(settings, candidates=candidates) is config
+        qt_viewport_tuning._tuned_config = None
+        assert get_tuned_viewport_config(
+            settings, candidates=candidates, populate_scene=populate_scene) == config
+        assert len(benchmarked) == 3
+    finally:
+        clear_tuned_viewport_config(settings)
+    assert settings.value(SETTINGS_KEY_CONFIG) is None
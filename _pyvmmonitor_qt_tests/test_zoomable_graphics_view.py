@@ -5,6 +5,7 @@ Copyright: Brainwy Software Ltda
 '''
 import pytest
 
+from pyvmmonitor_qt.pytest_plugin import benchmark
 from pyvmmonitor_qt.pytest_plugin import qtapi  # @UnusedImport
 
 
@@ -64,3 +65,485 @@ def test_zoom_on_wheel(qtapi, view):
     item = QGraphicsLineItem(0, 0, 10, 10)
     item.setPen(QPen(QColor(Qt.red)))
     view.scene().addItem(item)
+
+
+def test_fixed_pixels_items_updated_on_zoom(qtapi, view):
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+
+    items = []
+    for i in range(10):
+        item = create_fixed_pixels_graphics_item_circle((i * 10, 0), 5, graphics_widget=view)
+        view.scene().addItem(item)
+        items.append(item)
+
+    assert len(view._fixed_pixels_items) == 10
+    view.zoom_to(2.0)
+
+    # Updated right away (without having to wait for a paint and a new event loop).
+    for item in items:
+        assert item.rect().width() == 5.0
+
+    view.unregister_fixed_pixels_item(items[0])
+    view.zoom_to(4.0)
+    assert items[0].rect().width() == 5.0
+    assert items[1].rect().width() == 2.5
+
+
+def test_svg_pixmap_cache(qtapi, view):
+    from pyvmmonitor_qt.qt.QtSvg import QSvgRenderer
+    from pyvmmonitor_qt.qt_graphics_items import (
+        create_fixed_pixels_graphics_item_svg, get_svg_pixmap_cache)
+
+    cache = get_svg_pixmap_cache()
+    cache.clear()
+
+    svg_renderer = QSvgRenderer(':appbar.cursor.move.svg')
+    for i in range(3):
+        item = create_fixed_pixels_graphics_item_svg(
+            (i * 100, 0),
+            20,
+            graphics_widget=view,
+            svg_renderer=svg_renderer,
+        )
+        item.set_base_scale(1 / 76.)
+        view.scene().addItem(item)
+
+    view.grab()
+    # All the items have the same size in pixels, so, they share the same pixmap.
+    assert len(cache) == 1
+
+    view.zoom_to(2.0)
+    view.grab()
+    assert len(cache) == 1
+
+    # Reloading the renderer invalidates the related pixmaps.
+    svg_renderer.load(':appbar.cursor.move.black.svg')
+    assert len(cache) == 0
+
+
+def test_level_of_detail(qtapi, view):
+    from pyvmmonitor_qt.qt.QtGui import QPainter
+    from pyvmmonitor_qt.qt_graphics_items import (
+        create_fixed_pixels_graphics_handles, create_fixed_pixels_graphics_item_circle)
+    from pyvmmonitor_qt.qt_level_of_detail import (
+        LOD_AGGREGATED, LOD_FULL, LOD_HIDDEN, LOD_SIMPLIFIED, LevelOfDetailPolicy)
+
+    view.level_of_detail_policy = LevelOfDetailPolicy([
+        (0.5, LOD_FULL, True),
+        (0.2, LOD_SIMPLIFIED, True),
+        (0.1, LOD_AGGREGATED, False),
+        (0.0, LOD_HIDDEN, False),
+    ])
+    assert view.get_level_of_detail_band().level == LOD_FULL
+    assert view.renderHints() & QPainter.Antialiasing
+
+    item = create_fixed_pixels_graphics_item_circle((0, 0), 5, graphics_widget=view)
+    item.set_level_of_detail(min_zoom=0.3)
+    view.scene().addItem(item)
+    handles = create_fixed_pixels_graphics_handles(5, graphics_widget=view)
+    handles.set_handles([(i * 10, 0) for i in range(100)])
+    view.scene().addItem(handles)
+
+    for zoom, level in ((1.0, LOD_FULL), (0.25, LOD_SIMPLIFIED), (0.1, LOD_AGGREGATED),
+                        (0.05, LOD_HIDDEN)):
+        view.zoom_to(zoom)
+        assert view.get_level_of_detail_band().level == level
+        # Just check that painting works in all the levels.
+        view.grab()
+
+    assert not view.renderHints() & QPainter.Antialiasing
+
+
+def test_level_of_detail_simplified_keeps_shape(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+    from pyvmmonitor_qt.qt_level_of_detail import (
+        LOD_FULL, LOD_SIMPLIFIED, LevelOfDetailPolicy)
+
+    # By default all the zoom levels are painted with all the details.
+    view.zoom_to(0.05)
+    assert view.get_level_of_detail_band().level == LOD_FULL
+    assert view.get_level_of_detail_band().antialiased
+
+    view.level_of_detail_policy = LevelOfDetailPolicy([
+        (0.5, LOD_FULL, True),
+        (0.0, LOD_SIMPLIFIED, False),
+    ])
+    assert view.get_level_of_detail_band().level == LOD_SIMPLIFIED
+
+    item = create_fixed_pixels_graphics_item_circle(
+        (0, 0), 20, fill_color=QColor(Qt.red), alpha=255, graphics_widget=view)
+    view.scene().addItem(item)
+    view.grab()
+    qtapi.qWait(0)  # The item is updated for the zoom on the next event loop.
+
+    image = view.viewport().grab().toImage()
+    center = view.mapFromScene(0, 0)
+    assert QColor(image.pixel(center.x(), center.y())) == QColor(Qt.red)
+    # The simplified circle is still a circle (and not its bounding rect filled).
+    assert QColor(image.pixel(center.x() + 18, center.y() + 18)) != QColor(Qt.red)
+
+
+# Number of items created in the level of detail benchmark.
+_LEVEL_OF_DETAIL_BENCHMARK_ITEMS = 50000
+
+
+@benchmark
+def test_level_of_detail_benchmark(qtapi, view):
+    import time
+    from pyvmmonitor_qt.qt_graphics_items import create_fixed_pixels_graphics_item_circle
+    from pyvmmonitor_qt.qt_level_of_detail import LevelOfDetailPolicy
+
+    view.resize(800, 600)
+    for i in range(_LEVEL_OF_DETAIL_BENCHMARK_ITEMS):
+        item = create_fixed_pixels_graphics_item_circle(
+            ((i % 250) * 20, (i // 250) * 20), 5, graphics_widget=view)
+        view.scene().addItem(item)
+
+    def measure_frame_times():
+        frame_times = []
+        for zoom in (1.0, 0.5, 0.25, 0.1, 0.05):
+            view.zoom_to(zoom)
+            view.centerOn(2500, 2000)
+            view.grab()  # Warm up (the items are updated on the next event loop).
+            qtapi.qWait(0)
+            times = []
+            for _i in range(3):
+                initial_time = time.time()
+                view.grab()
+                times.append(time.time() - initial_time)
+            frame_times.append((zoom, min(times)))
+        return frame_times
+
+    lod_policy = LevelOfDetailPolicy(LevelOfDetailPolicy.LOW_ZOOM_BANDS)
+    view.level_of_detail_policy = lod_policy
+    lod_frame_times = measure_frame_times()
+    view.level_of_detail_policy = LevelOfDetailPolicy()
+    full_frame_times = measure_frame_times()
+
+    for (zoom, lod_time), (_zoom, full_time) in zip(lod_frame_times, full_frame_times):
+        # Note: only check the bands without antialiasing (the simplified circles are
+        # about as fast as the full ones).
+        if lod_policy.get_band(zoom).antialiased:
+            continue
+        assert lod_time < full_time, 'zoom: %5.2f lod: %.3fs full: %.3fs' % (
+            zoom, lod_time, full_time)
+
+
+# Number of frames painted in the panning benchmark.
+_PANNING_BENCHMARK_FRAMES = 30
+
+
+@benchmark
+def test_background_panning_benchmark(qtapi, view):
+    import time
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QBrush, QImage, QPainter, QPixmap
+    from pyvmmonitor_qt.zoomable_graphics_view import BackgroundPainter, BackgroundMode
+
+    # 4K viewport.
+    view.resize(3840, 2160)
+    view.setSceneRect(-10000, -10000, 20000, 20000)
+    background_painter = BackgroundPainter(BackgroundMode.TILED_TRANSPARENT_BACKGROUND)
+
+    def paint_frames(paint):
+        image = QImage(view.width(), view.height(), QImage.Format_ARGB32_Premultiplied)
+        initial_time = time.time()
+        for i in range(_PANNING_BENCHMARK_FRAMES):
+            view.horizontalScrollBar().setValue(i * 7)
+            view.verticalScrollBar().setValue(i * 3)
+            painter = QPainter(image)
+            try:
+                painter.setTransform(view.viewportTransform())
+                paint(painter)
+            finally:
+                painter.end()
+        return _PANNING_BENCHMARK_FRAMES / (time.time() - initial_time)
+
+    def create_uncached_tiled_pixmap(width, height, brush_square_len):
+        # What create_tiled_pixmap did before (the pattern wasn't cached).
+        pattern = QPixmap(brush_square_len * 2, brush_square_len * 2)
+        pattern_painter = QPainter(pattern)
+        try:
+            pattern_painter.fillRect(0, 0, brush_square_len * 2, brush_square_len * 2, Qt.white)
+            pattern_painter.fillRect(0, 0, brush_square_len, brush_square_len, Qt.gray)
+            pattern_painter.fillRect(
+                brush_square_len, brush_square_len, brush_square_len, brush_square_len, Qt.gray)
+        finally:
+            pattern_painter.end()
+
+        pixmap = QPixmap(width, height)
+        pixmap_painter = QPainter(pixmap)
+        try:
+            pixmap_painter.fillRect(0, 0, width, height, QBrush(pattern))
+        finally:
+            pixmap_painter.end()
+        return pixmap
+
+    def paint_regenerating_pixmap(painter):
+        # What was done before: a viewport-sized tiled pixmap created whenever the view scrolled.
+        painter.resetTransform()
+        painter.drawPixmap(
+            0, 0, create_uncached_tiled_pixmap(view.width() + 20, view.height() + 20, 10))
+
+    def paint_cached_brush(painter):
+        background_painter.paint(view, painter, None)
+
+    regenerating_fps = paint_frames(paint_regenerating_pixmap)
+    cached_brush_fps = paint_frames(paint_cached_brush)
+    assert cached_brush_fps > regenerating_fps, (
+        'Panning FPS (4K): regenerating pixmap: %.1f cached brush: %.1f' % (
+            regenerating_fps, cached_brush_fps))
+
+
+def test_static_layer(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor
+    from pyvmmonitor_qt.qt_event_loop import process_queue
+    from pyvmmonitor_qt.qt_graphics_items import create_graphics_item_rect
+
+    view.resize(400, 400)
+    view.setSceneRect(0, 0, 1000, 1000)
+    view.centerOn(200, 200)
+
+    static_layer = view.get_static_layer()
+    item = create_graphics_item_rect((0, 0, 1000, 1000), fill_color=QColor(Qt.red))
+    static_layer.get_scene().addItem(item)
+    qtapi.qWait(0)  # Let the scene notify about the change.
+
+    view.grab()  # The tiles are requested on the first paint.
+    assert static_layer.get_render_queue().get_pending_keys()
+    static_layer.get_render_queue().wait_for_done()
+    process_queue()
+
+    tile_cache = static_layer.get_tile_cache()
+    assert len(tile_cache) > 0
+    image = view.grab().toImage()
+    assert QColor(image.pixel(200, 200)) == QColor(Qt.red)
+
+    # Changing the static scene invalidates the tiles.
+    item.setBrush(QColor(Qt.blue))
+    qtapi.qWait(0)
+    assert len(tile_cache) == 0
+
+    # Synchronous rendering (even if tiles were requested to a worker thread in the meanwhile).
+    static_layer.use_threads = False
+    image = view.grab().toImage()
+    assert QColor(image.pixel(200, 200)) == QColor(Qt.blue)
+    assert len(tile_cache) > 0
+
+
+def test_static_layer_zoom(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QColor
+    from pyvmmonitor_qt.qt_event_loop import process_queue
+    from pyvmmonitor_qt.qt_graphics_items import create_graphics_item_rect
+
+    view.resize(400, 400)
+    view.setSceneRect(0, 0, 1000, 1000)
+    view.centerOn(500, 500)
+
+    static_layer = view.get_static_layer()
+    static_layer.get_scene().addItem(
+        create_graphics_item_rect((0, 0, 1000, 1000), fill_color=QColor(Qt.red)))
+    qtapi.qWait(0)
+    render_queue = static_layer.get_render_queue()
+    tile_cache = static_layer.get_tile_cache()
+
+    view.grab()
+    render_queue.wait_for_done()
+    process_queue()
+    assert set(key[0] for key in tile_cache.keys()) == set([1.0])
+
+    # Zooms between the zoom levels use the tiles of the next zoom level.
+    assert static_layer.get_tile_zoom(1.1) == 1.25
+    assert static_layer.get_tile_zoom(1.0) == 1.0
+    assert static_layer.get_tile_zoom(1000) == view.ZOOM_LEVELS[-1]
+    view.zoom_to(1.1)
+    view.centerOn(500, 500)
+    image = view.grab().toImage()
+    assert render_queue.get_pending_keys()
+    assert set(key[0] for key in render_queue.get_pending_keys()) == set([1.25])
+
+    # While those are rendered, the tiles of the previous zoom level are shown scaled.
+    assert QColor(image.pixel(200, 200)) == QColor(Qt.red)
+
+    render_queue.wait_for_done()
+    process_queue()
+    assert set(key[0] for key in tile_cache.keys()) == set([1.0, 1.25])
+
+    view.zoom_to(1.2)
+    view.centerOn(500, 500)
+    image = view.grab().toImage()
+    assert QColor(image.pixel(200, 200)) == QColor(Qt.red)
+    render_queue.wait_for_done()
+    process_queue()
+    assert set(key[0] for key in tile_cache.keys()) == set([1.0, 1.25])
+
+
+def test_zoom_controller(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import QPoint
+    from pyvmmonitor_qt.qt_animation_clock import get_animation_clock
+
+    view.resize(400, 400)
+    view.setSceneRect(0, 0, 4000, 4000)
+    view.centerOn(1000, 1000)
+    assert view.curr_zoom == 1.0
+
+    zoom_notifications = []
+
+    def on_zoom(transform):
+        zoom_notifications.append(transform.m11())
+
+    view.on_zoom.register(on_zoom)
+
+    clock = get_animation_clock()
+    controller = view.get_zoom_controller()
+
+    # A regular wheel step and many small (touchpad) deltas in the same frame.
+    anchor = QPoint(100, 100)
+    anchor_scene_point = view.mapToScene(anchor)
+    for _i in range(3):
+        controller.add_wheel_delta(120, anchor)
+    for _i in range(12):
+        controller.add_wheel_delta(10, anchor)
+    assert controller.is_animating()
+    assert not zoom_notifications
+
+    frame_time = 10.
+    frames = 0
+    while controller.is_animating():
+        frame_time += 0.016
+        frames += 1
+        clock.tick(frame_time)
+        assert frames < 30
+
+    # 4 zoom levels: 1.25, 1.5, 2.0, 3.0
+    assert abs(view.curr_zoom - 3.0) < 1e-9
+    assert controller.get_target_zoom() is None
+    assert len(zoom_notifications) == frames
+    assert frames < 15
+    assert zoom_notifications == sorted(zoom_notifications)
+
+    # The scene point under the anchor is kept.
+    new_anchor_scene_point = view.mapToScene(anchor)
+    assert abs(new_anchor_scene_point.x() - anchor_scene_point.x()) < 1
+    assert abs(new_anchor_scene_point.y() - anchor_scene_point.y()) < 1
+
+    # Half a wheel step goes halfway (in log scale) to the next zoom level.
+    controller.add_wheel_delta(-60)
+    while controller.is_animating():
+        frame_time += 0.016
+        clock.tick(frame_time)
+    assert abs(view.curr_zoom - (3.0 * 2.0) ** .5) < 1e-6
+
+    # An explicit zoom stops the animation.
+    controller.add_wheel_delta(120)
+    view.zoom_to(1.0)
+    assert not controller.is_animating()
+    clock.tick(frame_time + 0.016)
+    assert abs(view.curr_zoom - 1.0) < 1e-9
+
+
+def test_pan_controller(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import QPoint
+    from pyvmmonitor_qt.qt_animation_clock import get_animation_clock
+
+    view.resize(400, 400)
+    view.setSceneRect(0, 0, 4000, 4000)
+    view.centerOn(2000, 2000)
+    h_scroll_bar = view.horizontalScrollBar()
+    initial_value = h_scroll_bar.value()
+
+    clock = get_animation_clock()
+    controller = view.get_pan_controller()
+
+    # Drag 100 pixels to the left in 0.1 seconds.
+    controller.start_drag(QPoint(200, 200), event_time=0.)
+    for i in range(1, 11):
+        controller.drag_to(QPoint(200 - i * 10, 200), event_time=i * 0.01)
+
+    # Nothing is applied until the next frame.
+    assert h_scroll_bar.value() == initial_value
+    clock.tick(0.1)
+    assert h_scroll_bar.value() == initial_value + 100
+
+    controller.release(event_time=0.1)
+    velocity = controller.get_velocity()
+    assert round(velocity[0]) == -1000
+    assert velocity[1] == 0
+
+    frame_time = 0.1
+    frames = 0
+    while controller.is_animating():
+        frame_time += 0.016
+        frames += 1
+        clock.tick(frame_time)
+        assert frames < 100
+
+    # With inertia the view keeps moving after the release.
+    assert h_scroll_bar.value() > initial_value + 200
+    assert controller.get_velocity() is None
+
+    # Without inertia it stops right away.
+    controller.inertia = False
+    value = h_scroll_bar.value()
+    controller.start_drag(QPoint(200, 200), event_time=5.)
+    controller.drag_to(QPoint(210, 200), event_time=5.01)
+    controller.release(event_time=5.02)
+    clock.tick(5.02)
+    assert h_scroll_bar.value() == value - 10
+    assert not controller.is_animating()
+
+
+def test_pan_button(qtapi, view):
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtTest import QTest
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsRectItem
+
+    class _Item(QGraphicsRectItem):
+
+        def __init__(self):
+            QGraphicsRectItem.__init__(self, -50, -50, 100, 100)
+            self.pressed = []
+
+        def mousePressEvent(self, event):
+            self.pressed.append(event.button())
+
+    item = _Item()
+    view.scene().addItem(item)
+    view.resize(200, 200)
+    view.centerOn(0, 0)
+    pos = view.mapFromScene(0, 0)
+    controller = view.get_pan_controller()
+
+    # By default the middle button isn't taken by the view (the item receives it).
+    assert view.PAN_BUTTON is None
+    QTest.mousePress(view.viewport(), Qt.MiddleButton, Qt.NoModifier, pos)
+    assert not controller.is_dragging()
+    QTest.mouseRelease(view.viewport(), Qt.MiddleButton, Qt.NoModifier, pos)
+    assert item.pressed == [Qt.MiddleButton]
+
+    view.PAN_BUTTON = Qt.MiddleButton
+    QTest.mousePress(view.viewport(), Qt.MiddleButton, Qt.NoModifier, pos)
+    assert controller.is_dragging()
+    QTest.mouseRelease(view.viewport(), Qt.MiddleButton, Qt.NoModifier, pos)
+    assert not controller.is_dragging()
+    assert item.pressed == [Qt.MiddleButton]
+
+
+def test_frame_time_counter_on_paint(qtapi, view):
+    from pyvmmonitor_qt.qt_animation_clock import FrameTimeCounter
+
+    counter = FrameTimeCounter()
+    view.set_frame_time_counter(counter)
+    view.resize(200, 200)
+    view.grab()
+    view.grab()
+    assert counter.frames >= 2
+
+    view.set_frame_time_counter(None)
+    frames = counter.frames
+    view.grab()
+    assert counter.frames == frames
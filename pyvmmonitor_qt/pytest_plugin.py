@@ -3,6 +3,7 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+import os
 import types
 
 import pytest
@@ -10,6 +11,12 @@ from pytestqt.plugin import qtbot  # @UnusedImport
 
 pytest_plugins = []
 
+# The (slow) benchmarks are only run if the PYVMMONITOR_QT_BENCHMARKS environment variable is set,
+# i.e.: PYVMMONITOR_QT_BENCHMARKS=1 pytest -k benchmark
+benchmark = pytest.mark.skipif(
+    not os.environ.get('PYVMMONITOR_QT_BENCHMARKS'),
+    reason='Benchmarks only run if PYVMMONITOR_QT_BENCHMARKS is set.')
+
 
 def _list_widgets(qtbot):
     from pytestqt.qtbot import _iter_widgets
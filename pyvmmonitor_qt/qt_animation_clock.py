@@ -0,0 +1,174 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+A clock shared by the animations (so that all the animations are updated in the same frame
+instead of each one having its own timer) and a counter to measure the time between frames.
+
+i.e.:
+
+clock = get_animation_clock()
+clock.add_frame_callback(self._on_frame)  # Called as _on_frame(frame_time) on each frame.
+...
+clock.remove_frame_callback(self._on_frame)
+
+Note: only weak-references to the callbacks are kept and the clock only runs while there are
+callbacks registered.
+'''
+import time
+
+# Time (in seconds) used for the frames.
+get_time = getattr(time, 'perf_counter', time.time)
+
+
+class AnimationClock(object):
+
+    FRAME_INTERVAL_IN_MS = 16
+
+    def __init__(self, frame_interval_in_ms=None):
+        if frame_interval_in_ms is None:
+            frame_interval_in_ms = self.FRAME_INTERVAL_IN_MS
+        self.frame_interval_in_ms = frame_interval_in_ms
+        self.frame_time = None
+        self.frame_count = 0
+        self._callbacks = []
+        self._timer = None
+
+    def add_frame_callback(self, callback):
+        '''
+        :param callable callback:
+            Called as callback(frame_time) on each frame (frame_time in seconds) until it's
+            removed.
+        '''
+        from pyvmmonitor_core.weak_utils import get_weakref
+        if self.has_frame_callback(callback):
+            return
+        self._callbacks.append(get_weakref(callback))
+        self._start()
+
+    def remove_frame_callback(self, callback):
+        self._callbacks = [
+            ref for ref in self._callbacks
+            if ref() is not None and ref() != callback]
+        if not self._callbacks:
+            self._stop()
+
+    def has_frame_callback(self, callback):
+        for ref in self._callbacks:
+            if ref() == callback:
+                return True
+        return False
+
+    def is_running(self):
+        return self._timer is not None and self._timer.isActive()
+
+    def _start(self):
+        from pyvmmonitor_qt.qt.QtCore import QTimer, Qt
+        if self._timer is None:
+            self._timer = QTimer()
+            if hasattr(self._timer, 'setTimerType'):
+                self._timer.setTimerType(Qt.PreciseTimer)
+            self._timer.timeout.connect(self.tick)
+        if not self._timer.isActive():
+            self._timer.start(self.frame_interval_in_ms)
+
+    def _stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    def tick(self, frame_time=None):
+        '''
+        Notifies the registered callbacks about a new frame (called by the internal timer, but
+        may also be called directly, i.e.: in tests, to advance to a given frame time).
+        '''
+        if frame_time is None:
+            frame_time = get_time()
+        self.frame_time = frame_time
+        self.frame_count += 1
+
+        # Copy as callbacks may be added/removed while notifying.
+        for ref in self._callbacks[:]:
+            callback = ref()
+            if callback is not None:
+                callback(frame_time)
+
+        self._callbacks = [ref for ref in self._callbacks if ref() is not None]
+        if not self._callbacks:
+            self._stop()
+
+
+_animation_clock = None
+
+
+def get_animation_clock():
+    '''
+    :return AnimationClock:
+        The clock shared by the animations.
+    '''
+    global _animation_clock
+    if _animation_clock is None:
+        _animation_clock = AnimationClock()
+    return _animation_clock
+
+
+class FrameTimeCounter(object):
+    '''
+    Keeps the time between the last frames (i.e.: to measure how smooth an animation/pan is).
+
+    i.e.:
+
+    counter = FrameTimeCounter()
+    view.set_frame_time_counter(counter)  # add_frame() is called on each paint.
+    ...
+    print('fps: %.1f, p95: %.1fms' % (counter.get_fps(), counter.get_percentile(95) * 1000))
+    '''
+
+    def __init__(self, max_samples=240):
+        from collections import deque
+        self._frame_times = deque(maxlen=max_samples)
+        self._last_time = None
+        self.frames = 0
+
+    def add_frame(self, frame_time=None):
+        if frame_time is None:
+            frame_time = get_time()
+        if self._last_time is not None:
+            self._frame_times.append(frame_time - self._last_time)
+        self._last_time = frame_time
+        self.frames += 1
+
+    def clear(self):
+        self._frame_times.clear()
+        self._last_time = None
+        self.frames = 0
+
+    def get_frame_times(self):
+        '''
+        :return list(float):
+            The time (in seconds) between the last frames.
+        '''
+        return list(self._frame_times)
+
+    def get_fps(self):
+        frame_times = self._frame_times
+        if not frame_times:
+            return 0.
+        total = sum(frame_times)
+        if total <= 0:
+            return 0.
+        return len(frame_times) / total
+
+    def get_percentile(self, percentile):
+        '''
+        :param float percentile:
+            A value from 0 to 100.
+
+        :return float:
+            The frame time (in seconds) at the given percentile (0 if there are no frames).
+        '''
+        frame_times = sorted(self._frame_times)
+        if not frame_times:
+            return 0.
+        i = int(round((len(frame_times) - 1) * percentile / 100.))
+        return frame_times[max(0, min(i, len(frame_times) - 1))]
@@ -18,7 +18,7 @@ from pyvmmonitor_qt.qt_linked_edition import (does_expected_data_change,
                                               does_expected_ui_change,
                                               skip_on_expected_data_change,
                                               skip_on_expected_ui_change)
-from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget
+from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget, get_pixmap_logical_size
 
 logger = logging.getLogger(__name__)
 
@@ -425,8 +425,61 @@ class _OpacityWidget(_BaseColorsWidget):
             self._update_widgets()
 
 
+def _create_color_wheel_image(size, device_pixel_ratio=1.):
+    '''
+    Creates the image of the color wheel: the hue changes in a conical gradient and the center is
+    lightened up (may be called in a worker thread).
+
+    :param size: the logical size of the wheel (the image has size * device_pixel_ratio pixels).
+    '''
+    from pyvmmonitor_qt.qt.QtGui import QBrush, QConicalGradient, QImage, QRadialGradient
+    from pyvmmonitor_qt.qt_utils import painter_on
+
+    size = max(1, size)
+    image_size = max(1, int(round(size * device_pixel_ratio)))
+    image = QImage(image_size, image_size, QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(device_pixel_ratio)
+    image.fill(Qt.transparent)
+
+    # Create a simple hue where we change the hue in a conical gradient.
+    stops = 360
+    delta = 1.0 / stops
+    v = 0.0
+    degrees = 360
+    gradient = QConicalGradient(size / 2, size / 2, degrees)
+    for _stop in range(stops):
+        v += delta
+        # we do 1.0 - v to have blue on top (just a matter of taste really).
+        color = QColor.fromHsvF(1.0 - v, 1.0, 1.0)
+        gradient.setColorAt(v, color)
+
+    # Create a gradient to lighten up the center
+    radius = (size / 2) - 4
+    rg = QRadialGradient(size / 2, size / 2, radius, size / 2, size / 2)
+
+    delta = 0.1
+    v = 0.0
+    for _ in range(10):
+        v += delta
+        rg.setColorAt(v, QColor.fromHsvF(0, 0, 1.0, 1.0 - v))
+
+    with painter_on(image, True) as painter:
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QBrush(gradient))
+        painter.drawEllipse(0, 0, size, size)
+
+        # Draw the alpha channel on top of the hue.
+        painter.setBrush(QBrush(rg))
+        painter.drawEllipse(0, 0, size, size)
+
+    return image
+
+
 class _ColorWheelWidget(QPixmapWidget):
 
+    # The wheel is expensive to create (so, regenerate in a thread after a resize settles).
+    PROGRESSIVE_REGENERATION = True
+
     def __init__(self, parent, model):
         super(_ColorWheelWidget, self).__init__()
         self._model = model
@@ -461,7 +514,7 @@ class _ColorWheelWidget(QPixmapWidget):
 
         # After the pixmap is drawn, draw the selected hue/saturation.
         hue, saturation = color.hsvHueF(), color.hsvSaturationF()
-        size = self._pixmap.width()
+        size = get_pixmap_logical_size(self._pixmap)[0]
         center = self._center
         degrees = hue * 360
         distance = saturation * (size / 2)
@@ -479,73 +532,21 @@ class _ColorWheelWidget(QPixmapWidget):
             painter.setPen(Qt.black)
             painter.drawEllipse(*rect2)
 
+    @overrides(QPixmapWidget._get_pixmap_cache_params)
+    def _get_pixmap_cache_params(self):
+        # The wheel only depends on the size (so, all the wheels with the same size share it).
+        return ()
+
     @overrides(QPixmapWidget._create_pixmap)
     def _create_pixmap(self):
-        hue_pixmap = self._create_hue_pixmap()
-        return self._lighten_with_alpha(hue_pixmap)
-
-    def _lighten_with_alpha(self, hue_pixmap):
         from pyvmmonitor_qt.qt.QtGui import QPixmap
-        from pyvmmonitor_qt.qt_utils import painter_on
-        from pyvmmonitor_qt.qt.QtGui import QRadialGradient
-        from pyvmmonitor_qt.qt.QtGui import QBrush
-
-        size = self._wheel_size
-
-        # Create a gradient to lighten up the center
-        alpha_channel_pixmap = QPixmap(size, size)
-        alpha_channel_pixmap.fill(Qt.transparent)
-        radius = (size / 2) - 4
-        rg = QRadialGradient(size / 2, size / 2, radius, size / 2, size / 2)
-
-        delta = 0.1
-        v = 0.0
-        for _ in range(10):
-            v += delta
-            rg.setColorAt(v, QColor.fromHsvF(0, 0, 1.0, 1.0 - v))
-
-        with painter_on(alpha_channel_pixmap, True) as painter:
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(QBrush(rg))
-            painter.drawEllipse(0, 0, size, size)
-
-        with painter_on(hue_pixmap, True) as painter:
-            # Draw the alpha channel pixmap on top of the hue.
-            painter.drawPixmap(0, 0, alpha_channel_pixmap)
-
-        return hue_pixmap
-
-    def _create_hue_pixmap(self):
-        '''
-        Create a simple hue pixmap where we change the hue in a conical gradient.
-        '''
-        from pyvmmonitor_qt.qt.QtGui import QPixmap
-        from pyvmmonitor_qt.qt.QtGui import QBrush
-        from pyvmmonitor_qt.qt_utils import painter_on
-        from pyvmmonitor_qt.qt.QtGui import QConicalGradient
-
-        stops = 360
-        delta = 1.0 / stops
-        v = 0.0
-        size = self._wheel_size
-
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.transparent)
-
-        degrees = 360
-        gradient = QConicalGradient(size / 2, size / 2, degrees)
-        for _stop in range(stops):
-            v += delta
-            # we do 1.0 - v to have blue on top (just a matter of taste really).
-            color = QColor.fromHsvF(1.0 - v, 1.0, 1.0)
-            gradient.setColorAt(v, color)
-
-        with painter_on(pixmap, True) as painter:
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(QBrush(gradient))
-            painter.drawEllipse(0, 0, size, size)
+        return QPixmap.fromImage(
+            _create_color_wheel_image(self._wheel_size, self._device_pixel_ratio))
 
-        return pixmap
+    @overrides(QPixmapWidget._create_image_factory)
+    def _create_image_factory(self):
+        from functools import partial
+        return partial(_create_color_wheel_image, self._wheel_size, self._device_pixel_ratio)
 
     def saturation_from_point(self, x, y):
         from pyvmmonitor_core.math_utils import calculate_distance
@@ -4,79 +4,283 @@ License: LGPL
 Copyright: Brainwy Software Ltda
 '''
 import gc
+import json
+import time
 
 from pyvmmonitor_core import is_frozen
 from pyvmmonitor_core.thread_utils import is_in_main_thread
 from pyvmmonitor_qt.qt.QtCore import QObject, QTimer
 
+# Categories which are reported separately (besides the growth by type).
+CATEGORY_QT = 'qt'
+CATEGORY_CALLBACK = 'callback'
+CATEGORY_TREE_NODE = 'tree_node'
+
+
+def _type_name(tp):
+    return '%s.%s' % (tp.__module__, getattr(tp, '__qualname__', tp.__name__))
+
+
+class LeakAnalysis(object):
+    '''
+    Helper to analyze leaks: collects the number of live objects by type in snapshots and reports
+    the growth between those as well as the referrer chains of the cycles found when collecting.
+
+    All the reports are plain dicts (which may be dumped with json), i.e.:
+
+    {
+        'timestamp': float,
+        'collected': {'0': int, '1': int, '2': int},
+        'counts': {'qt': int, 'callback': int, 'tree_node': int},
+        'focus_growth': {'qt': int, 'callback': int, 'tree_node': int},
+        'growth': {'module.TypeName': int},  # Only types which grew.
+        # The distinct chains found (and how many cycles had that chain), most common first.
+        'cycles': [{'chain': ['module.TypeName', 'builtins.dict', 'module.TypeName'],
+                    'count': int}, ...],
+    }
+
+    To use it, either register it in the QtGarbageCollector with `start_leak_analysis()` (in which
+    case a report is created on each collection) or use it directly, i.e.:
+
+    analysis = LeakAnalysis()
+    baseline = analysis.take_snapshot()
+    ...
+    report = analysis.create_report(baseline)
+    assert not report['focus_growth']['qt']
+
+    :ivar output_path:
+        If given, each report is appended as a json line to the given file.
+    '''
+
+    # Only the last reports are kept in memory.
+    MAX_REPORTS = 50
+
+    # The number of distinct cycles (by their chain of type names) reported for a given collection.
+    MAX_CYCLES = 20
+
+    # Max number of objects in a referrer chain (bigger cycles are truncated).
+    MAX_CHAIN_LEN = 10
+
+    def __init__(self, output_path=None):
+        self.output_path = output_path
+        self.reports = []
+        self._last_snapshot = None
+        self._type_to_category = {}
+
+    def _get_category_classes(self):
+        from pyvmmonitor_core.callback import Callback
+        from pyvmmonitor_qt.tree.pythonic_tree_view import TreeNode
+        from pyvmmonitor_qt.qt.QtCore import QObject as _QObject
+
+        # The base class for the Qt wrappers (sip.simplewrapper/Shiboken.Object).
+        qt_wrapper_class = _QObject.__mro__[-2]
+        return ((CATEGORY_QT, qt_wrapper_class),
+                (CATEGORY_CALLBACK, Callback),
+                (CATEGORY_TREE_NODE, TreeNode))
+
+    def _get_category(self, tp, category_classes):
+        try:
+            return self._type_to_category[tp]
+        except KeyError:
+            category = None
+            for cat, cls in category_classes:
+                if issubclass(tp, cls):
+                    category = cat
+                    break
+            self._type_to_category[tp] = category
+            return category
+
+    def take_snapshot(self):
+        '''
+        :return dict(str->int):
+            A dict with the type name -> number of live objects tracked by the gc (note that
+            categories are also added as keys to the returned dict).
+        '''
+        category_classes = self._get_category_classes()
+        type_counts = {}
+        for obj in gc.get_objects():
+            tp = type(obj)
+            type_counts[tp] = type_counts.get(tp, 0) + 1
+
+        snapshot = {CATEGORY_QT: 0, CATEGORY_CALLBACK: 0, CATEGORY_TREE_NODE: 0}
+        for tp, count in type_counts.items():
+            name = _type_name(tp)
+            snapshot[name] = snapshot.get(name, 0) + count
+            category = self._get_category(tp, category_classes)
+            if category is not None:
+                snapshot[category] += count
+        return snapshot
+
+    def create_report(self, previous_snapshot=None, collected=None, cycles=None):
+        '''
+        :param previous_snapshot:
+            The snapshot to compare to (if not given the last snapshot taken by this method
+            is used).
+        '''
+        if previous_snapshot is None:
+            previous_snapshot = self._last_snapshot
+
+        snapshot = self.take_snapshot()
+        self._last_snapshot = snapshot
+
+        growth = {}
+        focus_growth = {}
+        categories = (CATEGORY_QT, CATEGORY_CALLBACK, CATEGORY_TREE_NODE)
+        if previous_snapshot is not None:
+            for name, count in snapshot.items():
+                diff = count - previous_snapshot.get(name, 0)
+                if name in categories:
+                    focus_growth[name] = diff
+                elif diff > 0:
+                    growth[name] = diff
+        else:
+            for category in categories:
+                focus_growth[category] = 0
+
+        report = {
+            'timestamp': time.time(),
+            'collected': collected or {},
+            'counts': dict((category, snapshot[category]) for category in categories),
+            'focus_growth': focus_growth,
+            'growth': growth,
+            'cycles': cycles or [],
+        }
+
+        self.reports.append(report)
+        del self.reports[:-self.MAX_REPORTS]
+
+        if self.output_path:
+            with open(self.output_path, 'a') as stream:
+                stream.write(json.dumps(report, sort_keys=True))
+                stream.write('\n')
+        return report
+
+    def get_cycles(self, garbage):
+        '''
+        :param list garbage:
+            The objects found to be unreachable (i.e.: gc.garbage with gc.DEBUG_SAVEALL).
+
+        :return list(dict):
+            A list with {'chain': list(str), 'count': int} for each distinct chain of type names
+            found (sorted by the number of cycles with that chain).
+        '''
+        id_to_obj = dict((id(obj), obj) for obj in garbage)
+        visited = set()
+        chain_to_count = {}
+
+        for obj in garbage:
+            if id(obj) in visited:
+                continue
+
+            chain = self._find_chain_back_to(obj, id_to_obj)
+            if chain:
+                visited.update(id(o) for o in chain)
+                chain = tuple(_type_name(type(o)) for o in chain)
+                count = chain_to_count.get(chain)
+                if count is not None:
+                    chain_to_count[chain] = count + 1
+                elif len(chain_to_count) < self.MAX_CYCLES:
+                    chain_to_count[chain] = 1
+
+        # Note: sorted is stable, so, chains with the same count are kept in the order found.
+        return [
+            {'chain': list(chain), 'count': count}
+            for chain, count in sorted(chain_to_count.items(), key=lambda tup: -tup[1])]
+
+    def _find_chain_back_to(self, start, id_to_obj):
+        # Breadth-first search (restricted to the garbage) until we get back to the start.
+        start_id = id(start)
+        parents = {start_id: None}
+        level = [start]
+        for _depth in range(self.MAX_CHAIN_LEN):
+            next_level = []
+            for obj in level:
+                for referent in gc.get_referents(obj):
+                    referent_id = id(referent)
+                    if referent_id == start_id:
+                        chain = [referent]
+                        curr_id = id(obj)
+                        while curr_id is not None:
+                            chain.append(id_to_obj[curr_id])
+                            curr_id = parents[curr_id]
+                        chain.reverse()
+                        return chain
+
+                    if referent_id in id_to_obj and referent_id not in parents:
+                        parents[referent_id] = id(obj)
+                        next_level.append(referent)
+            if not next_level:
+                break
+            level = next_level
+        return None
+
+    def assert_no_growth(self, report=None, max_growth=None):
+        '''
+        Helper for soak tests: raises an AssertionError if some category grew more than
+        the allowed value.
+
+        :param dict(str->int) max_growth:
+            category (or type name) -> max growth allowed (default is 0 for each category).
+        '''
+        if report is None:
+            report = self.reports[-1]
+        if max_growth is None:
+            max_growth = dict((category, 0) for category in report['focus_growth'])
+
+        errors = []
+        for name, max_allowed in max_growth.items():
+            diff = report['focus_growth'].get(name)
+            if diff is None:
+                diff = report['growth'].get(name, 0)
+            if diff > max_allowed:
+                errors.append('%s grew by %s (max allowed: %s)' % (name, diff, max_allowed))
+
+        if errors:
+            raise AssertionError('Memory growth detected:\n%s' % ('\n'.join(errors),))
+
 
 class GarbageCollector(object):
 
     def __init__(self):
         self.threshold = gc.get_threshold()
 
+        # When set (with a LeakAnalysis), each collection creates a report.
+        self.leak_analysis = None
+
     def check(self):
         assert is_in_main_thread()
-        DEBUG = False
-        # Uncomment for debug
-        if DEBUG:
-            flags = (
-                gc.DEBUG_COLLECTABLE |
-                gc.DEBUG_UNCOLLECTABLE |
-                gc.DEBUG_SAVEALL  # i.e.: put in gc.garbage!
-            )
-
-            try:
-                flags |= gc.DEBUG_INSTANCES  # @UndefinedVariable
-            except AttributeError:
-                pass
-
-            try:
-                flags |= gc.DEBUG_OBJECTS  # @UndefinedVariable
-            except AttributeError:
-                pass
-
-            try:
-                flags |= gc.DEBUG_LEAK
-            except AttributeError:
-                pass
-
-            try:
-                flags |= gc.DEBUG_STATS
-            except AttributeError:
-                pass
-
+        leak_analysis = self.leak_analysis
+        if leak_analysis is not None:
+            # i.e.: put in gc.garbage so that we can report the cycles.
+            flags = gc.DEBUG_SAVEALL
         else:
             flags = 0
 
         gc.set_debug(flags)
-        l0, l1, l2 = gc.get_count()
+        collected = {}
+        try:
+            l0, l1, l2 = gc.get_count()
 
-        if l0 > self.threshold[0]:
-            num = gc.collect(0)
-            if DEBUG:
-                print('collecting gen 0, found:', num, 'unreachable')
+            if l0 > self.threshold[0]:
+                collected['0'] = gc.collect(0)
 
-            if l1 > self.threshold[1]:
-                num = gc.collect(1)
-                if DEBUG:
-                    print('collecting gen 1, found:', num, 'unreachable')
+                if l1 > self.threshold[1]:
+                    collected['1'] = gc.collect(1)
 
-                if l2 > self.threshold[2]:
-                    num = gc.collect(2)
-                    if DEBUG:
-                        print('collecting gen 2, found:', num, 'unreachable')
+                    if l2 > self.threshold[2]:
+                        collected['2'] = gc.collect(2)
+        finally:
+            gc.set_debug(0)
 
-        # uncomment for debug
-        if DEBUG:
-            garbage = gc.garbage
-            if garbage:
-                for obj in garbage:
-                    print('Error: cycle in: %s (%r) %s' % (obj, repr(obj), type(obj)))
+        if leak_analysis is not None:
+            cycles = []
+            if gc.garbage:
+                cycles = leak_analysis.get_cycles(gc.garbage)
+                del gc.garbage[:]
+                # Now that gc.DEBUG_SAVEALL is off, actually free those.
+                gc.collect()
 
-            del gc.garbage[:]
-
-        gc.set_debug(0)
+            leak_analysis.create_report(collected=collected, cycles=cycles)
 
 
 class QtGarbageCollector(QObject):
@@ -108,9 +312,47 @@ class QtGarbageCollector(QObject):
     def check(self):
         self._collector.check()
 
+    @property
+    def leak_analysis(self):
+        return self._collector.leak_analysis
+
+    @leak_analysis.setter
+    def leak_analysis(self, leak_analysis):
+        self._collector.leak_analysis = leak_analysis
+
 
 def start_collect_only_in_ui_thread():
     gc.disable()
 
     if QtGarbageCollector.instance is None:
         QtGarbageCollector.instance = QtGarbageCollector()
+
+
+def start_leak_analysis(output_path=None):
+    '''
+    Starts reporting the growth of objects (and cycles found) on each collection done by the
+    QtGarbageCollector.
+
+    :return LeakAnalysis:
+        The analysis object (which holds the reports).
+    '''
+    start_collect_only_in_ui_thread()
+
+    leak_analysis = LeakAnalysis(output_path)
+    # Note: the first snapshot is the baseline.
+    leak_analysis.create_report()
+    QtGarbageCollector.instance.leak_analysis = leak_analysis
+    return leak_analysis
+
+
+def stop_leak_analysis():
+    '''
+    :return LeakAnalysis:
+        The analysis which was stopped (or None if it wasn't started).
+    '''
+    instance = QtGarbageCollector.instance
+    if instance is None:
+        return None
+    leak_analysis = instance.leak_analysis
+    instance.leak_analysis = None
+    return leak_analysis
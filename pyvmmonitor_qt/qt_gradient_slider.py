@@ -22,7 +22,7 @@ import logging
 
 from pyvmmonitor_core import overrides
 from pyvmmonitor_core.props import PropsCustomProperty, PropsObject
-from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget
+from pyvmmonitor_qt.qt_pixmap_widget import QPixmapWidget, get_pixmap_logical_size
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +73,9 @@ class QGradientSlider(QPixmapWidget):
     # Will delegate the setters/getters to our properties
     PropsObject.delegate_to_props('value', 'min_value', 'max_value')
 
+    # While resizing, show the last pixmap scaled (regenerated after the resize settles).
+    PROGRESSIVE_REGENERATION = True
+
     def __init__(self, *args, **kwargs):
         from pyvmmonitor_core.callback import Callback
         from pyvmmonitor_qt.qt.QtGui import QColor
@@ -124,6 +127,11 @@ class QGradientSlider(QPixmapWidget):
             self.on_value(self, new_val)
         self.update()
 
+    @overrides(QPixmapWidget._get_pixmap_cache_params)
+    def _get_pixmap_cache_params(self):
+        # Sliders with the same stops (and size) share the pixmap.
+        return tuple((float(i), color.rgba()) for i, color in self._gradient_stops)
+
     @overrides(QPixmapWidget._create_pixmap)
     def _create_pixmap(self):
         '''
@@ -133,18 +141,18 @@ class QGradientSlider(QPixmapWidget):
         from pyvmmonitor_qt.qt.QtCore import Qt
         from pyvmmonitor_qt.qt_utils import painter_on
         from pyvmmonitor_qt.qt.QtGui import QBrush
-        from pyvmmonitor_qt import qt_painter_path
-        from pyvmmonitor_qt.qt_pixmap_widget import create_tiled_pixmap
+        from pyvmmonitor_qt.qt_pixmap_widget import create_device_pixmap, create_tiled_pixmap
         w, h = self._w, self._h
-        triangle_size = int(min(w, h) * .3)
-        if triangle_size < 10:
-            triangle_size = 10
-        w *= .9
-        h *= .9
-
-        # pixmap = QPixmap(w, h)
-        # Note: we could do the tiling only if there was actually some alpha.
-        pixmap = create_tiled_pixmap(w, h, min(w, h) // 3)
+        w = int(w * .9)
+        h = int(h * .9)
+        device_pixel_ratio = self._device_pixel_ratio
+
+        # Note: the tiling (a cached brush) is only needed if there's actually some alpha.
+        if any(color.alpha() != 255 for _i, color in self._gradient_stops):
+            pixmap = create_tiled_pixmap(
+                w, h, min(w, h) // 3, device_pixel_ratio=device_pixel_ratio)
+        else:
+            pixmap = create_device_pixmap(w, h, device_pixel_ratio)
         gradient = QLinearGradient(0, h // 2, w, h // 2)
         gradient.setStops(self._gradient_stops)
         with painter_on(pixmap, True) as painter:
@@ -152,12 +160,21 @@ class QGradientSlider(QPixmapWidget):
             painter.setPen(Qt.NoPen)
             painter.drawRect(0, 0, w, h)
 
-        self._triangle_path = qt_painter_path.create_equilateral_triangle_painter_path(
-            triangle_size)
-        self._triangle_size = triangle_size
-
         return pixmap
 
+    def _get_triangle_path(self):
+        # Note: not created along with the pixmap as the pixmap may be shared by another slider.
+        from pyvmmonitor_qt import qt_painter_path
+        triangle_size = int(min(self._w, self._h) * .3)
+        if triangle_size < 10:
+            triangle_size = 10
+
+        if triangle_size != self._triangle_size:
+            self._triangle_path = qt_painter_path.create_equilateral_triangle_painter_path(
+                triangle_size)
+            self._triangle_size = triangle_size
+        return self._triangle_path
+
     @overrides(QPixmapWidget.paintEvent)
     def paintEvent(self, ev):
         from pyvmmonitor_qt.qt_utils import painter_on
@@ -167,18 +184,19 @@ class QGradientSlider(QPixmapWidget):
 
         QPixmapWidget.paintEvent(self, ev)
         pixmap = self._pixmap
-        triangle_path = self._triangle_path
         pixmap_offset = self._pixmap_offset
-        if pixmap is None or triangle_path is None or pixmap_offset is None:
+        if pixmap is None or pixmap_offset is None:
             return
+        triangle_path = self._get_triangle_path()
+        pixmap_width, pixmap_height = get_pixmap_logical_size(pixmap)
 
         # After painting, also show the value selected.
         with painter_on(self, True) as painter:
             painter.setPen(Qt.lightGray)
 
             translation = [pixmap_offset[0], pixmap_offset[1]]
-            translation[1] += (pixmap.height() + 2)
-            translation[0] += (self.normalized_value * pixmap.width())  # calculate the position
+            translation[1] += (pixmap_height + 2)
+            translation[0] += (self.normalized_value * pixmap_width)  # calculate the position
             translation[0] -= (self._triangle_size / 2)
 
             path = triangle_path.translated(translation[0], translation[1])
@@ -198,7 +216,7 @@ class QGradientSlider(QPixmapWidget):
 
         x -= pixmap_offset[0]
 
-        normalized = x / pixmap.width()
+        normalized = x / get_pixmap_logical_size(pixmap)[0]
         if normalized < 0:
             normalized = 0
         if normalized > 1:
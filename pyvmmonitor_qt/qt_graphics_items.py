@@ -3,6 +3,9 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+import math
+from array import array
+from collections import OrderedDict
 from contextlib import contextmanager
 
 from pyvmmonitor_core import overrides
@@ -13,9 +16,13 @@ from pyvmmonitor_qt.qt import QtCore
 from pyvmmonitor_qt.qt.QtCore import QPointF, QRectF, Qt
 from pyvmmonitor_qt.qt.QtGui import QBrush, QColor, QPen
 from pyvmmonitor_qt.qt.QtSvg import QGraphicsSvgItem
-from pyvmmonitor_qt.qt.QtWidgets import (QGraphicsEllipseItem,
+from pyvmmonitor_qt.qt.QtWidgets import (QGraphicsEllipseItem, QGraphicsItem,
                                          QGraphicsPathItem, QGraphicsRectItem)
 from pyvmmonitor_qt.qt_event_loop import execute_on_next_event_loop
+from pyvmmonitor_qt.qt_level_of_detail import (LOD_AGGREGATED, LOD_FULL, LOD_HIDDEN,
+                                               LevelOfDetailBand, is_culled)
+from pyvmmonitor_qt.qt_paint_profiler import profile_item_paint
+from pyvmmonitor_qt.qt_spatial_index import GridSpatialIndex
 from pyvmmonitor_qt.qt_transform import calculate_size_for_value_in_px
 
 
@@ -31,21 +38,112 @@ def create_graphics_item_rect(rect, fill_color=None, alpha=255, pen=None, parent
     return rect_item
 
 
-def set_graphics_item_pen(item, pen=None):
+# ==================================================================================================
+# Pens/brushes cache
+#
+# The pens and brushes used by the items are interned so that items with the same colors share
+# the same instances (and changing the colors, i.e.: on hover, doesn't need to allocate new ones).
+#
+# Note: the returned instances are shared, so, they must not be changed (create a copy if needed).
+# ==================================================================================================
+_MAX_CACHED_PENS_AND_BRUSHES = 512
+
+# The caches below are LRU caches (most recently used last).
+_cached_pens = OrderedDict()
+_cached_brushes = OrderedDict()
+
+
+def _get_pen_cache_key(pen):
+    style = pen.style()
+    if style == Qt.CustomDashLine:
+        dash_pattern = tuple(pen.dashPattern())
+    else:
+        dash_pattern = None
+
+    return (
+        pen.color().rgba(),
+        pen.widthF(),
+        style,
+        pen.capStyle(),
+        pen.joinStyle(),
+        pen.isCosmetic(),
+        dash_pattern,
+        pen.dashOffset(),
+    )
+
+
+def get_cached_pen(pen=None):
+    '''
+    :param QPen pen:
+        The pen to be interned (if None a black pen is used).
+
+    :return QPen:
+        A shared pen which is equal to the given pen.
+    '''
+    if pen is None:
+        key = None
+    else:
+        if pen.brush().style() != Qt.SolidPattern:
+            return pen  # Gradients/textures are not cached.
+        key = _get_pen_cache_key(pen)
+
+    cached = _cached_pens.pop(key, None)
+    if cached is not None:
+        _cached_pens[key] = cached  # Re-add as the most recently used.
+        return cached
+
     if pen is None:
         pen = QPen(QColor(Qt.black))
-    item.setPen(pen)
+    else:
+        pen = QPen(pen)  # Copy (so that changes in the original pen don't affect the cache).
 
+    _cached_pens[key] = pen
+    while len(_cached_pens) > _MAX_CACHED_PENS_AND_BRUSHES:
+        _cached_pens.popitem(last=False)
+    return pen
 
-def set_graphics_item_brush(item, fill_color=None, alpha=255):
+
+def get_cached_brush(fill_color=None, alpha=255, style=Qt.SolidPattern):
     '''
+    :param QColor fill_color:
+        The color of the brush (if None, white is used). Note that the color itself isn't changed.
+
     :param alpha: 255 means opaque, 0 means transparent.
+
+    :return QBrush:
+        A shared brush with the given color/alpha/style.
     '''
     if fill_color is None:
-        fill_color = QColor(Qt.white)
-    fill_color.setAlpha(alpha)
-    brush = QBrush(fill_color)
-    item.setBrush(brush)
+        rgb = None
+    else:
+        rgb = fill_color.rgb()
+    key = (rgb, alpha, style)
+
+    brush = _cached_brushes.pop(key, None)
+    if brush is not None:
+        _cached_brushes[key] = brush  # Re-add as the most recently used.
+        return brush
+
+    if fill_color is None:
+        color = QColor(Qt.white)
+    else:
+        color = QColor(fill_color)
+    color.setAlpha(alpha)
+    brush = _cached_brushes[key] = QBrush(color, style)
+    while len(_cached_brushes) > _MAX_CACHED_PENS_AND_BRUSHES:
+        _cached_brushes.popitem(last=False)
+    return brush
+
+
+def set_graphics_item_pen(item, pen=None):
+    item.setPen(get_cached_pen(pen))
+
+
+def set_graphics_item_brush(item, fill_color=None, alpha=255):
+    '''
+    :param alpha: 255 means opaque, 0 means transparent.
+    '''
+    item.setBrush(get_cached_brush(fill_color, alpha))
 
 
 def set_graphics_item_colors(item, pen=None, fill_color=None, alpha=255):
@@ -64,6 +162,175 @@ def set_graphics_item_colors(item, pen=None, fill_color=None, alpha=255):
 # ==================================================================================================
 
 
+class _ItemStyle(object):
+    '''
+    The colors/radius of an item in some state (regular or hover).
+
+    Instances are shared among items with the same style, so, they must not be changed.
+    '''
+
+    __slots__ = [
+        'pen',
+        'fill_color',
+        'alpha',
+        'radius_in_px',
+        'qpen',
+        'qbrush',
+    ]
+
+    def __init__(self, pen, fill_color, alpha, radius_in_px):
+        self.pen = pen
+        self.fill_color = fill_color
+        self.alpha = alpha
+        self.radius_in_px = radius_in_px
+
+        # The actual (shared) pen and brush to be used.
+        self.qpen = get_cached_pen(pen)
+        self.qbrush = get_cached_brush(fill_color, alpha)
+
+
+_cached_item_styles = OrderedDict()  # LRU cache (most recently used last).
+
+
+def _get_item_style(pen, fill_color, alpha, radius_in_px):
+    if pen is None:
+        pen_key = None
+    elif pen.brush().style() != Qt.SolidPattern:
+        return _ItemStyle(pen, fill_color, alpha, radius_in_px)  # Not cached.
+    else:
+        pen_key = _get_pen_cache_key(pen)
+
+    key = (pen_key, None if fill_color is None else fill_color.rgb(), alpha, radius_in_px)
+    style = _cached_item_styles.pop(key, None)
+    if style is not None:
+        _cached_item_styles[key] = style  # Re-add as the most recently used.
+        return style
+
+    style = _cached_item_styles[key] = _ItemStyle(pen, fill_color, alpha, radius_in_px)
+    while len(_cached_item_styles) > _MAX_CACHED_PENS_AND_BRUSHES:
+        _cached_item_styles.popitem(last=False)
+    return style
+
+
+def _accept_no_mouse_press(event):
+    return False
+
+
+class _ItemState(object):
+    '''
+    Holds the state of the custom items (kept in a single object with __slots__ to keep the
+    memory per item low as we may have many items).
+    '''
+
+    __slots__ = [
+        'graphics_widget',
+
+        'center',
+        'radius_in_px',
+        'pixels_displacement',
+
+        'last_radius',
+        'last_center',
+        'last_pixels_displacement',
+        'last_transform',
+
+        'regular_style',
+        'hover_style',  # None if there's no custom hover.
+
+        'delay_update',
+
+        'accept_mouse_press',
+
+        # Callbacks are only created on the first access (through _LazyCallbackProperty).
+        'on_enter_hover',
+        'on_leave_hover',
+        'on_mouse_press',
+        'on_mouse_move',
+        'on_mouse_release',
+
+        # Below the min zoom or the min size on screen the item isn't painted.
+        'lod_min_zoom',
+        'lod_min_size_in_px',
+
+        # Only used by some items.
+        'rotation_in_radians',
+        'base_scale',
+        'qimage',
+        'pen',
+        'brush',
+        'renderer',
+        'simplified_paths',
+    ]
+
+    def __init__(self, graphics_widget, center, radius_in_px, pixels_displacement, regular_style):
+        self.graphics_widget = graphics_widget
+
+        self.center = center
+        self.radius_in_px = radius_in_px
+        self.pixels_displacement = pixels_displacement
+
+        self.last_radius = None
+        self.last_center = None
+        self.last_pixels_displacement = None
+        self.last_transform = None
+
+        self.regular_style = regular_style
+        self.hover_style = None
+
+        self.delay_update = 0
+
+        # May be changed for a function and if True is returned, the mouse press
+        # is accepted.
+        self.accept_mouse_press = _accept_no_mouse_press
+
+        self.on_enter_hover = None
+        self.on_leave_hover = None
+        self.on_mouse_press = None
+        self.on_mouse_move = None
+        self.on_mouse_release = None
+
+        self.lod_min_zoom = 0.0
+        self.lod_min_size_in_px = 0
+
+        self.rotation_in_radians = 0.0
+        self.base_scale = 1.0
+        self.qimage = None
+        self.pen = None
+        self.brush = None
+        self.renderer = None
+        self.simplified_paths = None
+
+
+class _LazyCallbackProperty(object):
+    '''
+    Provides the Callback with the given name for the item (created only when first accessed).
+    '''
+
+    def __init__(self, name):
+        self._name = name
+
+    def __get__(self, item, owner=None):
+        if item is None:
+            return self
+        state = item._state
+        callback = getattr(state, self._name)
+        if callback is None:
+            callback = Callback()
+            setattr(state, self._name, callback)
+        return callback
+
+
+class _AcceptMousePressProperty(object):
+
+    def __get__(self, item, owner=None):
+        if item is None:
+            return self
+        return item._state.accept_mouse_press
+
+    def __set__(self, item, accept_mouse_press):
+        item._state.accept_mouse_press = accept_mouse_press
+
+
 def _init_item(
         item,
         center,
@@ -72,138 +339,240 @@ def _init_item(
         fill_color,
         alpha,
         pixels_displacement=(0, 0),
-        graphics_widget=None):
+        graphics_widget=None,
+        fixed_pixels=True):
     '''
     :param alpha: 255 means opaque, 0 means transparent.
-    '''
-
-    item._center = center
-    item._radius_in_px = radius_in_px
-    item._pixels_displacement = pixels_displacement
-
-    item._last_radius = None
-    item._last_center = None
-    item._last_pixels_displacement = None
-    item._last_transform = None
-
-    item._custom_hover = False
-    item._hover_pen = None
-    item._hover_fill_color = None
-    item._hover_alpha = None
-    item._hover_radius_in_px = None
 
-    item._regular_pen = pen
-    item._regular_fill_color = fill_color
-    item._regular_alpha = alpha
-    item._regular_radius_in_px = radius_in_px
-
-    # May be changed for a function and if True is returned, the mouse press
-    # is accepted.
-    item.accept_mouse_press = lambda event: False
-
-    item.on_enter_hover = Callback()
-    item.on_leave_hover = Callback()
-
-    item.on_mouse_press = Callback()
-    item.on_mouse_move = Callback()
-    item.on_mouse_release = Callback()
-
-    item._delay_update = 0
+    :param fixed_pixels:
+        Whether the item representation depends on the zoom (i.e.: it has a size in pixels).
+    '''
+    assert graphics_widget is not None
+    state = item._state = _ItemState(
+        get_weakref(graphics_widget),
+        center,
+        radius_in_px,
+        pixels_displacement,
+        _get_item_style(pen, fill_color, alpha, radius_in_px))
 
     if hasattr(item, 'setPen'):
-        set_graphics_item_colors(item, pen, fill_color, alpha)
+        item.setPen(state.regular_style.qpen)
+        item.setBrush(state.regular_style.qbrush)
 
-    assert graphics_widget is not None
-    item._graphics_widget = get_weakref(graphics_widget)
+    if fixed_pixels:
+        # When available, let the graphics widget update all the items in a single pass when
+        # the zoom changes (instead of having each item detect it when painting).
+        register_fixed_pixels_item = getattr(graphics_widget, 'register_fixed_pixels_item', None)
+        if register_fixed_pixels_item is not None:
+            register_fixed_pixels_item(item)
+
+    # i.e.: the view may have chosen to cache the items (see: qt_viewport_tuning).
+    apply_item_cache_mode = getattr(graphics_widget, 'apply_item_cache_mode', None)
+    if apply_item_cache_mode is not None:
+        apply_item_cache_mode((item,))
 
     # Needed to set the real position in pixels for the radius and pixels displacement.
     item._update_with_graphics_widget()
 
 
 def _mouse_press_event_item(item, event):
-    if item.accept_mouse_press(event):
+    state = item._state
+    if state.accept_mouse_press(event):
         event.accept()
-        item.on_mouse_press(item, event)
+        if state.on_mouse_press is not None:
+            state.on_mouse_press(item, event)
 
 
 def _mouse_move_event_item(item, event):
     event.accept()
-    item.on_mouse_move(item, event)
+    on_mouse_move = item._state.on_mouse_move
+    if on_mouse_move is not None:
+        on_mouse_move(item, event)
 
 
 def _mouse_release_event_item(item, event):
     event.accept()
-    item.on_mouse_release(item, event)
+    on_mouse_release = item._state.on_mouse_release
+    if on_mouse_release is not None:
+        on_mouse_release(item, event)
 
 
 def _set_radius_in_px_item(item, radius_in_px):
-    force = item._radius_in_px != radius_in_px
-    item._radius_in_px = radius_in_px
+    state = item._state
+    force = state.radius_in_px != radius_in_px
+    state.radius_in_px = radius_in_px
     item._update_with_graphics_widget(force=force)
 
 
 def _set_center_item(item, center):
-    force = item._center != center
-    item._center = center
+    state = item._state
+    force = state.center != center
+    state.center = center
     item._update_with_graphics_widget(force=force)
 
 
 def _set_pixels_displacement_item(item, pixels_displacement):
-    force = item._pixels_displacement != pixels_displacement
-    item._pixels_displacement = pixels_displacement
+    state = item._state
+    force = state.pixels_displacement != pixels_displacement
+    state.pixels_displacement = pixels_displacement
+    item._update_with_graphics_widget(force=force)
+
+
+def _set_rotation_in_radians_item(item, rotation_in_radians):
+    state = item._state
+    force = state.rotation_in_radians != rotation_in_radians
+    state.rotation_in_radians = rotation_in_radians
     item._update_with_graphics_widget(force=force)
 
 
+@contextmanager
+def _delayed_update_item(item):
+    state = item._state
+    state.delay_update += 1
+    yield
+    state.delay_update -= 1
+    if state.delay_update == 0:
+        item._update_with_graphics_widget()
+
+
 def _update_with_graphics_widget_item(item, force=False):
-    if item._delay_update:
+    state = item._state
+    if state.delay_update:
         return
 
-    g = item._graphics_widget()
+    g = state.graphics_widget()
     if g is not None:
         _update_info(item, g, force=force)
 
 
 def _update(item, radius, pixels_displacement, transform, force=False):
-    center = item._center
-
-    if force or radius != item._last_radius or center != item._last_center or \
-            pixels_displacement != item._last_pixels_displacement or \
-            transform != item._last_transform:
-        item._last_radius = radius
-        item._last_center = center
-        item._last_pixels_displacement = pixels_displacement
-        item._last_transform = transform
+    state = item._state
+    center = state.center
+
+    if force or radius != state.last_radius or center != state.last_center or \
+            pixels_displacement != state.last_pixels_displacement or \
+            transform != state.last_transform:
+        state.last_radius = radius
+        state.last_center = center
+        state.last_pixels_displacement = pixels_displacement
+        state.last_transform = transform
         item.set_position(center, radius, pixels_displacement)
+        _update_spatial_index(item, center, pixels_displacement)
+
+
+def _update_spatial_index(item, center, pixels_displacement):
+    g = item._state.graphics_widget()
+    if g is None:
+        return
+    get_spatial_index = getattr(g, 'get_spatial_index', None)
+    if get_spatial_index is None:
+        return  # Not a ZoomableGraphicsView.
+
+    x = center[0] + pixels_displacement[0]
+    y = center[1] + pixels_displacement[1]
+    parent_item = item.parentItem()
+    if parent_item is not None:
+        scene_point = parent_item.mapToScene(x, y)
+        x, y = scene_point.x(), scene_point.y()
+    get_spatial_index().update_item(item, (x, y))
 
 
 def _update_info(item, graphics_widget, force=False):
     if not qt_utils.is_qobject_alive(graphics_widget):
         return
     transform = graphics_widget.transform()
-    pixels_displacement = item._pixels_displacement
+    px_to_scene = calculate_size_for_value_in_px(transform, 1.0)
+    _update_info_with_transform(item, transform, px_to_scene, force=force)
+
+
+def _update_info_with_transform(item, transform, px_to_scene, force=False):
+    state = item._state
+    pixels_displacement = state.pixels_displacement
     if pixels_displacement != (0, 0):
         pixels_displacement = (
-            calculate_size_for_value_in_px(transform, pixels_displacement[0]),
-            calculate_size_for_value_in_px(transform, pixels_displacement[1]),
+            px_to_scene * pixels_displacement[0],
+            px_to_scene * pixels_displacement[1],
         )
 
-    radius = calculate_size_for_value_in_px(transform, item._radius_in_px)
+    radius = px_to_scene * state.radius_in_px
     _update(item, radius, pixels_displacement, transform, force=force)
 
 
-def _before_paint_item(item, painter, widget):
-    from pyvmmonitor_qt.qt_utils import set_painter_antialiased
-    set_painter_antialiased(painter, True, widget)
+def _update_with_transform_item(item, transform, px_to_scene):
+    # Called by the graphics widget (with the px->scene already computed) when the zoom changes.
+    if item._state.delay_update:
+        return
+    _update_info_with_transform(item, transform, px_to_scene)
 
-    g = item._graphics_widget()
+
+# Used when the graphics widget has no level of detail policy.
+_FULL_LOD_BAND = LevelOfDetailBand(0.0, LOD_FULL, True)
+
+
+def _before_paint_item(item, painter, widget):
+    '''
+    :return LevelOfDetailBand:
+        The band with which the item should be painted (or None if it shouldn't be painted).
+    '''
+    state = item._state
+    g = state.graphics_widget()
     if g is not None:
         transform = g.transform()
-        if transform != item._last_transform:
+        if transform != state.last_transform:
             # Note: updating on paint doesn't work well (bug was: when item goes out of the
             # window and then back, it is no longer shown).
             # So, always ask to update on next event.
             execute_on_next_event_loop(item._update_with_graphics_widget)
 
+    band = _get_level_of_detail_band_item(item, g)
+    if band is not None:
+        qt_utils.set_painter_antialiased(painter, band.antialiased, widget)
+    return band
+
+
+def _get_level_of_detail_band_item(item, graphics_widget):
+    if graphics_widget is None:
+        return _FULL_LOD_BAND
+
+    get_level_of_detail_band = getattr(graphics_widget, 'get_level_of_detail_band', None)
+    if get_level_of_detail_band is None:
+        return _FULL_LOD_BAND
+
+    band = get_level_of_detail_band()
+    if band.level == LOD_HIDDEN:
+        return None
+
+    state = item._state
+    if state.lod_min_zoom or state.lod_min_size_in_px:
+        size_in_scene = 0.0
+        if state.lod_min_size_in_px:
+            rect = item.sceneBoundingRect()
+            size_in_scene = max(rect.width(), rect.height())
+        if is_culled(state.lod_min_zoom, state.lod_min_size_in_px,
+                     graphics_widget.transform().m11(), size_in_scene):
+            return None
+    return band
+
+
+def _set_level_of_detail_item(item, min_zoom=0.0, min_size_in_px=0):
+    state = item._state
+    state.lod_min_zoom = min_zoom
+    state.lod_min_size_in_px = min_size_in_px
+    item.update()
+
+
+def _paint_simplified_item(item, painter):
+    # The shape filled with the brush (or the pen color if there's no brush) without the outline.
+    brush = item.brush()
+    if brush.style() == Qt.NoBrush:
+        brush = get_cached_brush(item.pen().color())
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(brush)
+    if isinstance(item, QGraphicsEllipseItem):
+        painter.drawEllipse(item.rect())
+    else:
+        painter.drawRect(item.rect())
+
 
 def _configure_hover_item(
         item,
@@ -211,52 +580,50 @@ def _configure_hover_item(
         hover_fill_color=None,
         hover_alpha=255,
         hover_radius_in_px=None):
-    item._custom_hover = True
-    item._hover_pen = hover_pen
-    item._hover_fill_color = hover_fill_color
-    item._hover_alpha = hover_alpha
-    item._hover_radius_in_px = hover_radius_in_px
+    item._state.hover_style = _get_item_style(
+        hover_pen, hover_fill_color, hover_alpha, hover_radius_in_px)
     item.setAcceptHoverEvents(True)
 
 
 def _unconfigure_hover_item(item):
-    item._custom_hover = False
+    state = item._state
+    state.hover_style = None
     item.setAcceptHoverEvents(False)
     # Restore pre-hover values
-    item._radius_in_px = item._regular_radius_in_px
-    set_graphics_item_colors(
-        item,
-        item._regular_pen,
-        item._regular_fill_color,
-        item._regular_alpha)
+    regular_style = state.regular_style
+    state.radius_in_px = regular_style.radius_in_px
+    item.setPen(regular_style.qpen)
+    item.setBrush(regular_style.qbrush)
 
 
 def _before_hover_enter_event(item, event):
-    if item._custom_hover:
-        if item._hover_radius_in_px is not None:
-            item._radius_in_px = item._hover_radius_in_px
+    state = item._state
+    hover_style = state.hover_style
+    if hover_style is not None:
+        if hover_style.radius_in_px is not None:
+            state.radius_in_px = hover_style.radius_in_px
             execute_on_next_event_loop(item._update_with_graphics_widget)
 
-        set_graphics_item_colors(
-            item,
-            item._hover_pen,
-            item._hover_fill_color,
-            item._hover_alpha)
-    item.on_enter_hover(item)
+        item.setPen(hover_style.qpen)
+        item.setBrush(hover_style.qbrush)
+
+    if state.on_enter_hover is not None:
+        state.on_enter_hover(item)
 
 
 def _before_hover_leave_event(item, event):
-    if item._custom_hover:
-        if item._radius_in_px != item._regular_radius_in_px:
-            item._radius_in_px = item._regular_radius_in_px
+    state = item._state
+    if state.hover_style is not None:
+        regular_style = state.regular_style
+        if state.radius_in_px != regular_style.radius_in_px:
+            state.radius_in_px = regular_style.radius_in_px
             execute_on_next_event_loop(item._update_with_graphics_widget)
 
-        set_graphics_item_colors(
-            item,
-            item._regular_pen,
-            item._regular_fill_color,
-            item._regular_alpha)
-    item.on_leave_hover(item)
+        item.setPen(regular_style.qpen)
+        item.setBrush(regular_style.qbrush)
+
+    if state.on_leave_hover is not None:
+        state.on_leave_hover(item)
 
 
 # ==================================================================================================
@@ -264,6 +631,15 @@ def _before_hover_leave_event(item, event):
 # ==================================================================================================
 class _CustomGraphicsSquareItem(QGraphicsRectItem):
 
+    # Callbacks (created on first access).
+    on_enter_hover = _LazyCallbackProperty('on_enter_hover')
+    on_leave_hover = _LazyCallbackProperty('on_leave_hover')
+    on_mouse_press = _LazyCallbackProperty('on_mouse_press')
+    on_mouse_move = _LazyCallbackProperty('on_mouse_move')
+    on_mouse_release = _LazyCallbackProperty('on_mouse_release')
+
+    accept_mouse_press = _AcceptMousePressProperty()
+
     def __init__(
             self,
             parent_item,
@@ -275,8 +651,6 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
             pixels_displacement=(0, 0),
             graphics_widget=None):
         QGraphicsRectItem.__init__(self, parent_item)
-        self._qimage = None
-        self._rotation_in_radians = 0.0
         _init_item(
             self,
             center,
@@ -287,13 +661,8 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
             pixels_displacement,
             graphics_widget)
 
-    @contextmanager
     def delayed_update(self):
-        self._delay_update += 1
-        yield
-        self._delay_update -= 1
-        if self._delay_update == 0:
-            self._update_with_graphics_widget()
+        return _delayed_update_item(self)
 
     def mousePressEvent(self, event):
         _mouse_press_event_item(self, event)
@@ -308,7 +677,7 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
         _set_radius_in_px_item(self, radius_in_px)
 
     def get_radius_in_px(self):
-        return self._radius_in_px
+        return self._state.radius_in_px
 
     def set_center(self, center):
         _set_center_item(self, center)
@@ -317,24 +686,47 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
         _set_pixels_displacement_item(self, pixels_displacement)
 
     def get_pixels_displacement(self):
-        return self._pixels_displacement
+        return self._state.pixels_displacement
 
     def get_center(self):
-        return self._center
+        return self._state.center
 
     def _update_with_graphics_widget(self, force=False):
         _update_with_graphics_widget_item(self, force=force)
 
+    def _update_with_transform(self, transform, px_to_scene):
+        _update_with_transform_item(self, transform, px_to_scene)
+
+    def set_level_of_detail(self, min_zoom=0.0, min_size_in_px=0):
+        '''
+        :param float min_zoom:
+            Below this zoom the item is not painted.
+
+        :param int min_size_in_px:
+            If the item is smaller than this size on screen it's not painted.
+        '''
+        _set_level_of_detail_item(self, min_zoom, min_size_in_px)
+
+    def paint_simplified(self, painter, option, widget=None):
+        _paint_simplified_item(self, painter)
+
     @overrides(QGraphicsRectItem.paint)
+    @profile_item_paint
     def paint(self, painter, option, widget=None):
-        _before_paint_item(self, painter, widget)
+        band = _before_paint_item(self, painter, widget)
+        if band is None:
+            return
+        if band.level != LOD_FULL:
+            self.paint_simplified(painter, option, widget)
+            return
 
         r = self.rect()
-        if self._qimage is not None:
+        qimage = self._state.qimage
+        if qimage is not None:
             painter.drawImage(
                 r,
-                self._qimage,
-                QRectF(0, 0, self._qimage.width(), self._qimage.height()))
+                qimage,
+                QRectF(0, 0, qimage.width(), qimage.height()))
 
         QGraphicsRectItem.paint(self, painter, option, widget)
 
@@ -358,7 +750,7 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
         return QGraphicsRectItem.hoverLeaveEvent(self, event)
 
     def set_qimage(self, qimage):
-        self._qimage = qimage
+        self._state.qimage = qimage
 
     def set_position(self, center, radius, pixels_displacement):
         x = center[0] + pixels_displacement[0]
@@ -368,12 +760,136 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
 
         import math
         self.setTransformOriginPoint(QPointF(x, y))
-        self.setRotation(math.degrees(self._rotation_in_radians))
+        self.setRotation(math.degrees(self._state.rotation_in_radians))
 
     def set_rotation_in_radians(self, rotation_in_radians):
-        force = self._rotation_in_radians != rotation_in_radians
-        self._rotation_in_radians = rotation_in_radians
-        self._update_with_graphics_widget(force=force)
+        _set_rotation_in_radians_item(self, rotation_in_radians)
+
+
+# ==================================================================================================
+# SvgPixmapCache
+# ==================================================================================================
+class SvgPixmapCache(object):
+    '''
+    A LRU cache with the rasterized svgs used by the fixed pixels svg items (as the size in pixels
+    of those doesn't change on zoom, the svg is rasterized once and just blitted afterwards).
+
+    Entries are keyed by (renderer, size in pixels, device pixel ratio, rotation bucket) and the
+    entries related to a renderer are invalidated when it's reloaded (i.e.: on a theme switch).
+    '''
+
+    # Rotations are rasterized in buckets of 1 degree.
+    ROTATION_BUCKETS = 360
+
+    # Svgs bigger than this (in pixels) are not cached (just painted directly).
+    MAX_PIXMAP_SIZE = 1024
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self._renderer_ids = set()
+
+    def _on_renderer_changed(self, renderer_id):
+        for key in list(self._cache):
+            if key[0] == renderer_id:
+                self._remove(key)
+
+    def _on_renderer_destroyed(self, renderer_id):
+        self._on_renderer_changed(renderer_id)
+        self._renderer_ids.discard(renderer_id)
+
+    def _track_renderer(self, renderer):
+        renderer_id = id(renderer)
+        if renderer_id not in self._renderer_ids:
+            self._renderer_ids.add(renderer_id)
+            # Note: don't reference the renderer in the lambdas.
+            renderer.repaintNeeded.connect(lambda: self._on_renderer_changed(renderer_id))
+            renderer.destroyed.connect(lambda *args: self._on_renderer_destroyed(renderer_id))
+        return renderer_id
+
+    def _remove(self, key):
+        pixmap, _offset = self._cache.pop(key)
+        self._bytes -= self._get_pixmap_bytes(pixmap)
+
+    def _get_pixmap_bytes(self, pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def clear(self):
+        self._cache.clear()
+        self._bytes = 0
+
+    def get_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get_pixmap(self, renderer, width_px, height_px, device_pixel_ratio, rotation_bucket):
+        '''
+        :return tuple(QPixmap, tuple(float, float)):
+            The pixmap with the rasterized svg (rotated based on the rotation bucket) and the
+            offset of the center of the svg inside the pixmap (in logical pixels).
+        '''
+        renderer_id = self._track_renderer(renderer)
+        key = (renderer_id, width_px, height_px, device_pixel_ratio, rotation_bucket)
+        cache = self._cache
+        try:
+            entry = cache.pop(key)
+        except KeyError:
+            entry = self._rasterize(
+                renderer, width_px, height_px, device_pixel_ratio, rotation_bucket)
+            self._bytes += self._get_pixmap_bytes(entry[0])
+
+            while self._bytes > self.max_bytes and cache:
+                self._remove(next(iter(cache)))
+
+        cache[key] = entry  # Add (or re-add) as the most recently used.
+        return entry
+
+    def _rasterize(self, renderer, width_px, height_px, device_pixel_ratio, rotation_bucket):
+        from pyvmmonitor_qt.qt.QtGui import QImage, QPainter, QPixmap
+
+        angle = rotation_bucket * (360. / self.ROTATION_BUCKETS)
+        radians = math.radians(angle)
+        cos = abs(math.cos(radians))
+        sin = abs(math.sin(radians))
+
+        # Bounding box of the rotated svg (with some room for antialiasing).
+        w = width_px * cos + height_px * sin + 2
+        h = width_px * sin + height_px * cos + 2
+
+        image = QImage(
+            int(math.ceil(w * device_pixel_ratio)),
+            int(math.ceil(h * device_pixel_ratio)),
+            QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        try:
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+            painter.scale(device_pixel_ratio, device_pixel_ratio)
+            painter.translate(w / 2., h / 2.)
+            painter.rotate(angle)
+            renderer.render(
+                painter, QRectF(-width_px / 2., -height_px / 2., width_px, height_px))
+        finally:
+            painter.end()
+
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        return pixmap, (w / 2., h / 2.)
+
+
+_svg_pixmap_cache = SvgPixmapCache()
+
+
+def get_svg_pixmap_cache():
+    '''
+    :return SvgPixmapCache:
+        The cache used by the fixed pixels svg items (its max_bytes may be changed to configure
+        the memory budget).
+    '''
+    return _svg_pixmap_cache
 
 
 # ==================================================================================================
@@ -381,6 +897,15 @@ class _CustomGraphicsSquareItem(QGraphicsRectItem):
 # ==================================================================================================
 class _CustomGraphicsSvgItem(QGraphicsSvgItem):
 
+    # Callbacks (created on first access).
+    on_enter_hover = _LazyCallbackProperty('on_enter_hover')
+    on_leave_hover = _LazyCallbackProperty('on_leave_hover')
+    on_mouse_press = _LazyCallbackProperty('on_mouse_press')
+    on_mouse_move = _LazyCallbackProperty('on_mouse_move')
+    on_mouse_release = _LazyCallbackProperty('on_mouse_release')
+
+    accept_mouse_press = _AcceptMousePressProperty()
+
     def __init__(
         self,
         parent_item,
@@ -394,12 +919,6 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
         svg_renderer=None
     ):
         QGraphicsSvgItem.__init__(self, parent_item)
-        self._qimage = None
-        self._rotation_in_radians = 0.0
-        self._base_scale = 1.0
-        self._pen = None
-        self._brush = None
-
         _init_item(
             self,
             origin_pos,
@@ -411,28 +930,23 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
             graphics_widget)
 
         if svg_renderer is not None:
-            self._renderer = svg_renderer
+            self._state.renderer = svg_renderer  # Keep a reference to it.
             self.setSharedRenderer(svg_renderer)
 
-    @contextmanager
     def delayed_update(self):
-        self._delay_update += 1
-        yield
-        self._delay_update -= 1
-        if self._delay_update == 0:
-            self._update_with_graphics_widget()
+        return _delayed_update_item(self)
 
     def setPen(self, pen):
-        self._pen = pen
+        self._state.pen = pen
 
     def setBrush(self, brush):
-        self._brush = brush
+        self._state.brush = brush
 
     def pen(self):
-        return self._pen
+        return self._state.pen
 
     def brush(self):
-        return self._brush
+        return self._state.brush
 
     def mousePressEvent(self, event):
         _mouse_press_event_item(self, event)
@@ -447,7 +961,7 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
         _set_radius_in_px_item(self, radius_in_px)
 
     def get_radius_in_px(self):
-        return self._radius_in_px
+        return self._state.radius_in_px
 
     def set_origin_pos(self, origin_pos):
         _set_center_item(self, origin_pos)
@@ -456,10 +970,10 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
         _set_pixels_displacement_item(self, pixels_displacement)
 
     def get_pixels_displacement(self):
-        return self._pixels_displacement
+        return self._state.pixels_displacement
 
     def get_origin_pos(self):
-        return self._center  # _center internally, but it's actually the origin position.
+        return self._state.center  # center internally, but it's actually the origin position.
 
     # Keep the center API for external users (although it actually sets the origin pos).
     set_center = set_origin_pos
@@ -468,6 +982,9 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
     def _update_with_graphics_widget(self, force=False):
         _update_with_graphics_widget_item(self, force=force)
 
+    def _update_with_transform(self, transform, px_to_scene):
+        _update_with_transform_item(self, transform, px_to_scene)
+
     def configure_hover(
             self,
             hover_pen,
@@ -479,24 +996,87 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
     def unconfigure_hover(self):
         _unconfigure_hover_item(self)
 
+    def set_level_of_detail(self, min_zoom=0.0, min_size_in_px=0):
+        '''
+        :param float min_zoom:
+            Below this zoom the item is not painted.
+
+        :param int min_size_in_px:
+            If the item is smaller than this size on screen it's not painted.
+        '''
+        _set_level_of_detail_item(self, min_zoom, min_size_in_px)
+
+    def paint_simplified(self, painter, option, widget=None):
+        # Just the rasterized svg (without the pen/brush decorations).
+        if not self._paint_from_pixmap_cache(painter):
+            painter.fillRect(self.boundingRect(), get_cached_brush(QColor(Qt.gray)))
+
     @overrides(QGraphicsSvgItem.paint)
+    @profile_item_paint
     def paint(self, painter, option, widget=None):
-        _before_paint_item(self, painter, widget)
+        band = _before_paint_item(self, painter, widget)
+        if band is None:
+            return
+        if band.level != LOD_FULL:
+            self.paint_simplified(painter, option, widget)
+            return
 
         renderer = self.renderer()
         size = renderer.defaultSize()
         if size is not None and size.width() > 0 and size.height() > 0:
             width, height = size.width(), size.height()
-            if self._pen is not None:
-                painter.setPen(self._pen)
+            state = self._state
+            if state.pen is not None:
+                painter.setPen(state.pen)
                 painter.drawRect(QRectF(0, 0, width, height))
 
-            if self._brush is not None:
-                painter.setBrush(self._brush)
-                painter.fillRect(QRectF(0, 0, width, height), self._brush)
-
-        # : :type painter: QPainter
-        QGraphicsSvgItem.paint(self, painter, option, widget)
+            if state.brush is not None:
+                painter.setBrush(state.brush)
+                painter.fillRect(QRectF(0, 0, width, height), state.brush)
+
+        if not self._paint_from_pixmap_cache(painter):
+            # : :type painter: QPainter
+            QGraphicsSvgItem.paint(self, painter, option, widget)
+
+    def _paint_from_pixmap_cache(self, painter):
+        renderer = self._state.renderer
+        if renderer is None or self.isSelected():
+            return False
+
+        rect = self.boundingRect()
+        if rect.isEmpty():
+            return False
+
+        transform = painter.worldTransform()
+        if transform.determinant() <= 0:
+            return False  # Mirrored: just paint it directly.
+
+        scale_x = math.hypot(transform.m11(), transform.m12())
+        scale_y = math.hypot(transform.m21(), transform.m22())
+        width_px = int(round(rect.width() * scale_x))
+        height_px = int(round(rect.height() * scale_y))
+        cache = _svg_pixmap_cache
+        max_size = cache.MAX_PIXMAP_SIZE
+        if not (0 < width_px <= max_size and 0 < height_px <= max_size):
+            return False
+
+        angle = math.degrees(math.atan2(transform.m12(), transform.m11()))
+        rotation_bucket = int(round(angle * cache.ROTATION_BUCKETS / 360.)) % cache.ROTATION_BUCKETS
+
+        device = painter.device()
+        device_pixel_ratio = device.devicePixelRatioF() if device is not None else 1.0
+
+        pixmap, offset = cache.get_pixmap(
+            renderer, width_px, height_px, device_pixel_ratio, rotation_bucket)
+
+        center = transform.map(rect.center())
+        painter.save()
+        try:
+            painter.resetTransform()
+            painter.drawPixmap(QPointF(center.x() - offset[0], center.y() - offset[1]), pixmap)
+        finally:
+            painter.restore()
+        return True
 
     def hoverEnterEvent(self, event):
         # Note: although we have no configure_hover, the user may still treat
@@ -509,28 +1089,28 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
         return QGraphicsSvgItem.hoverLeaveEvent(self, event)
 
     def set_qimage(self, qimage):
-        self._qimage = qimage
+        self._state.qimage = qimage
 
     def set_position(self, origin_pos, radius, pixels_displacement):
         x = origin_pos[0] + pixels_displacement[0]
         y = origin_pos[1] + pixels_displacement[1]
 
         from pyvmmonitor_qt.qt.QtGui import QTransform
+        state = self._state
         transf = QTransform()
         transf.translate(x, y)
-        transf.rotateRadians(self._rotation_in_radians)
-        transf.scale(self._base_scale * (radius * 2), self._base_scale * (radius * 2))
+        transf.rotateRadians(state.rotation_in_radians)
+        transf.scale(state.base_scale * (radius * 2), state.base_scale * (radius * 2))
         self.setTransform(transf)
 
     def set_base_scale(self, base_scale):
-        force = self._base_scale != base_scale
-        self._base_scale = base_scale
+        state = self._state
+        force = state.base_scale != base_scale
+        state.base_scale = base_scale
         self._update_with_graphics_widget(force=force)
 
     def set_rotation_in_radians(self, rotation_in_radians):
-        force = self._rotation_in_radians != rotation_in_radians
-        self._rotation_in_radians = rotation_in_radians
-        self._update_with_graphics_widget(force=force)
+        _set_rotation_in_radians_item(self, rotation_in_radians)
 
 
 # ==================================================================================================
@@ -538,6 +1118,15 @@ class _CustomGraphicsSvgItem(QGraphicsSvgItem):
 # ==================================================================================================
 class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
 
+    # Callbacks (created on first access).
+    on_enter_hover = _LazyCallbackProperty('on_enter_hover')
+    on_leave_hover = _LazyCallbackProperty('on_leave_hover')
+    on_mouse_press = _LazyCallbackProperty('on_mouse_press')
+    on_mouse_move = _LazyCallbackProperty('on_mouse_move')
+    on_mouse_release = _LazyCallbackProperty('on_mouse_release')
+
+    accept_mouse_press = _AcceptMousePressProperty()
+
     def __init__(
             self,
             parent_item,
@@ -559,13 +1148,8 @@ class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
             pixels_displacement,
             graphics_widget)
 
-    @contextmanager
     def delayed_update(self):
-        self._delay_update += 1
-        yield
-        self._delay_update -= 1
-        if self._delay_update == 0:
-            self._update_with_graphics_widget()
+        return _delayed_update_item(self)
 
     def mousePressEvent(self, event):
         _mouse_press_event_item(self, event)
@@ -580,7 +1164,7 @@ class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
         _set_radius_in_px_item(self, radius_in_px)
 
     def get_radius_in_px(self):
-        return self._radius_in_px
+        return self._state.radius_in_px
 
     def set_center(self, center):
         _set_center_item(self, center)
@@ -589,10 +1173,10 @@ class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
         _set_pixels_displacement_item(self, pixels_displacement)
 
     def get_pixels_displacement(self):
-        return self._pixels_displacement
+        return self._state.pixels_displacement
 
     def get_center(self):
-        return self._center
+        return self._state.center
 
     def _update_with_graphics_widget(self, force=False):
         from pyvmmonitor_qt import qt_utils
@@ -600,9 +1184,31 @@ class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
             return
         _update_with_graphics_widget_item(self, force=force)
 
+    def _update_with_transform(self, transform, px_to_scene):
+        _update_with_transform_item(self, transform, px_to_scene)
+
+    def set_level_of_detail(self, min_zoom=0.0, min_size_in_px=0):
+        '''
+        :param float min_zoom:
+            Below this zoom the item is not painted.
+
+        :param int min_size_in_px:
+            If the item is smaller than this size on screen it's not painted.
+        '''
+        _set_level_of_detail_item(self, min_zoom, min_size_in_px)
+
+    def paint_simplified(self, painter, option, widget=None):
+        _paint_simplified_item(self, painter)
+
     @overrides(QGraphicsEllipseItem.paint)
+    @profile_item_paint
     def paint(self, painter, option, widget=None):
-        _before_paint_item(self, painter, widget)
+        band = _before_paint_item(self, painter, widget)
+        if band is None:
+            return
+        if band.level != LOD_FULL:
+            self.paint_simplified(painter, option, widget)
+            return
 
         QGraphicsEllipseItem.paint(self, painter, option, widget)
 
@@ -639,6 +1245,15 @@ class _CustomGraphicsEllipseItem(QGraphicsEllipseItem):
 # ==================================================================================================
 class _CustomQGraphicsPathItem(QGraphicsPathItem):
 
+    # Callbacks (created on first access).
+    on_enter_hover = _LazyCallbackProperty('on_enter_hover')
+    on_leave_hover = _LazyCallbackProperty('on_leave_hover')
+    on_mouse_press = _LazyCallbackProperty('on_mouse_press')
+    on_mouse_move = _LazyCallbackProperty('on_mouse_move')
+    on_mouse_release = _LazyCallbackProperty('on_mouse_release')
+
+    accept_mouse_press = _AcceptMousePressProperty()
+
     def __init__(
             self,
             parent_item,
@@ -655,15 +1270,11 @@ class _CustomQGraphicsPathItem(QGraphicsPathItem):
             fill_color=fill_color,
             alpha=alpha,
             pixels_displacement=(0, 0),
-            graphics_widget=graphics_widget)
+            graphics_widget=graphics_widget,
+            fixed_pixels=False)
 
-    @contextmanager
     def delayed_update(self):
-        self._delay_update += 1
-        yield
-        self._delay_update -= 1
-        if self._delay_update == 0:
-            self._update_with_graphics_widget()
+        return _delayed_update_item(self)
 
     def get_center(self):
         rect = self.path().controlPointRect()
@@ -680,8 +1291,70 @@ class _CustomQGraphicsPathItem(QGraphicsPathItem):
         _mouse_release_event_item(self, event)
 
     def _update_with_graphics_widget(self, force=False):
-        # Nothing to actually update based on the graphics widget in this case.
-        pass
+        simplified_paths = self._state.simplified_paths
+        if simplified_paths is not None:
+            g = self._state.graphics_widget()
+            if g is not None and qt_utils.is_qobject_alive(g):
+                self.setPath(simplified_paths.get_path(g.transform().m11()))
+
+    def _update_with_transform(self, transform, px_to_scene):
+        # Called by the graphics widget when the zoom changes (only registered when the path is
+        # set with set_path_from_array).
+        simplified_paths = self._state.simplified_paths
+        if simplified_paths is not None:
+            self.setPath(simplified_paths.get_path(transform.m11()))
+
+    def set_path_from_array(self, points, clockwise=None, simplify=True):
+        '''
+        Sets the path from an (N, 2) numpy array.
+
+        :param bool simplify:
+            If True, the path painted is simplified based on the zoom (with an error of less
+            than 1 pixel -- see: qt_painter_path.SimplifiedPainterPaths).
+        '''
+        from pyvmmonitor_qt import qt_painter_path
+        state = self._state
+        g = state.graphics_widget()
+        if not simplify:
+            state.simplified_paths = None
+            if g is not None and hasattr(g, 'unregister_fixed_pixels_item'):
+                g.unregister_fixed_pixels_item(self)
+            self.setPath(qt_painter_path.create_painter_path_from_array(points, clockwise))
+            return
+
+        state.simplified_paths = qt_painter_path.SimplifiedPainterPaths(points, clockwise)
+        if g is not None and hasattr(g, 'register_fixed_pixels_item'):
+            g.register_fixed_pixels_item(self)
+        self._update_with_graphics_widget()
+
+    def set_level_of_detail(self, min_zoom=0.0, min_size_in_px=0):
+        '''
+        :param float min_zoom:
+            Below this zoom the item is not painted.
+
+        :param int min_size_in_px:
+            If the item is smaller than this size on screen it's not painted.
+        '''
+        _set_level_of_detail_item(self, min_zoom, min_size_in_px)
+
+    def paint_simplified(self, painter, option, widget=None):
+        # A cosmetic solid pen (no dashes/width) is much faster to draw.
+        painter.setPen(get_cached_pen(QPen(self.pen().color(), 0)))
+        painter.setBrush(self.brush())
+        painter.drawPath(self.path())
+
+    @overrides(QGraphicsPathItem.paint)
+    @profile_item_paint
+    def paint(self, painter, option, widget=None):
+        # Note: the path doesn't depend on the zoom (so, no need to check for updates).
+        band = _get_level_of_detail_band_item(self, self._state.graphics_widget())
+        if band is None:
+            return
+        if band.level != LOD_FULL:
+            self.paint_simplified(painter, option, widget)
+            return
+
+        QGraphicsPathItem.paint(self, painter, option, widget)
 
     def configure_hover(
             self,
@@ -707,6 +1380,607 @@ class _CustomQGraphicsPathItem(QGraphicsPathItem):
         return QGraphicsPathItem.hoverLeaveEvent(self, event)
 
 
+# ==================================================================================================
+# _CustomGraphicsHandlesItem
+# ==================================================================================================
+def _accept_no_handle_mouse_press(index, event):
+    return False
+
+
+def _choose_cell_size(bounds, num_points):
+    x, y, w, h = bounds
+    if w > 0 and h > 0:
+        # Roughly 4 points per cell if they're evenly distributed.
+        return 2. * math.sqrt((w * h) / num_points)
+    size = max(w, h)
+    if size > 0:
+        return size / num_points
+    return 1.
+
+
+class _CustomGraphicsHandlesItem(QGraphicsItem):
+    '''
+    A single item which shows many handles (circles or squares with a fixed size in pixels).
+
+    All the handles are painted in a single paint() call (and only the handles in the exposed
+    rect are painted) and the hit-testing is done through a spatial index, so, it's meant to be
+    used when there are too many handles to have an item for each one (i.e.: editing a polygon
+    with tens of thousands of vertices).
+
+    The callbacks receive the index of the related handle:
+
+        on_enter_hover(item, index)
+        on_leave_hover(item, index)
+        on_mouse_press(item, index, event)
+        on_mouse_move(item, index, event)
+        on_mouse_release(item, index, event)
+
+    and `accept_mouse_press` may be changed for a function(index, event) and if True is
+    returned, the mouse press is accepted.
+    '''
+
+    SHAPE_CIRCLE = 'circle'
+    SHAPE_SQUARE = 'square'
+
+    # Size (in pixels) of the cells used to aggregate handles when painting with LOD_AGGREGATED.
+    AGGREGATE_CELL_IN_PX = 2
+
+    # Maximum number of stamps (one for each radius/color/device pixel ratio) kept in the cache.
+    MAX_CACHED_STAMPS = 64
+
+    def __init__(
+            self,
+            parent_item,
+            radius_in_px,
+            pen,
+            fill_color,
+            alpha,
+            shape=SHAPE_CIRCLE,
+            graphics_widget=None):
+        QGraphicsItem.__init__(self, parent_item)
+        assert shape in (self.SHAPE_CIRCLE, self.SHAPE_SQUARE)
+        self._shape = shape
+        self._radius_in_px = radius_in_px
+        self._regular_style = _get_item_style(pen, fill_color, alpha, radius_in_px)
+        self._hover_style = None
+
+        self._xs = array('d')
+        self._ys = array('d')
+        self._radii_in_px = array('d')
+        # The max of _radii_in_px (None if it must be recomputed).
+        self._max_handle_radius_in_px = None
+        self._rgbas = array('L')  # The fill color (with alpha) of each handle.
+        self._index = GridSpatialIndex()
+        self._centers_bounds = None
+        self._bounding_rect = QRectF()
+        self._px_to_scene = 1.0
+
+        # (radius_in_px, rgba, hover, device_pixel_ratio) -> (pixmap, offset) (most recently used
+        # last).
+        self._stamps = OrderedDict()
+
+        self._hover_index = None
+        self._press_index = None
+
+        self.accept_mouse_press = _accept_no_handle_mouse_press
+
+        self.on_enter_hover = Callback()
+        self.on_leave_hover = Callback()
+
+        self.on_mouse_press = Callback()
+        self.on_mouse_move = Callback()
+        self.on_mouse_release = Callback()
+
+        # Needed to get the exposedRect in paint.
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setAcceptHoverEvents(True)
+
+        assert graphics_widget is not None
+        self._graphics_widget = get_weakref(graphics_widget)
+        register_fixed_pixels_item = getattr(graphics_widget, 'register_fixed_pixels_item', None)
+        if register_fixed_pixels_item is not None:
+            register_fixed_pixels_item(self)
+
+        self._update_with_graphics_widget()
+
+    # ----------------------------------------------------------------------------------------------
+    # Handles API
+    # ----------------------------------------------------------------------------------------------
+    def _get_rgba(self, fill_color, alpha):
+        if fill_color is None:
+            return self._regular_style.qbrush.color().rgba()
+        if alpha is None:
+            alpha = self._regular_style.alpha
+        return (fill_color.rgb() & 0xffffff) | (alpha << 24)
+
+    def set_handles(self, centers, radii_in_px=None, fill_colors=None, alpha=None):
+        '''
+        :param list(tuple(float, float)) centers:
+            The centers of the handles (in item coordinates).
+
+        :param list(float) radii_in_px:
+            The radius of each handle (if not given, the default radius is used).
+
+        :param list(QColor) fill_colors:
+            The fill color of each handle (if not given, the default fill color is used).
+
+        :param alpha:
+            The alpha to be used for the given fill colors (if not given the default alpha
+            is used).
+        '''
+        self._xs = array('d', (center[0] for center in centers))
+        self._ys = array('d', (center[1] for center in centers))
+        num_handles = len(self._xs)
+
+        if radii_in_px is None:
+            self._radii_in_px = array('d', [self._radius_in_px]) * num_handles
+        else:
+            self._radii_in_px = array('d', radii_in_px)
+        self._max_handle_radius_in_px = None
+
+        if fill_colors is None:
+            self._rgbas = array('L', [self._get_rgba(None, None)]) * num_handles
+        else:
+            get_rgba = self._get_rgba
+            self._rgbas = array('L', (get_rgba(fill_color, alpha) for fill_color in fill_colors))
+
+        assert len(self._ys) == len(self._radii_in_px) == len(self._rgbas) == num_handles
+
+        self._hover_index = None
+        self._press_index = None
+        self._rebuild_index()
+
+    def add_handle(self, center, radius_in_px=None, fill_color=None, alpha=None):
+        '''
+        :return int:
+            The index of the added handle.
+        '''
+        index = len(self._xs)
+        x, y = center
+        self._xs.append(x)
+        self._ys.append(y)
+        if radius_in_px is None:
+            radius_in_px = self._radius_in_px
+        is_new_max = index == 0 or radius_in_px > self._get_max_handle_radius_in_px()
+        self._radii_in_px.append(radius_in_px)
+        if is_new_max:
+            self._max_handle_radius_in_px = radius_in_px
+        self._rgbas.append(self._get_rgba(fill_color, alpha))
+        self._index.add(index, (x, y))
+        self._include_in_bounds(x, y)
+        if is_new_max:
+            self._update_bounding_rect()
+        self.update()
+        return index
+
+    def get_handles_count(self):
+        return len(self._xs)
+
+    def get_handle_center(self, index):
+        return self._xs[index], self._ys[index]
+
+    def set_handle_center(self, index, center):
+        self.update(self._get_handle_rect(index))
+        x, y = center
+        self._xs[index] = x
+        self._ys[index] = y
+        self._index.add(index, (x, y))
+        self._include_in_bounds(x, y)
+        self.update(self._get_handle_rect(index))
+
+    def set_handle_radius_in_px(self, index, radius_in_px):
+        self.update(self._get_handle_rect(index))
+        max_radius_in_px = self._get_max_handle_radius_in_px()
+        old_radius_in_px = self._radii_in_px[index]
+        self._radii_in_px[index] = radius_in_px
+        if radius_in_px > max_radius_in_px:
+            self._max_handle_radius_in_px = radius_in_px
+            self._update_bounding_rect()
+        elif old_radius_in_px == max_radius_in_px and radius_in_px < old_radius_in_px:
+            # The max may have been lowered (only then it's recomputed).
+            self._max_handle_radius_in_px = None
+            self._update_bounding_rect()
+        self.update(self._get_handle_rect(index))
+
+    def set_handle_fill_color(self, index, fill_color, alpha=None):
+        self._rgbas[index] = self._get_rgba(fill_color, alpha)
+        self.update(self._get_handle_rect(index))
+
+    def configure_hover(
+            self,
+            hover_pen,
+            hover_fill_color=None,
+            hover_alpha=255,
+            hover_radius_in_px=None):
+        self._hover_style = _get_item_style(
+            hover_pen, hover_fill_color, hover_alpha, hover_radius_in_px)
+        self._stamps.clear()
+        self._update_bounding_rect()
+        self.update()
+
+    def unconfigure_hover(self):
+        self._hover_style = None
+        self._stamps.clear()
+        self._update_bounding_rect()
+        self.update()
+
+    def handle_at(self, point, tolerance_in_px=0):
+        '''
+        :param tuple(float, float) point:
+            The point (in item coordinates).
+
+        :param tolerance_in_px:
+            Additional distance (in pixels) to consider the point inside a handle.
+
+        :return int:
+            The index of the handle at the given point (the nearest one if more than one
+            matches) or None if there's no handle at the given point.
+        '''
+        if not self._xs:
+            return None
+        x, y = point
+        px_to_scene = self._px_to_scene
+        search_radius = (self._get_max_radius_in_px() + tolerance_in_px) * px_to_scene
+        is_square = self._shape == self.SHAPE_SQUARE
+        if is_square:
+            search_radius *= math.sqrt(2)
+
+        radii_in_px = self._radii_in_px
+        xs = self._xs
+        ys = self._ys
+        hover_index = self._hover_index
+        hover_radius_in_px = self._get_hover_radius_in_px()
+
+        found = None
+        found_dist_sq = None
+        for dist_sq, index in self._index.iter_within_radius((x, y), search_radius):
+            if index == hover_index and hover_radius_in_px is not None:
+                radius_in_px = hover_radius_in_px
+            else:
+                radius_in_px = radii_in_px[index]
+            radius = (radius_in_px + tolerance_in_px) * px_to_scene
+
+            if is_square:
+                if abs(xs[index] - x) > radius or abs(ys[index] - y) > radius:
+                    continue
+            elif dist_sq > radius * radius:
+                continue
+
+            if found_dist_sq is None or dist_sq < found_dist_sq:
+                found = index
+                found_dist_sq = dist_sq
+        return found
+
+    # ----------------------------------------------------------------------------------------------
+    # Geometry
+    # ----------------------------------------------------------------------------------------------
+    def _get_hover_radius_in_px(self):
+        hover_style = self._hover_style
+        if hover_style is None:
+            return None
+        return hover_style.radius_in_px
+
+    def _get_max_handle_radius_in_px(self):
+        max_radius_in_px = self._max_handle_radius_in_px
+        if max_radius_in_px is None:
+            radii_in_px = self._radii_in_px
+            max_radius_in_px = max(radii_in_px) if radii_in_px else self._radius_in_px
+            self._max_handle_radius_in_px = max_radius_in_px
+        return max_radius_in_px
+
+    def _get_max_radius_in_px(self):
+        max_radius_in_px = self._get_max_handle_radius_in_px()
+        hover_radius_in_px = self._get_hover_radius_in_px()
+        if hover_radius_in_px is not None and hover_radius_in_px > max_radius_in_px:
+            max_radius_in_px = hover_radius_in_px
+        return max_radius_in_px
+
+    def _get_margin_in_px(self, radius_in_px):
+        # The pen width/antialiasing may go a bit outside the radius.
+        margin = radius_in_px + self._regular_style.qpen.widthF() + 1
+        if self._shape == self.SHAPE_SQUARE:
+            margin *= math.sqrt(2)
+        return margin
+
+    def _get_handle_rect(self, index):
+        radius_in_px = self._radii_in_px[index]
+        hover_radius_in_px = self._get_hover_radius_in_px()
+        if hover_radius_in_px is not None and hover_radius_in_px > radius_in_px:
+            radius_in_px = hover_radius_in_px
+        margin = self._get_margin_in_px(radius_in_px) * self._px_to_scene
+        return QRectF(self._xs[index] - margin, self._ys[index] - margin, 2 * margin, 2 * margin)
+
+    def _rebuild_index(self):
+        index = self._index
+        index.clear()
+        num_handles = len(self._xs)
+        if num_handles:
+            x0, y0 = min(self._xs), min(self._ys)
+            bounds = (x0, y0, max(self._xs) - x0, max(self._ys) - y0)
+            index.rebuild(_choose_cell_size(bounds, num_handles))
+            for i, x, y in zip(range(num_handles), self._xs, self._ys):
+                index.add(i, (x, y))
+            self._centers_bounds = bounds
+        else:
+            self._centers_bounds = None
+        self._update_bounding_rect()
+        self.update()
+
+    def _include_in_bounds(self, x, y):
+        bounds = self._centers_bounds
+        if bounds is None:
+            self._centers_bounds = (x, y, 0, 0)
+        else:
+            x0, y0, w, h = bounds
+            x1 = max(x0 + w, x)
+            y1 = max(y0 + h, y)
+            x0 = min(x0, x)
+            y0 = min(y0, y)
+            new_bounds = (x0, y0, x1 - x0, y1 - y0)
+            if new_bounds == bounds:
+                return
+            self._centers_bounds = new_bounds
+        self._update_bounding_rect()
+
+    def _update_bounding_rect(self):
+        bounds = self._centers_bounds
+        if bounds is None:
+            rect = QRectF()
+        else:
+            x, y, w, h = bounds
+            margin = self._get_margin_in_px(self._get_max_radius_in_px()) * self._px_to_scene
+            rect = QRectF(x - margin, y - margin, w + 2 * margin, h + 2 * margin)
+
+        if rect != self._bounding_rect:
+            self.prepareGeometryChange()
+            self._bounding_rect = rect
+
+    def _update_with_graphics_widget(self, force=False):
+        g = self._graphics_widget()
+        if g is not None and qt_utils.is_qobject_alive(g) and qt_utils.is_qobject_alive(self):
+            transform = g.transform()
+            self._update_with_transform(
+                transform, calculate_size_for_value_in_px(transform, 1.0))
+
+    def _update_with_transform(self, transform, px_to_scene):
+        if px_to_scene != self._px_to_scene:
+            self._px_to_scene = px_to_scene
+            self._update_bounding_rect()
+
+    @overrides(QGraphicsItem.boundingRect)
+    def boundingRect(self):
+        return self._bounding_rect
+
+    @overrides(QGraphicsItem.contains)
+    def contains(self, point):
+        return self.handle_at((point.x(), point.y())) is not None
+
+    # ----------------------------------------------------------------------------------------------
+    # Painting
+    # ----------------------------------------------------------------------------------------------
+    def _get_stamp(self, radius_in_px, rgba, hover, device_pixel_ratio=1.0):
+        key = (radius_in_px, rgba, hover, device_pixel_ratio)
+        stamps = self._stamps
+        stamp = stamps.pop(key, None)
+        if stamp is not None:
+            stamps[key] = stamp  # Re-add as the most recently used.
+            return stamp
+
+        from pyvmmonitor_qt.qt.QtGui import QPixmap
+        from pyvmmonitor_qt.qt_utils import painter_on
+
+        if hover:
+            qpen = self._hover_style.qpen
+            qbrush = self._hover_style.qbrush
+        else:
+            qpen = self._regular_style.qpen
+            qbrush = get_cached_brush(QColor.fromRgba(rgba), (rgba >> 24) & 0xff)
+
+        pen_width = qpen.widthF() or 1.
+        size = int(math.ceil(2 * radius_in_px + pen_width)) + 2
+        offset = size / 2.
+
+        # The pixmap has the pixels of the device (so that it's not scaled on HiDPI screens).
+        pixmap_size = int(math.ceil(size * device_pixel_ratio))
+        pixmap = QPixmap(pixmap_size, pixmap_size)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        pixmap.fill(Qt.transparent)
+        with painter_on(pixmap, True) as painter:
+            painter.setPen(qpen)
+            painter.setBrush(qbrush)
+            rect = QRectF(offset - radius_in_px, offset - radius_in_px,
+                          2. * radius_in_px, 2. * radius_in_px)
+            if self._shape == self.SHAPE_SQUARE:
+                painter.drawRect(rect)
+            else:
+                painter.drawEllipse(rect)
+
+        while len(stamps) >= self.MAX_CACHED_STAMPS:
+            stamps.popitem(last=False)
+        stamp = stamps[key] = (pixmap, offset)
+        return stamp
+
+    @overrides(QGraphicsItem.paint)
+    @profile_item_paint
+    def paint(self, painter, option, widget=None):
+        if not self._xs:
+            return
+
+        band = _FULL_LOD_BAND
+        g = self._graphics_widget()
+        if g is not None:
+            get_level_of_detail_band = getattr(g, 'get_level_of_detail_band', None)
+            if get_level_of_detail_band is not None:
+                band = get_level_of_detail_band()
+                if band.level == LOD_HIDDEN:
+                    return
+
+        transform = painter.worldTransform()
+        px_to_scene = calculate_size_for_value_in_px(transform, 1.0)
+        if px_to_scene != self._px_to_scene:
+            # The zoom was changed without notifying us: update the bounding rect later on.
+            execute_on_next_event_loop(self._update_with_graphics_widget)
+
+        margin = self._get_margin_in_px(self._get_max_radius_in_px()) * px_to_scene
+        exposed = option.exposedRect
+        visible = self._index.iter_in_rect(
+            exposed.x() - margin,
+            exposed.y() - margin,
+            exposed.width() + 2 * margin,
+            exposed.height() + 2 * margin)
+
+        if band.level == LOD_AGGREGATED:
+            self._paint_aggregated(painter, visible, transform)
+            return
+
+        m11, m12, m21, m22 = transform.m11(), transform.m12(), transform.m21(), transform.m22()
+        dx, dy = transform.dx(), transform.dy()
+
+        xs = self._xs
+        ys = self._ys
+        radii_in_px = self._radii_in_px
+        rgbas = self._rgbas
+        get_stamp = self._get_stamp
+        hover_index = self._hover_index if self._hover_style is not None else None
+
+        device = painter.device()
+        device_pixel_ratio = device.devicePixelRatioF() if device is not None else 1.0
+
+        # The stamps used in this paint (so that the LRU cache is only accessed once per stamp).
+        stamps = {}
+
+        painter.save()
+        try:
+            # Everything is drawn in device coordinates (the stamps have the size in pixels).
+            painter.resetTransform()
+            draw_pixmap = painter.drawPixmap
+            for index in visible:
+                if index == hover_index:
+                    continue
+                x = xs[index]
+                y = ys[index]
+                key = (radii_in_px[index], rgbas[index])
+                stamp = stamps.get(key)
+                if stamp is None:
+                    stamp = stamps[key] = get_stamp(key[0], key[1], False, device_pixel_ratio)
+                pixmap, offset = stamp
+                draw_pixmap(
+                    int(round(m11 * x + m21 * y + dx - offset)),
+                    int(round(m12 * x + m22 * y + dy - offset)),
+                    pixmap)
+
+            if hover_index is not None:
+                # The hovered handle is always drawn last (on top).
+                x = xs[hover_index]
+                y = ys[hover_index]
+                radius_in_px = self._get_hover_radius_in_px()
+                if radius_in_px is None:
+                    radius_in_px = radii_in_px[hover_index]
+                pixmap, offset = get_stamp(
+                    radius_in_px, rgbas[hover_index], True, device_pixel_ratio)
+                draw_pixmap(
+                    int(round(m11 * x + m21 * y + dx - offset)),
+                    int(round(m12 * x + m22 * y + dy - offset)),
+                    pixmap)
+        finally:
+            painter.restore()
+
+    def _paint_aggregated(self, painter, visible, transform):
+        # Handles which fall in the same cell (in pixels) are painted only once (as a small
+        # square with the color of the first handle found in the cell).
+        cell_in_px = self.AGGREGATE_CELL_IN_PX
+        m11, m12, m21, m22 = transform.m11(), transform.m12(), transform.m21(), transform.m22()
+        dx, dy = transform.dx(), transform.dy()
+
+        xs = self._xs
+        ys = self._ys
+        rgbas = self._rgbas
+        painted_cells = set()
+        rgba_to_cells = {}
+        for index in visible:
+            x = xs[index]
+            y = ys[index]
+            cell = (
+                int(math.floor((m11 * x + m21 * y + dx) / cell_in_px)),
+                int(math.floor((m12 * x + m22 * y + dy) / cell_in_px)),
+            )
+            if cell in painted_cells:
+                continue
+            painted_cells.add(cell)
+            rgba = rgbas[index]
+            cells = rgba_to_cells.get(rgba)
+            if cells is None:
+                cells = rgba_to_cells[rgba] = []
+            cells.append(cell)
+
+        painter.save()
+        try:
+            painter.resetTransform()
+            fill_rect = painter.fillRect
+            for rgba, cells in rgba_to_cells.items():
+                color = QColor.fromRgba(rgba)
+                for cx, cy in cells:
+                    fill_rect(cx * cell_in_px, cy * cell_in_px, cell_in_px, cell_in_px, color)
+        finally:
+            painter.restore()
+
+    # ----------------------------------------------------------------------------------------------
+    # Events
+    # ----------------------------------------------------------------------------------------------
+    def _set_hover_index(self, index):
+        old_index = self._hover_index
+        if old_index == index:
+            return
+
+        if old_index is not None:
+            self.update(self._get_handle_rect(old_index))
+        self._hover_index = index
+        if index is not None:
+            self.update(self._get_handle_rect(index))
+
+        if old_index is not None:
+            self.on_leave_hover(self, old_index)
+        if index is not None:
+            self.on_enter_hover(self, index)
+
+    def hoverEnterEvent(self, event):
+        pos = event.pos()
+        self._set_hover_index(self.handle_at((pos.x(), pos.y())))
+        return QGraphicsItem.hoverEnterEvent(self, event)
+
+    def hoverMoveEvent(self, event):
+        pos = event.pos()
+        self._set_hover_index(self.handle_at((pos.x(), pos.y())))
+        return QGraphicsItem.hoverMoveEvent(self, event)
+
+    def hoverLeaveEvent(self, event):
+        self._set_hover_index(None)
+        return QGraphicsItem.hoverLeaveEvent(self, event)
+
+    def mousePressEvent(self, event):
+        pos = event.pos()
+        index = self.handle_at((pos.x(), pos.y()))
+        if index is not None and self.accept_mouse_press(index, event):
+            event.accept()
+            self._press_index = index
+            self.on_mouse_press(self, index, event)
+        else:
+            # Let the items below handle it.
+            event.ignore()
+
+    def mouseMoveEvent(self, event):
+        event.accept()
+        if self._press_index is not None:
+            self.on_mouse_move(self, self._press_index, event)
+
+    def mouseReleaseEvent(self, event):
+        event.accept()
+        index = self._press_index
+        self._press_index = None
+        if index is not None:
+            self.on_mouse_release(self, index, event)
+
+
 # ==================================================================================================
 # create_graphics_path_item
 # ==================================================================================================
@@ -827,3 +2101,33 @@ def create_fixed_pixels_graphics_item_svg(
         graphics_widget,
         svg_renderer)
     return circle
+
+
+# ==================================================================================================
+# create_fixed_pixels_graphics_handles
+# ==================================================================================================
+def create_fixed_pixels_graphics_handles(
+        radius_in_px,
+        pen=None,
+        fill_color=None,
+        parent_item=None,
+        alpha=200,
+        shape=_CustomGraphicsHandlesItem.SHAPE_CIRCLE,
+        graphics_widget=None):
+    '''
+    Creates a single item which can show many handles (with a fixed size in pixels). Use
+    `set_handles()` to set the handles to be shown.
+
+    :param shape:
+        Either 'circle' or 'square'.
+
+    :param alpha: 255 means opaque, 0 means transparent.
+    '''
+    return _CustomGraphicsHandlesItem(
+        parent_item,
+        radius_in_px,
+        pen,
+        fill_color,
+        alpha,
+        shape,
+        graphics_widget)
@@ -0,0 +1,140 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+Level of detail (LOD) used to paint the items in a ZoomableGraphicsView.
+
+At low zoom levels many items are just a few pixels (or less) on screen, so, painting them
+with all the details (antialiasing, svgs, dashed pens, etc) is a waste. The view has a
+LevelOfDetailPolicy which maps the current zoom to a LevelOfDetailBand, which the items
+then use to decide how to paint themselves:
+
+LOD_FULL: the regular painting.
+LOD_SIMPLIFIED: a cheaper representation (i.e.: no outline/svg just the shape filled).
+LOD_AGGREGATED: items which can aggregate many elements may paint just a point where
+    elements overlap (items which can't aggregate paint as in LOD_SIMPLIFIED).
+LOD_HIDDEN: nothing is painted.
+
+Besides that, each item may declare a minimum zoom and a minimum size on screen (in pixels)
+below which it's culled.
+
+Note: by default the policy paints all the zoom levels with LOD_FULL (the level of detail is
+opt-in), i.e.:
+
+view.level_of_detail_policy = LevelOfDetailPolicy(LevelOfDetailPolicy.LOW_ZOOM_BANDS)
+'''
+
+LOD_FULL = 'full'
+LOD_SIMPLIFIED = 'simplified'
+LOD_AGGREGATED = 'aggregated'
+LOD_HIDDEN = 'hidden'
+
+_LEVELS = (LOD_FULL, LOD_SIMPLIFIED, LOD_AGGREGATED, LOD_HIDDEN)
+
+
+class LevelOfDetailBand(object):
+
+    __slots__ = ['min_zoom', 'level', 'antialiased']
+
+    def __init__(self, min_zoom, level, antialiased):
+        '''
+        :param float min_zoom:
+            The band is used when the zoom is >= min_zoom (and lower than the min_zoom of the
+            previous band).
+
+        :param str level:
+            One of the LOD_* constants.
+
+        :param bool antialiased:
+            Whether painting should be antialiased in this band.
+        '''
+        assert level in _LEVELS, 'Unexpected level: %s' % (level,)
+        self.min_zoom = min_zoom
+        self.level = level
+        self.antialiased = antialiased
+
+    def __eq__(self, o):
+        if not isinstance(o, LevelOfDetailBand):
+            return False
+        return (self.min_zoom, self.level, self.antialiased) == (
+            o.min_zoom, o.level, o.antialiased)
+
+    def __ne__(self, o):
+        return not self == o
+
+    def __hash__(self):
+        return hash((self.min_zoom, self.level, self.antialiased))
+
+    def __repr__(self):
+        return 'LevelOfDetailBand(%s, %r, %s)' % (self.min_zoom, self.level, self.antialiased)
+
+
+class LevelOfDetailPolicy(object):
+    '''
+    Maps a zoom to a LevelOfDetailBand.
+
+    i.e.:
+
+    policy = LevelOfDetailPolicy([
+        (0.5, LOD_FULL, True),
+        (0.1, LOD_SIMPLIFIED, False),
+        (0.0, LOD_HIDDEN, False),
+    ])
+    assert policy.get_band(0.2).level == LOD_SIMPLIFIED
+    '''
+
+    # The default is just the regular painting in all the zoom levels.
+    DEFAULT_BANDS = (
+        (0.0, LOD_FULL, True),
+    )
+
+    # Bands which simplify the painting (and turn off antialiasing) when zoomed out.
+    LOW_ZOOM_BANDS = (
+        (0.375, LOD_FULL, True),
+        (0.175, LOD_SIMPLIFIED, True),
+        (0.0, LOD_AGGREGATED, False),
+    )
+
+    def __init__(self, bands=None):
+        '''
+        :param list(tuple(float, str, bool)) bands:
+            The (min_zoom, level, antialiased) for each band (if not given DEFAULT_BANDS is
+            used). A band with min_zoom == 0 is added if the passed bands don't cover all
+            the zoom range.
+        '''
+        if bands is None:
+            bands = self.DEFAULT_BANDS
+
+        bands = sorted(
+            [LevelOfDetailBand(*band) for band in bands],
+            key=lambda band: band.min_zoom, reverse=True)
+        if not bands or bands[-1].min_zoom > 0:
+            bands.append(LevelOfDetailBand(0.0, LOD_FULL, True))
+        self._bands = tuple(bands)
+
+    @property
+    def bands(self):
+        return self._bands
+
+    def get_band(self, zoom):
+        '''
+        :rtype: LevelOfDetailBand
+        '''
+        for band in self._bands:
+            if zoom >= band.min_zoom:
+                return band
+        return self._bands[-1]
+
+
+def is_culled(min_zoom, min_size_in_px, zoom, size_in_scene):
+    '''
+    :return bool:
+        Whether an item with the given min_zoom/min_size_in_px should not be painted in the
+        given zoom (size_in_scene is the size of the item in the scene).
+    '''
+    if zoom < min_zoom:
+        return True
+    if min_size_in_px and size_in_scene * zoom < min_size_in_px:
+        return True
+    return False
@@ -0,0 +1,362 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+An overview (minimap) of the scene of a ZoomableGraphicsView.
+
+The scene is rendered at a low resolution into a cached image which is only fully rendered when
+the size of the widget or the scene rect changes: changes in the scene only re-render the
+related (dirty) regions and are batched (so, many changes in a short time render only once).
+
+The visible area of the view is shown as a rectangle and clicking/dragging in the minimap
+recenters the view.
+
+Note: the minimap is only connected to `QGraphicsScene.changed` while it's visible. When something
+is connected to that signal Qt no longer sends the updates of the scene directly to the views (it
+collects the changed rects, emits them and connects the views to the signal, which is slower for
+the main view too). When the minimap is hidden it disconnects from the signal (along with the views
+if nothing else is connected to it) and the changes aren't tracked (so, the cache is fully rendered
+again when it's shown).
+
+i.e.:
+
+minimap = MinimapWidget(view)
+minimap.resize(200, 150)
+'''
+from pyvmmonitor_qt.qt.QtWidgets import QWidget
+from pyvmmonitor_qt.qt_utils import handle_exception_in_method
+
+
+class MinimapWidget(QWidget):
+
+    # Changes in the scene are rendered at most once in this interval.
+    UPDATE_INTERVAL_IN_MS = 250
+
+    # If there are more dirty rects than this, their bounding rect is rendered instead.
+    MAX_DIRTY_RECTS = 16
+
+    def __init__(self, view, parent=None):
+        '''
+        :param ZoomableGraphicsView view:
+            The view linked to the minimap.
+        '''
+        from pyvmmonitor_core.weak_utils import get_weakref
+        from pyvmmonitor_qt.qt.QtCore import QTimer
+
+        QWidget.__init__(self, parent)
+        self._view = get_weakref(view)
+
+        self._image = None
+        self._scene_rect = None
+        self._scale = 1.
+        self._offset = (0., 0.)
+
+        self._dirty_rects = []
+        self._full_render_needed = True
+
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.timeout.connect(self.update_cache)
+
+        # Offset (in the scene) from the clicked point to the center of the view while dragging.
+        self._drag_offset = None
+
+        # Number of full/partial renders of the cache (i.e.: for tests/profiling).
+        self.full_renders = 0
+        self.partial_renders = 0
+
+        # Only connected to scene.changed while visible (see: showEvent/hideEvent).
+        self._connected_scene = None
+        self._disconnected_views = []
+
+        scene = view.scene()
+        scene.sceneRectChanged.connect(self._on_scene_rect_changed)
+        view.on_zoom.register(self._on_view_changed)
+        view.horizontalScrollBar().valueChanged.connect(self._on_view_changed)
+        view.verticalScrollBar().valueChanged.connect(self._on_view_changed)
+
+    def sizeHint(self):
+        from pyvmmonitor_qt.qt.QtCore import QSize
+        return QSize(200, 150)
+
+    def get_image(self):
+        '''
+        :return QImage:
+            The cached rendering of the scene (may be None if still not rendered).
+        '''
+        return self._image
+
+    # Mapping between the scene and the widget ---------------------------------------------------
+
+    def scene_to_widget(self, x, y):
+        scene_rect = self._scene_rect
+        scale = self._scale
+        return (
+            (x - scene_rect.x()) * scale + self._offset[0],
+            (y - scene_rect.y()) * scale + self._offset[1])
+
+    def widget_to_scene(self, x, y):
+        scene_rect = self._scene_rect
+        scale = self._scale
+        return (
+            (x - self._offset[0]) / scale + scene_rect.x(),
+            (y - self._offset[1]) / scale + scene_rect.y())
+
+    # Cache --------------------------------------------------------------------------------------
+
+    def _on_scene_changed(self, rects):
+        if self._full_render_needed or not rects:
+            return
+        self._dirty_rects.extend(rects)
+        if not self._update_timer.isActive():
+            self._update_timer.start(self.UPDATE_INTERVAL_IN_MS)
+
+    def _on_scene_rect_changed(self, *args):
+        # Note: the rect of the scene may grow with new items, but the view may have its own rect.
+        view = self._view()
+        if view is not None and view.sceneRect() != self._scene_rect:
+            self.invalidate()
+
+    def _on_view_changed(self, *args):
+        # Only the visible rect changed (the cache is still valid).
+        self.update()
+
+    def invalidate(self):
+        '''
+        Requests a full render of the cache in the next paint.
+        '''
+        self._full_render_needed = True
+        self._dirty_rects = []
+        self._update_timer.stop()
+        self.update()
+
+    def _update_layout(self, view):
+        from pyvmmonitor_qt.qt.QtCore import Qt
+        from pyvmmonitor_qt.qt.QtGui import QImage
+
+        scene_rect = view.sceneRect()
+        self._scene_rect = scene_rect
+        width, height = self.width(), self.height()
+        if scene_rect.isEmpty() or width <= 0 or height <= 0:
+            self._image = None
+            return False
+
+        scale = min(width / scene_rect.width(), height / scene_rect.height())
+        image_width = max(1, int(scene_rect.width() * scale))
+        image_height = max(1, int(scene_rect.height() * scale))
+        self._scale = scale
+        self._offset = ((width - image_width) / 2., (height - image_height) / 2.)
+
+        image = self._image
+        if image is None or image.width() != image_width or image.height() != image_height:
+            image = self._image = QImage(
+                image_width, image_height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        return True
+
+    def _render(self, view, scene_rects):
+        # Renders the given scene rects (or the full scene if None) into the cached image.
+        import math
+        from pyvmmonitor_qt.qt.QtCore import QRectF, Qt
+        from pyvmmonitor_qt.qt.QtGui import QPainter
+
+        image = self._image
+        scene_rect = self._scene_rect
+        scale = self._scale
+        image_rect = QRectF(0, 0, image.width(), image.height())
+
+        painter = QPainter(image)
+        try:
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+            if scene_rects is None:
+                view.scene().render(painter, image_rect, scene_rect, Qt.IgnoreAspectRatio)
+                return
+
+            for rect in scene_rects:
+                # Align to the pixels of the image (with a margin for antialiasing).
+                x0 = math.floor((rect.x() - scene_rect.x()) * scale) - 1
+                y0 = math.floor((rect.y() - scene_rect.y()) * scale) - 1
+                x1 = math.ceil((rect.x() + rect.width() - scene_rect.x()) * scale) + 1
+                y1 = math.ceil((rect.y() + rect.height() - scene_rect.y()) * scale) + 1
+                target = QRectF(x0, y0, x1 - x0, y1 - y0).intersected(image_rect)
+                if target.isEmpty():
+                    continue
+
+                source = QRectF(
+                    target.x() / scale + scene_rect.x(),
+                    target.y() / scale + scene_rect.y(),
+                    target.width() / scale,
+                    target.height() / scale)
+                painter.setClipRect(target)
+
+                # Clear the region (the default composition mode would just blend over it).
+                painter.setCompositionMode(QPainter.CompositionMode_Source)
+                painter.fillRect(target, Qt.transparent)
+                painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+
+                view.scene().render(painter, target, source, Qt.IgnoreAspectRatio)
+        finally:
+            painter.end()
+
+    def update_cache(self):
+        '''
+        Renders the pending changes into the cache (called automatically, but may be called to
+        flush the pending changes right away).
+        '''
+        self._update_timer.stop()
+        view = self._view()
+        if view is None:
+            return
+
+        if self._full_render_needed or self._image is None or (
+                view.sceneRect() != self._scene_rect):
+            self._dirty_rects = []
+            if self._update_layout(view):
+                self._render(view, None)
+                self.full_renders += 1
+                self._full_render_needed = False
+
+        elif self._dirty_rects:
+            dirty_rects = self._dirty_rects
+            self._dirty_rects = []
+            if len(dirty_rects) > self.MAX_DIRTY_RECTS:
+                bounds = dirty_rects[0]
+                for rect in dirty_rects[1:]:
+                    bounds = bounds.united(rect)
+                dirty_rects = [bounds]
+            self._render(view, dirty_rects)
+            self.partial_renders += 1
+
+        self.update()
+
+    # Qt events ----------------------------------------------------------------------------------
+
+    def _connect_scene_changed(self):
+        view = self._view()
+        if view is None or self._connected_scene is not None:
+            return
+        scene = self._connected_scene = view.scene()
+        scene.changed.connect(self._on_scene_changed)
+
+        # Reconnect the views disconnected in _disconnect_scene_changed (Qt only connects the
+        # views it didn't connect before).
+        for view_ref in self._disconnected_views:
+            scene_view = view_ref()
+            if scene_view is not None and scene_view.scene() is scene:
+                scene.changed.connect(scene_view.updateScene)
+        self._disconnected_views = []
+
+    def _disconnect_scene_changed(self):
+        import weakref
+        scene = self._connected_scene
+        if scene is None:
+            return
+        self._connected_scene = None
+        try:
+            scene.changed.disconnect(self._on_scene_changed)
+
+            # Qt connected the views to scene.changed when it was emitted: disconnect them (if
+            # nothing else is connected) so that Qt sends the updates directly to them again.
+            disconnected_views = []
+            for scene_view in scene.views():
+                try:
+                    scene.changed.disconnect(scene_view.updateScene)
+                except TypeError:
+                    continue  # Not connected.
+                disconnected_views.append(scene_view)
+
+            if scene.receivers(scene.changed) > 0:
+                for scene_view in disconnected_views:
+                    scene.changed.connect(scene_view.updateScene)
+                disconnected_views = []
+        except RuntimeError:
+            return  # i.e.: the scene was already deleted.
+        self._disconnected_views = [weakref.ref(scene_view) for scene_view in disconnected_views]
+
+    @handle_exception_in_method
+    def showEvent(self, event):
+        # The changes done while hidden weren't tracked.
+        self._connect_scene_changed()
+        self.invalidate()
+        return QWidget.showEvent(self, event)
+
+    @handle_exception_in_method
+    def hideEvent(self, event):
+        self._disconnect_scene_changed()
+        return QWidget.hideEvent(self, event)
+
+    @handle_exception_in_method
+    def resizeEvent(self, event):
+        self.invalidate()
+        return QWidget.resizeEvent(self, event)
+
+    @handle_exception_in_method
+    def paintEvent(self, event):
+        from pyvmmonitor_qt.qt.QtCore import QPointF, QRectF, Qt
+        from pyvmmonitor_qt.qt.QtGui import QPen
+        from pyvmmonitor_qt.qt_utils import painter_on
+
+        view = self._view()
+        if view is None:
+            return
+        if self._full_render_needed or self._image is None:
+            self.update_cache()
+        image = self._image
+        if image is None:
+            return
+
+        with painter_on(self, antialias=False) as painter:
+            painter.fillRect(self.rect(), self.palette().window())
+            painter.drawImage(QPointF(*self._offset), image)
+
+            wx0, wy0, wx1, wy1 = self._get_visible_rect_in_widget(view)
+            pen = QPen(Qt.red)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(QRectF(wx0, wy0, wx1 - wx0, wy1 - wy0))
+
+    def _get_visible_rect_in_widget(self, view):
+        # Note: get_scene_visible_rect() returns x0, y0, x1, y1 (not x, y, w, h).
+        x0, y0, x1, y1 = view.get_scene_visible_rect()
+        wx0, wy0 = self.scene_to_widget(x0, y0)
+        wx1, wy1 = self.scene_to_widget(x1, y1)
+        return wx0, wy0, wx1, wy1
+
+    @handle_exception_in_method
+    def mousePressEvent(self, event):
+        from pyvmmonitor_qt.qt.QtCore import Qt
+        view = self._view()
+        if view is None or self._scene_rect is None or event.button() != Qt.LeftButton:
+            return QWidget.mousePressEvent(self, event)
+
+        pos = event.pos()
+        scene_x, scene_y = self.widget_to_scene(pos.x(), pos.y())
+        wx0, wy0, wx1, wy1 = self._get_visible_rect_in_widget(view)
+        if wx0 <= pos.x() <= wx1 and wy0 <= pos.y() <= wy1:
+            # Dragging the visible rect: keep the offset to its center.
+            center_x, center_y = view.get_center()
+            self._drag_offset = (center_x - scene_x, center_y - scene_y)
+        else:
+            self._drag_offset = (0., 0.)
+            view.centerOn(scene_x, scene_y)
+        event.accept()
+
+    @handle_exception_in_method
+    def mouseMoveEvent(self, event):
+        view = self._view()
+        if view is None or self._drag_offset is None:
+            return QWidget.mouseMoveEvent(self, event)
+
+        pos = event.pos()
+        scene_x, scene_y = self.widget_to_scene(pos.x(), pos.y())
+        view.centerOn(scene_x + self._drag_offset[0], scene_y + self._drag_offset[1])
+        event.accept()
+
+    @handle_exception_in_method
+    def mouseReleaseEvent(self, event):
+        if self._drag_offset is None:
+            return QWidget.mouseReleaseEvent(self, event)
+        self._drag_offset = None
+        event.accept()
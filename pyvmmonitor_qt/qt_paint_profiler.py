@@ -0,0 +1,244 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+An opt-in profiler for the paint of widgets (ZoomableGraphicsView and QPixmapWidget).
+
+For each frame (paint event) it keeps the total time, the area of the dirty region, the time of
+sections of the paint (i.e.: drawBackground) and the time/number of items painted per item class
+(for items whose paint is decorated with profile_item_paint, i.e.: the custom items from
+qt_graphics_items).
+
+i.e.:
+
+profiler = PaintProfiler()
+view.set_paint_profiler(profiler)  # A HUD with p50/p95/p99 is shown if profiler.show_hud.
+...
+stats = profiler.get_stats()
+assert stats['frame_time'][PERCENTILE_95] < 1 / 60.
+'''
+import functools
+from collections import deque
+
+from pyvmmonitor_qt.qt_animation_clock import get_time
+
+PERCENTILE_50 = 50
+PERCENTILE_95 = 95
+PERCENTILE_99 = 99
+
+PERCENTILES = (PERCENTILE_50, PERCENTILE_95, PERCENTILE_99)
+
+# The profilers of the frames being painted (the last one receives the item paint times).
+_active_profilers = []
+
+
+def calculate_percentiles(values, percentiles=PERCENTILES):
+    '''
+    :return dict(int, float):
+        A dict with the percentile -> value (nearest rank) for each of the given percentiles.
+    '''
+    values = sorted(values)
+    if not values:
+        return dict((percentile, 0.) for percentile in percentiles)
+    last = len(values) - 1
+    return dict(
+        (percentile, values[int(round(last * percentile / 100.))]) for percentile in percentiles)
+
+
+def get_region_area(region):
+    '''
+    :param QRegion region:
+    '''
+    rects = region.rects() if hasattr(region, 'rects') else list(region)
+    return sum(rect.width() * rect.height() for rect in rects)
+
+
+def profile_item_paint(paint):
+    '''
+    Decorator for `QGraphicsItem.paint` overrides which reports the paint time of the item to the
+    profiler of the frame being painted (if any).
+    '''
+
+    @functools.wraps(paint)
+    def paint_and_profile(self, painter, option, widget=None):
+        if not _active_profilers:
+            return paint(self, painter, option, widget)
+
+        profiler = _active_profilers[-1]
+        start = get_time()
+        try:
+            return paint(self, painter, option, widget)
+        finally:
+            profiler.add_item_paint(self.__class__.__name__, get_time() - start)
+
+    return paint_and_profile
+
+
+class PaintFrameStats(object):
+
+    __slots__ = ['frame_time', 'dirty_area', 'items_painted', 'section_times', 'item_times']
+
+    def __init__(self, dirty_area):
+        self.frame_time = 0.
+        self.dirty_area = dirty_area
+        self.items_painted = 0
+
+        # name -> time
+        self.section_times = {}
+
+        # class name -> [count, time]
+        self.item_times = {}
+
+
+class PaintProfiler(object):
+
+    def __init__(self, max_frames=240):
+        self._frames = deque(maxlen=max_frames)
+        self._frame = None
+        self._frame_start = None
+        self.show_hud = True
+
+    def start_frame(self, dirty_area=0):
+        '''
+        Must be called when the paint of a frame starts (and end_frame() when it finishes).
+        '''
+        self._frame = PaintFrameStats(dirty_area)
+        self._frame_start = get_time()
+        _active_profilers.append(self)
+
+    def end_frame(self):
+        frame = self._frame
+        if frame is None:
+            return
+        frame.frame_time = get_time() - self._frame_start
+        self._frames.append(frame)
+        self._frame = None
+        if _active_profilers and _active_profilers[-1] is self:
+            _active_profilers.pop()
+        else:
+            try:
+                _active_profilers.remove(self)
+            except ValueError:
+                pass
+
+    def add_section_time(self, name, elapsed):
+        frame = self._frame
+        if frame is not None:
+            frame.section_times[name] = frame.section_times.get(name, 0.) + elapsed
+
+    def add_item_paint(self, class_name, elapsed):
+        frame = self._frame
+        if frame is not None:
+            frame.items_painted += 1
+            item_time = frame.item_times.get(class_name)
+            if item_time is None:
+                frame.item_times[class_name] = [1, elapsed]
+            else:
+                item_time[0] += 1
+                item_time[1] += elapsed
+
+    def clear(self):
+        self._frames.clear()
+
+    def get_frames(self):
+        '''
+        :return list(PaintFrameStats):
+            The stats of the last frames painted.
+        '''
+        return list(self._frames)
+
+    def get_stats(self):
+        '''
+        :return dict:
+            {
+                'frames': number of frames,
+                'frame_time': {percentile: seconds},
+                'dirty_area': {percentile: pixels},
+                'items_painted': {percentile: count},
+                'sections': {name: {percentile: seconds}},
+                'item_classes': {class name: {'count': total count, 'time': total seconds,
+                                              'time_per_frame': {percentile: seconds}}},
+            }
+        '''
+        frames = self._frames
+
+        section_names = set()
+        class_names = set()
+        for frame in frames:
+            section_names.update(frame.section_times)
+            class_names.update(frame.item_times)
+
+        item_classes = {}
+        for class_name in class_names:
+            times = [frame.item_times.get(class_name, (0, 0.)) for frame in frames]
+            item_classes[class_name] = {
+                'count': sum(t[0] for t in times),
+                'time': sum(t[1] for t in times),
+                'time_per_frame': calculate_percentiles([t[1] for t in times]),
+            }
+
+        return {
+            'frames': len(frames),
+            'frame_time': calculate_percentiles([frame.frame_time for frame in frames]),
+            'dirty_area': calculate_percentiles([frame.dirty_area for frame in frames]),
+            'items_painted': calculate_percentiles([frame.items_painted for frame in frames]),
+            'sections': dict(
+                (name, calculate_percentiles(
+                    [frame.section_times.get(name, 0.) for frame in frames]))
+                for name in section_names),
+            'item_classes': item_classes,
+        }
+
+    def get_hud_lines(self):
+        stats = self.get_stats()
+
+        def ms(percentiles):
+            return '%.2f / %.2f / %.2f ms' % tuple(
+                percentiles[percentile] * 1000. for percentile in PERCENTILES)
+
+        lines = [
+            'Frames: %s (p50 / p95 / p99)' % (stats['frames'],),
+            'Frame: %s' % (ms(stats['frame_time']),),
+        ]
+        for name, percentiles in sorted(stats['sections'].items()):
+            lines.append('%s: %s' % (name, ms(percentiles)))
+
+        items_painted = stats['items_painted']
+        lines.append('Items: %d / %d / %d' % tuple(
+            items_painted[percentile] for percentile in PERCENTILES))
+        for class_name, item_stats in sorted(
+                stats['item_classes'].items(), key=lambda tup: -tup[1]['time']):
+            lines.append('  %s: %s' % (class_name, ms(item_stats['time_per_frame'])))
+
+        dirty_area = stats['dirty_area']
+        lines.append('Dirty px: %d / %d / %d' % tuple(
+            dirty_area[percentile] for percentile in PERCENTILES))
+        return lines
+
+    def paint_hud(self, painter, rect):
+        '''
+        Paints the HUD with the stats at the top-left of the given rect (in device coordinates).
+        '''
+        from pyvmmonitor_qt.qt.QtCore import QRectF, Qt
+        from pyvmmonitor_qt.qt.QtGui import QColor
+
+        lines = self.get_hud_lines()
+        metrics = painter.fontMetrics()
+        line_height = metrics.height()
+        width = max(metrics.width(line) if hasattr(metrics, 'width')
+                    else metrics.horizontalAdvance(line) for line in lines) + 10
+
+        painter.save()
+        try:
+            painter.resetTransform()
+            painter.setClipping(False)
+            hud_rect = QRectF(rect.x() + 4, rect.y() + 4, width, line_height * len(lines) + 6)
+            painter.fillRect(hud_rect, QColor(0, 0, 0, 160))
+            painter.setPen(Qt.white)
+            y = hud_rect.y() + 3 + metrics.ascent()
+            for line in lines:
+                painter.drawText(int(hud_rect.x() + 5), int(y), line)
+                y += line_height
+        finally:
+            painter.restore()
@@ -3,9 +3,108 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+import math
+from collections import OrderedDict
+
+
+class PainterPathCache(object):
+    '''
+    A bounded (LRU) cache of QPainterPaths keyed by their geometry (i.e.: a hash of the points
+    and the parameters used to create it).
+
+    Note: a copy of the cached path is always returned (QPainterPath is implicitly shared, so,
+    the copy is cheap and changing it doesn't change the cached path).
+    '''
+
+    # Paths with more points than this are not cached (hashing the points wouldn't pay off and
+    # would keep too much memory alive).
+    MAX_CACHED_POINTS = 10000
+
+    # Same as MAX_CACHED_POINTS for paths created from a sequence of points (which have to be
+    # packed in Python to be hashed).
+    MAX_CACHED_SEQUENCE_POINTS = 1000
+
+    def __init__(self, max_size=256):
+        self._max_size = max_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        '''
+        :return dict:
+            With the hits, misses and size of the cache.
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
+
+    def get(self, key, create_path):
+        '''
+        :param key:
+            A hashable key which identifies the path geometry.
+
+        :param callable create_path:
+            Called to create the path if it's still not in the cache.
+
+        :return QPainterPath:
+            A copy of the cached path.
+        '''
+        from pyvmmonitor_qt.qt.QtGui import QPainterPath
+        cache = self._cache
+        path = cache.get(key)
+        if path is not None:
+            self.hits += 1
+            # Move to the end (most recently used).
+            del cache[key]
+            cache[key] = path
+        else:
+            self.misses += 1
+            path = cache[key] = create_path()
+            if len(cache) > self._max_size:
+                cache.popitem(last=False)
+        return QPainterPath(path)
+
+
+_painter_path_cache = PainterPathCache()
+
+
+def get_painter_path_cache():
+    return _painter_path_cache
+
+
+def _get_array_key(points):
+    import hashlib
+    return (points.shape, hashlib.sha1(points.tobytes()).hexdigest())
+
+
+def _get_points_key(points):
+    # Note: the key is a digest (so, the cache doesn't keep the points alive).
+    import hashlib
+    from array import array
+    coords = array('d')
+    for p in points:
+        coords.extend(p)
+    return (len(coords), hashlib.sha1(coords).hexdigest())
 
 
 def create_painter_path_from_points(points, clockwise=None):
+    if not isinstance(points, (list, tuple)):
+        points = list(points)
+    if len(points) > PainterPathCache.MAX_CACHED_SEQUENCE_POINTS:
+        return _create_painter_path_from_points(points, clockwise)
+    return _painter_path_cache.get(
+        ('points', _get_points_key(points), clockwise),
+        lambda: _create_painter_path_from_points(points, clockwise))
+
+
+def _create_painter_path_from_points(points, clockwise):
     if clockwise is not None:
         from pyvmmonitor_core import math_utils
         if clockwise != math_utils.is_clockwise(points):
@@ -22,6 +121,12 @@ def create_painter_path_from_points(points, clockwise=None):
 
 
 def create_equilateral_triangle_painter_path(triangle_size):
+    return _painter_path_cache.get(
+        ('equilateral_triangle', triangle_size),
+        lambda: _create_equilateral_triangle_painter_path(triangle_size))
+
+
+def _create_equilateral_triangle_painter_path(triangle_size):
     from pyvmmonitor_core import math_utils
     from pyvmmonitor_qt.qt.QtGui import QPainterPath
 
@@ -32,3 +137,190 @@ def create_equilateral_triangle_painter_path(triangle_size):
     path.lineTo(0, 0)
 
     return path
+
+
+def is_clockwise_array(points):
+    '''
+    Same as pyvmmonitor_core.math_utils.is_clockwise but vectorized for an (N, 2) numpy array.
+    '''
+    import numpy
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return False
+    xs = points[:, 0]
+    ys = points[:, 1]
+    next_xs = numpy.roll(xs, -1)
+    next_ys = numpy.roll(ys, -1)
+    return float(numpy.sum((next_xs - xs) * (next_ys + ys))) > 0
+
+
+def _get_points_array(points, clockwise):
+    import numpy
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    if clockwise is not None and clockwise != is_clockwise_array(points):
+        points = points[::-1]  # Just a view (no copy).
+    return points
+
+
+def create_qpolygonf_from_array(points, clockwise=None):
+    '''
+    Same as qt_utils.create_qpolygon_from_points but for an (N, 2) numpy array (the polygon
+    memory is filled directly from the array, without a QPointF for each point).
+    '''
+    from pyvmmonitor_qt.qt_transform import array_to_qpolygonf
+    return array_to_qpolygonf(_get_points_array(points, clockwise))
+
+
+def create_painter_path_from_array(points, clockwise=None):
+    '''
+    Same as create_painter_path_from_points but for an (N, 2) numpy array.
+    '''
+    import numpy
+    points = numpy.ascontiguousarray(points, dtype=numpy.float64).reshape(-1, 2)
+    if len(points) > PainterPathCache.MAX_CACHED_POINTS:
+        return _create_painter_path_from_array(points, clockwise)
+    return _painter_path_cache.get(
+        ('array', _get_array_key(points), clockwise),
+        lambda: _create_painter_path_from_array(points, clockwise))
+
+
+def _create_painter_path_from_array(points, clockwise):
+    from pyvmmonitor_qt.qt.QtGui import QPainterPath
+
+    polygon = create_qpolygonf_from_array(points, clockwise)
+    path = QPainterPath()
+    if polygon.isEmpty():
+        return path
+    path.addPolygon(polygon)
+    path.lineTo(polygon.at(0))  # Close
+    return path
+
+
+def _radial_prefilter_mask(points, tolerance):
+    # Consecutive points which fall in the same grid cell are collapsed into the first one
+    # (the cell diagonal is the tolerance, so, the error is bounded by it).
+    import numpy
+    cell_size = tolerance / math.sqrt(2.)
+    cells = numpy.floor(points / cell_size)
+    keep = numpy.empty(len(points), dtype=bool)
+    keep[0] = True
+    numpy.any(cells[1:] != cells[:-1], axis=1, out=keep[1:])
+    keep[-1] = True
+    return keep
+
+
+def _douglas_peucker_mask(points, tolerance):
+    import numpy
+    size = len(points)
+    keep = numpy.zeros(size, dtype=bool)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+
+    stack = [(0, size - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        p0 = points[start]
+        segment = points[end] - p0
+        diff = points[start + 1:end] - p0
+        len_sq = numpy.dot(segment, segment)
+        if len_sq > 0:
+            t = numpy.clip(numpy.dot(diff, segment) / len_sq, 0., 1.)
+            diff = diff - t[:, numpy.newaxis] * segment
+        dist_sq = numpy.einsum('ij,ij->i', diff, diff)
+        i = int(numpy.argmax(dist_sq))
+        if dist_sq[i] > tolerance_sq:
+            i += start + 1
+            keep[i] = True
+            stack.append((start, i))
+            stack.append((i, end))
+    return keep
+
+
+def simplify_polyline_array(points, tolerance):
+    '''
+    Simplifies the given polyline so that no point is farther than the tolerance from the
+    simplified polyline (a radial prefilter and then Douglas-Peucker, each with half of the
+    tolerance).
+
+    :param numpy.ndarray points:
+        The (N, 2) points.
+
+    :return numpy.ndarray:
+        The (M, 2) simplified points (the first and last points are always kept).
+    '''
+    import numpy
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    if len(points) < 3 or tolerance <= 0:
+        return points
+
+    half_tolerance = tolerance / 2.
+    points = points[_radial_prefilter_mask(points, half_tolerance)]
+    if len(points) < 3:
+        return points
+    return points[_douglas_peucker_mask(points, half_tolerance)]
+
+
+class SimplifiedPainterPaths(object):
+    '''
+    Keeps painter paths (as create_painter_path_from_array) simplified for the different zoom
+    levels (so that a path with many more vertices than pixels on screen is faster to paint when
+    zoomed out).
+
+    The path for a given zoom has an error of at most TOLERANCE_IN_PX device pixels and is
+    only computed when first requested.
+    '''
+
+    TOLERANCE_IN_PX = 0.5
+
+    # If the simplified path would have more than this ratio of the original vertices, the
+    # original path is used instead.
+    MAX_RATIO = 0.5
+
+    def __init__(self, points, clockwise=None, zoom_levels=None):
+        '''
+        :param numpy.ndarray points:
+            The (N, 2) points of the path.
+
+        :param list(float) zoom_levels:
+            The zoom levels for which the simplified paths are created (by default
+            ZoomableGraphicsView.ZOOM_LEVELS).
+        '''
+        if zoom_levels is None:
+            from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+            zoom_levels = ZoomableGraphicsView.ZOOM_LEVELS
+
+        self._points = _get_points_array(points, clockwise)
+        self._zoom_levels = tuple(sorted(zoom_levels))
+        self._zoom_level_to_path = {}
+        self._full_path = None
+
+    def get_full_path(self):
+        if self._full_path is None:
+            self._full_path = _create_painter_path_from_array(self._points, None)
+        return self._full_path
+
+    def get_path(self, zoom):
+        '''
+        :return QPainterPath:
+            The path to be painted at the given zoom (the full path at or above the top zoom
+            level).
+        '''
+        import bisect
+        zoom_levels = self._zoom_levels
+        if not zoom_levels or zoom >= zoom_levels[-1]:
+            return self.get_full_path()
+        i = bisect.bisect_left(zoom_levels, zoom)
+
+        # Use the path of the next zoom level (it has a smaller tolerance in the scene).
+        zoom_level = zoom_levels[i]
+        path = self._zoom_level_to_path.get(zoom_level)
+        if path is None:
+            points = simplify_polyline_array(self._points, self.TOLERANCE_IN_PX / zoom_level)
+            if len(points) > len(self._points) * self.MAX_RATIO:
+                path = self.get_full_path()
+            else:
+                path = _create_painter_path_from_array(points, None)
+            self._zoom_level_to_path[zoom_level] = path
+        return path
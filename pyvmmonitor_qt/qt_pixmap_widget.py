@@ -3,35 +3,100 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+from collections import OrderedDict
+
 from pyvmmonitor_core import overrides
 from pyvmmonitor_qt.qt.QtWidgets import QWidget
 
 
-def create_tiled_pixmap(width, height, brush_square_len):
+# (brush_square_len, colors rgba, device_pixel_ratio) -> QBrush (most recently used last).
+_tiled_brushes = OrderedDict()
+
+# Maximum number of tiled brushes kept in the cache.
+MAX_CACHED_TILED_BRUSHES = 32
+
+
+def create_tiled_brush(brush_square_len, colors=None, device_pixel_ratio=1.):
+    '''
+    Provides a texture brush with a checkerboard pattern (to be used as a background when drawing
+    transparent colors), so, any rect may be filled with it without creating a pixmap of its size.
+
+    Note: brushes are cached (and shared), so, the returned brush must not be changed.
+
+    :param brush_square_len: len of each square to be drawn.
+    :param colors: tuple(QColor, QColor) with the colors of the squares (white/gray by default).
+    :param device_pixel_ratio: the device pixel ratio of the device where it'll be painted.
+    '''
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt.QtGui import QBrush, QColor, QPixmap
+    from pyvmmonitor_qt.qt_utils import painter_on
+
+    brush_square_len = max(1, int(brush_square_len))
+    if colors is None:
+        colors = (Qt.white, Qt.gray)
+    colors = tuple(QColor(color) for color in colors)
+    key = (brush_square_len, tuple(color.rgba() for color in colors), device_pixel_ratio)
+
+    brush = _tiled_brushes.pop(key, None)
+    if brush is None:
+        pattern_len = brush_square_len * 2  # The pattern has 2x2 squares.
+        pixmap_len = int(round(pattern_len * device_pixel_ratio))
+        p = QPixmap(pixmap_len, pixmap_len)
+        p.setDevicePixelRatio(device_pixel_ratio)
+        with painter_on(p, antialias=False) as pix_painter:
+            pix_painter.fillRect(0, 0, pattern_len, pattern_len, colors[0])
+            pix_painter.fillRect(0, 0, brush_square_len, brush_square_len, colors[1])
+            pix_painter.fillRect(
+                brush_square_len, brush_square_len, brush_square_len, brush_square_len, colors[1])
+        brush = QBrush(p)
+
+        while len(_tiled_brushes) >= MAX_CACHED_TILED_BRUSHES:
+            _tiled_brushes.popitem(last=False)
+
+    _tiled_brushes[key] = brush
+    return brush
+
+
+def create_tiled_pixmap(width, height, brush_square_len, colors=None, device_pixel_ratio=1.):
     '''
     Creates a pixmap which is tiled (to be used as a background when drawing transparent colors).
     :param width: pixmap width
     :param height: pixmap height
     :param brush_square_len: len of each square to be drawn.
+
+    Note: if the pixmap is just used to fill some area, prefer create_tiled_brush.
     '''
-    from pyvmmonitor_qt.qt.QtGui import QPixmap, QBrush
     from pyvmmonitor_qt.qt_utils import painter_on
-    from pyvmmonitor_qt.qt.QtCore import Qt
-    brush_square_len *= 2  # Double because we'll create a pattern that's twice the size.
-    p = QPixmap(brush_square_len, brush_square_len)
-    middle = brush_square_len / 2
+    width = int(width)
+    height = int(height)
+    p = create_device_pixmap(width, height, device_pixel_ratio)
     with painter_on(p, antialias=False) as pix_painter:
-        pix_painter.fillRect(0, 0, brush_square_len, brush_square_len, Qt.white)
-        pix_painter.fillRect(0, 0, middle, middle, Qt.gray)
-        pix_painter.fillRect(middle, middle, brush_square_len, brush_square_len, Qt.gray)
-        pix_painter.end()
-        brush = QBrush(p)
-
-    p2 = QPixmap(width, height)
-    with painter_on(p2, antialias=False) as pix_painter:
         pix_painter.fillRect(
-            0, 0, width, height, brush)
-    return p2
+            0, 0, width, height, create_tiled_brush(brush_square_len, colors, device_pixel_ratio))
+    return p
+
+
+def create_device_pixmap(width, height, device_pixel_ratio=1.):
+    '''
+    Creates a pixmap with the given logical size to be painted in a device with the given device
+    pixel ratio (i.e.: the pixmap has width * device_pixel_ratio physical pixels, but painting on
+    it or painting it is still done in logical coordinates).
+    '''
+    from pyvmmonitor_qt.qt.QtGui import QPixmap
+    p = QPixmap(
+        max(1, int(round(width * device_pixel_ratio))),
+        max(1, int(round(height * device_pixel_ratio))))
+    p.setDevicePixelRatio(device_pixel_ratio)
+    return p
+
+
+def get_pixmap_logical_size(pixmap):
+    '''
+    :return tuple(float, float):
+        The size of the given pixmap in logical (device independent) pixels.
+    '''
+    device_pixel_ratio = pixmap.devicePixelRatio()
+    return pixmap.width() / device_pixel_ratio, pixmap.height() / device_pixel_ratio
 
 
 class QPixmapWidget(QWidget):
@@ -41,20 +106,62 @@ class QPixmapWidget(QWidget):
 
     Note that an internal flag _regenerate_pixmap_on_resize is kept to signal if
     the pixmap should be regenerated on each resize (subclasses may want to change it).
+
+    The created pixmap should have the physical size of the widget (see: create_device_pixmap
+    and _device_pixel_ratio), so, it's regenerated if the device pixel ratio changes (i.e.: when
+    the window is moved to a screen with a different scale).
+
+    Subclasses may override _get_pixmap_cache_params so that the created pixmaps are shared in
+    the QPixmapCache (so, widgets of the same class with the same params and physical size use the
+    same pixmap and the memory used is limited by QPixmapCache.cacheLimit()).
+
+    If PROGRESSIVE_REGENERATION is True, while the widget is being resized the last pixmap
+    is shown scaled and the pixmap is only regenerated (at full quality) after the size doesn't
+    change for REGENERATE_DELAY_IN_MS (subclasses may also override _create_image_factory so
+    that the regeneration is done in a worker thread).
     '''
 
     _regenerate_pixmap_on_resize = True
 
+    PROGRESSIVE_REGENERATION = False
+
+    REGENERATE_DELAY_IN_MS = 150
+
     def __init__(self, *args, **kwargs):
         super(QPixmapWidget, self).__init__(*args, **kwargs)
         self._pixmap = None
         self._last_pos = None
         self._last_widget_size = None
+        self._last_device_pixel_ratio = None
 
         # When the pixmap is drawn, this will hold the amount translated to print the pixmap
         # centered in the widget.
         self._pixmap_offset = (0, 0)
 
+        # Only set when profiling (see: set_paint_profiler).
+        self._paint_profiler = None
+
+        # The last pixmap created at full quality and the widget size for which it was created
+        # (used to show a scaled version while resizing in the progressive mode).
+        self._source_pixmap = None
+        self._source_widget_size = None
+
+        # Only created when needed in the progressive mode.
+        self._regenerate_timer = None
+        self._render_queue = None
+
+    def set_paint_profiler(self, paint_profiler):
+        '''
+        :param pyvmmonitor_qt.qt_paint_profiler.PaintProfiler paint_profiler:
+            If given, the paint of each frame (and the creation of the pixmap) is profiled (None
+            to stop profiling).
+        '''
+        self._paint_profiler = paint_profiler
+        self.update()
+
+    def get_paint_profiler(self):
+        return self._paint_profiler
+
     @property
     def pixmap(self):
         return self._pixmap
@@ -62,6 +169,7 @@ class QPixmapWidget(QWidget):
     @pixmap.setter
     def pixmap(self, pixmap):
         self._pixmap = pixmap
+        self._source_pixmap = None
         # If the user is setting it from the outside, don't regenerate when a different
         # size is detected.
         self._regenerate_pixmap_on_resize = False
@@ -69,23 +177,54 @@ class QPixmapWidget(QWidget):
 
     @overrides(QWidget.paintEvent)
     def paintEvent(self, ev):
+        profiler = self._paint_profiler
+        if profiler is None:
+            self._paint(ev, None)
+            return
+
+        from pyvmmonitor_qt.qt_paint_profiler import get_region_area
+        profiler.start_frame(get_region_area(ev.region()))
+        try:
+            self._paint(ev, profiler)
+        finally:
+            profiler.end_frame()
+
+    def _paint(self, ev, profiler):
         from pyvmmonitor_qt.qt_utils import painter_on
         pixmap = self._pixmap
         widget_size = self._w, self._h
-
-        if pixmap is None or (
-                self._regenerate_pixmap_on_resize and widget_size != self._last_widget_size):
-            pixmap = self.force_create_pixmap()
+        device_pixel_ratio = self._device_pixel_ratio
+        device_pixel_ratio_changed = device_pixel_ratio != self._last_device_pixel_ratio
+
+        if pixmap is None or (self._regenerate_pixmap_on_resize and (
+                widget_size != self._last_widget_size or device_pixel_ratio_changed)):
+            scaled_pixmap = None
+            if pixmap is not None and self.PROGRESSIVE_REGENERATION and (
+                    not device_pixel_ratio_changed) and self._find_shared_pixmap() is None:
+                # Only the size changed: show the last pixmap scaled (the pixmap is regenerated
+                # when the resize settles).
+                scaled_pixmap = self._create_scaled_pixmap(widget_size)
+
+            if scaled_pixmap is not None:
+                pixmap = scaled_pixmap
+                self._schedule_regeneration()
+
+            elif profiler is None:
+                pixmap = self.force_create_pixmap()
+            else:
+                from pyvmmonitor_qt.qt_animation_clock import get_time
+                start = get_time()
+                pixmap = self.force_create_pixmap()
+                profiler.add_section_time('create_pixmap', get_time() - start)
 
             if pixmap is None:
                 self._last_widget_size = None
                 return
 
-            pixmap_size = pixmap.width(), pixmap.height()
             self._last_widget_size = widget_size
-        else:
-            pixmap_size = pixmap.width(), pixmap.height()
+            self._last_device_pixel_ratio = device_pixel_ratio
 
+        pixmap_size = get_pixmap_logical_size(pixmap)
         with painter_on(self, False) as painter:
             # Draws the pixmap centered in the widget.
             diff = int((widget_size[0] - pixmap_size[0]) / 2), \
@@ -94,8 +233,23 @@ class QPixmapWidget(QWidget):
             self._pixmap_offset = diff
             painter.drawPixmap(diff[0], diff[1], pixmap)
 
+            if profiler is not None and profiler.show_hud:
+                profiler.paint_hud(painter, self.rect())
+
     def force_create_pixmap(self):
-        pixmap = self._pixmap = self._create_pixmap()
+        if self._render_queue is not None:
+            # A pixmap being created in a worker thread is outdated now.
+            self._render_queue.cancel_all()
+
+        pixmap = self._find_shared_pixmap()
+        if pixmap is None:
+            pixmap = self._create_pixmap()
+            if pixmap is not None:
+                self._share_pixmap(pixmap)
+
+        self._pixmap = pixmap
+        self._source_pixmap = pixmap
+        self._source_widget_size = self._w, self._h
         return pixmap
 
     def _create_pixmap(self):
@@ -104,6 +258,135 @@ class QPixmapWidget(QWidget):
         used when the pixmap relies on the size).
         '''
 
+    def _create_image_factory(self):
+        '''
+        Subclasses can override so that in the progressive mode the pixmap is regenerated in a
+        worker thread.
+
+        :return callable:
+            A function which returns a QImage with the contents of the pixmap for the current size
+            and device pixel ratio (it's called in a worker thread, so, it must not access the
+            widget) or None to regenerate with _create_pixmap in the UI thread.
+        '''
+
+    def _get_pixmap_cache_params(self):
+        '''
+        Subclasses can override so that the created pixmaps are shared among widgets.
+
+        :return object:
+            None if the pixmap shouldn't be shared or the params (besides the class and the
+            physical size of the widget) which define the contents of the pixmap. Note that its
+            repr() is used in the key, so, it should be composed of builtin values (i.e.: tuples of
+            ints, floats and strings).
+        '''
+
+    def _get_pixmap_cache_key(self, widget_size=None, device_pixel_ratio=None):
+        params = self._get_pixmap_cache_params()
+        if params is None:
+            return None
+
+        if widget_size is None:
+            widget_size = self._w, self._h
+        if device_pixel_ratio is None:
+            device_pixel_ratio = self._device_pixel_ratio
+        cls = self.__class__
+        return '%s.%s:%r:%sx%s@%s' % (
+            cls.__module__, cls.__name__, params,
+            int(round(widget_size[0] * device_pixel_ratio)),
+            int(round(widget_size[1] * device_pixel_ratio)),
+            device_pixel_ratio)
+
+    def _find_shared_pixmap(self, cache_key=None):
+        '''
+        :return QPixmap:
+            The pixmap (for the current size and device pixel ratio) created by some widget with
+            the same cache key or None if it's not available.
+        '''
+        from pyvmmonitor_qt.qt.QtGui import QPixmapCache
+
+        if cache_key is None:
+            cache_key = self._get_pixmap_cache_key()
+            if cache_key is None:
+                return None
+
+        pixmap = QPixmapCache.find(cache_key)
+        if pixmap is None or pixmap.isNull():
+            return None
+        return pixmap
+
+    def _share_pixmap(self, pixmap, cache_key=None):
+        from pyvmmonitor_qt.qt.QtGui import QPixmapCache
+
+        if cache_key is None:
+            cache_key = self._get_pixmap_cache_key()
+            if cache_key is None:
+                return
+        # Note: if it doesn't fit in the cache limit it's just not shared.
+        QPixmapCache.insert(cache_key, pixmap)
+
+    def _create_scaled_pixmap(self, widget_size):
+        from pyvmmonitor_qt.qt.QtCore import Qt
+
+        source_pixmap = self._source_pixmap
+        source_widget_size = self._source_widget_size
+        if source_pixmap is None or source_pixmap.isNull() or (
+                source_widget_size[0] <= 0 or source_widget_size[1] <= 0):
+            return None
+
+        # Note: always scale from the full quality pixmap (and not from the last scaled one).
+        width = max(1, int(round(
+            source_pixmap.width() * widget_size[0] / float(source_widget_size[0]))))
+        height = max(1, int(round(
+            source_pixmap.height() * widget_size[1] / float(source_widget_size[1]))))
+        pixmap = self._pixmap = source_pixmap.scaled(
+            width, height, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        return pixmap
+
+    def _schedule_regeneration(self):
+        if self._regenerate_timer is None:
+            from pyvmmonitor_qt.qt.QtCore import QTimer
+            self._regenerate_timer = QTimer(self)
+            self._regenerate_timer.setSingleShot(True)
+            self._regenerate_timer.timeout.connect(self._regenerate)
+        # Restarting the timer on each resize makes it fire only after the resize settles.
+        self._regenerate_timer.start(self.REGENERATE_DELAY_IN_MS)
+
+    def _regenerate(self):
+        image_factory = self._create_image_factory()
+        if image_factory is None or self._find_shared_pixmap() is not None:
+            self.force_create_pixmap()
+            self.update()
+            return
+
+        if self._render_queue is None:
+            from pyvmmonitor_qt.qt_tiles import TileRenderQueue
+            self._render_queue = TileRenderQueue(self._on_image_created)
+        self._render_queue.request((self._w, self._h, self._device_pixel_ratio), image_factory)
+
+    def _on_image_created(self, key, image):
+        from pyvmmonitor_qt.qt.QtGui import QImage, QPixmap
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+
+        if not is_qobject_alive(self) or not isinstance(image, QImage):
+            return
+        widget_size, device_pixel_ratio = key[:2], key[2]
+        if widget_size != (self._w, self._h) or device_pixel_ratio != self._device_pixel_ratio:
+            # Resized (or moved to another screen) in the meanwhile (a new regeneration is
+            # already scheduled).
+            return
+
+        pixmap = self._pixmap = QPixmap.fromImage(image)
+        self._share_pixmap(pixmap)
+        self._source_pixmap = pixmap
+        self._source_widget_size = widget_size
+        self._last_widget_size = widget_size
+        self._last_device_pixel_ratio = device_pixel_ratio
+        self.update()
+
+    @property
+    def _device_pixel_ratio(self):
+        return self.devicePixelRatioF()
+
     @property
     def _w(self):
         return self.width()
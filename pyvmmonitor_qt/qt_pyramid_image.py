@@ -0,0 +1,329 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+Helpers to show huge images (i.e.: 30k x 30k) in a ZoomableGraphicsView.
+
+The image (a numpy array, which may be a numpy.memmap of a raw file) is kept in an ImagePyramid
+which builds mipmap levels (each level has half the size of the previous one) in a background
+thread. The PyramidImageItem paints only the tiles which intersect the exposed rect at the level
+which matches the current zoom. Tiles are decoded in worker threads and kept in a LRU cache.
+
+i.e.:
+
+pyramid = ImagePyramid.from_raw_file('image.raw', width=30000, height=30000, channels=4)
+pyramid.start_building_levels()
+view.scene().addItem(PyramidImageItem(pyramid))
+'''
+import math
+import threading
+
+from pyvmmonitor_core.log_utils import get_logger
+from pyvmmonitor_qt.qt.QtCore import QRectF
+from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem
+from pyvmmonitor_qt.qt_tiles import TileCache, TileRenderQueue
+
+logger = get_logger(__name__)
+
+
+def _downsample(level, rows_per_chunk=512):
+    # Creates the next level (half the size) with a 2x2 box filter (processed in chunks of rows
+    # so that the temporary arrays are small even for huge levels).
+    # Note: a side with a single pixel is repeated (so, a level is never empty and its size
+    # matches ImagePyramid.get_level_size).
+    import numpy
+    src_height, src_width = level.shape[:2]
+    height = max(1, src_height // 2)
+    width = max(1, src_width // 2)
+    channels_shape = level.shape[2:]
+    ret = numpy.empty((height, width) + channels_shape, dtype=level.dtype)
+
+    for y0 in range(0, height, rows_per_chunk):
+        y1 = min(height, y0 + rows_per_chunk)
+        chunk = numpy.asarray(level[y0 * 2:y1 * 2, :width * 2], dtype=numpy.float32)
+        if src_height == 1:
+            chunk = numpy.repeat(chunk, 2, axis=0)
+        if src_width == 1:
+            chunk = numpy.repeat(chunk, 2, axis=1)
+        chunk = chunk.reshape((y1 - y0, 2, width, 2) + channels_shape)
+        ret[y0:y1] = chunk.mean(axis=(1, 3)) + 0.5
+    return ret
+
+
+class ImagePyramid(object):
+    '''
+    Keeps the mipmap levels of an image.
+
+    Levels which are still not built are sampled (nearest) from the full image (so, tiles are
+    always available, but their quality is better after the levels are built).
+    '''
+
+    TILE_SIZE = 256
+
+    def __init__(self, array):
+        '''
+        :param numpy.ndarray array:
+            A (height, width) uint8 (grayscale), (height, width, 3) uint8 (RGB) or
+            (height, width, 4) uint8 (RGBA) array.
+        '''
+        import numpy
+        if array.dtype != numpy.uint8 or array.ndim not in (2, 3) or (
+                array.ndim == 3 and array.shape[2] not in (3, 4)):
+            raise ValueError(
+                'Expected a (h, w), (h, w, 3) or (h, w, 4) uint8 array. Found: %s %s' % (
+                    array.shape, array.dtype))
+
+        self.height, self.width = array.shape[:2]
+
+        num_levels = 1
+        size = max(self.width, self.height)
+        while size > self.TILE_SIZE:
+            size //= 2
+            num_levels += 1
+        self.num_levels = num_levels
+
+        # Note: the list only grows (in the background thread) when a new level is built.
+        self._levels = [array]
+        self._build_thread = None
+        self._cancel_build = False
+
+    @classmethod
+    def from_raw_file(cls, filename, width, height, channels=4, offset=0):
+        '''
+        Creates a pyramid from a raw file with uint8 pixels (which is memory-mapped, so, it
+        doesn't need to fit in memory).
+        '''
+        import numpy
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        return cls(numpy.memmap(filename, dtype=numpy.uint8, mode='r', offset=offset, shape=shape))
+
+    def get_built_levels_count(self):
+        return len(self._levels)
+
+    def start_building_levels(self, on_level_built=None):
+        '''
+        Starts building the levels in a background thread.
+
+        :param callable on_level_built:
+            Called as on_level_built(level) in the UI thread after each level is built.
+        '''
+        if self._build_thread is not None:
+            return
+
+        # Note: imported in the UI thread (the event loop receiver must live in it).
+        from functools import partial
+        from pyvmmonitor_qt.qt_event_loop import execute_on_next_event_loop
+
+        def build():
+            try:
+                while len(self._levels) < self.num_levels and not self._cancel_build:
+                    self._levels.append(_downsample(self._levels[-1]))
+                    if on_level_built is not None:
+                        execute_on_next_event_loop(
+                            partial(on_level_built, len(self._levels) - 1))
+            except Exception:
+                logger.exception('Error building image pyramid levels.')
+
+        self._cancel_build = False
+        self._build_thread = threading.Thread(target=build)
+        self._build_thread.daemon = True
+        self._build_thread.start()
+
+    def cancel_building_levels(self):
+        self._cancel_build = True
+
+    def wait_levels_built(self, timeout=None):
+        if self._build_thread is not None:
+            self._build_thread.join(timeout)
+
+    def get_level_size(self, level):
+        scale = 2 ** level
+        return max(1, self.width // scale), max(1, self.height // scale)
+
+    def get_tiles_count(self, level):
+        width, height = self.get_level_size(level)
+        tile_size = self.TILE_SIZE
+        return (width + tile_size - 1) // tile_size, (height + tile_size - 1) // tile_size
+
+    def is_level_built(self, level):
+        return level < len(self._levels)
+
+    def get_tile_array(self, level, tx, ty):
+        '''
+        :return numpy.ndarray:
+            The pixels of the given tile (sampled from the full image if the level is still
+            not built).
+        '''
+        tile_size = self.TILE_SIZE
+        width, height = self.get_level_size(level)
+        x0 = tx * tile_size
+        y0 = ty * tile_size
+        x1 = min(width, x0 + tile_size)
+        y1 = min(height, y0 + tile_size)
+
+        levels = self._levels
+        if level < len(levels):
+            return levels[level][y0:y1, x0:x1]
+
+        step = 2 ** level
+        return levels[0][y0 * step:y1 * step:step, x0 * step:x1 * step:step]
+
+    def create_tile_image(self, level, tx, ty):
+        '''
+        :return QImage:
+            A QImage with the given tile (may be called from any thread).
+        '''
+        import numpy
+        from pyvmmonitor_qt.qt.QtGui import QImage
+
+        arr = numpy.ascontiguousarray(self.get_tile_array(level, tx, ty))
+        height, width = arr.shape[:2]
+        if arr.ndim == 2:
+            image_format = QImage.Format_Grayscale8
+        elif arr.shape[2] == 3:
+            image_format = QImage.Format_RGB888
+        else:
+            image_format = QImage.Format_RGBA8888
+
+        # Copy so that the QImage owns its data.
+        return QImage(arr.data, width, height, arr.strides[0], image_format).copy()
+
+
+class PyramidImageItem(QGraphicsItem):
+    '''
+    An item which shows an ImagePyramid (each pixel of the full image is 1 unit in the scene).
+    '''
+
+    def __init__(self, pyramid, parent_item=None, max_bytes=128 * 1024 * 1024):
+        QGraphicsItem.__init__(self, parent_item)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self._pyramid = pyramid
+        self._tile_cache = TileCache(max_bytes)
+        self._render_queue = TileRenderQueue(self._on_tile_rendered)
+
+        # Tiles which were sampled from the full image before the level was built.
+        self._approximate_keys = set()
+
+    def get_pyramid(self):
+        return self._pyramid
+
+    def get_tile_cache(self):
+        return self._tile_cache
+
+    def get_render_queue(self):
+        return self._render_queue
+
+    def start_building_levels(self):
+        '''
+        Builds the pyramid levels in the background (tiles which were approximated in the
+        meanwhile are refreshed when the related level is built).
+        '''
+        self._pyramid.start_building_levels(self._on_level_built)
+
+    def _on_level_built(self, level):
+        for key in list(self._approximate_keys):
+            if key[0] == level:
+                self._approximate_keys.discard(key)
+                self._tile_cache.discard(key)
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self._pyramid.width, self._pyramid.height)
+
+    def get_level_for_zoom(self, zoom):
+        '''
+        :param float zoom:
+            The number of device pixels for each unit in the scene.
+        '''
+        if zoom <= 0:
+            return self._pyramid.num_levels - 1
+        level = int(math.floor(math.log(1.0 / zoom, 2))) if zoom < 1 else 0
+        return max(0, min(level, self._pyramid.num_levels - 1))
+
+    def _get_tile_rect(self, level, tx, ty):
+        pyramid = self._pyramid
+        scale = 2 ** level
+        tile_size = pyramid.TILE_SIZE
+        width, height = pyramid.get_level_size(level)
+        w = min(tile_size, width - tx * tile_size)
+        h = min(tile_size, height - ty * tile_size)
+        return QRectF(tx * tile_size * scale, ty * tile_size * scale, w * scale, h * scale)
+
+    def _on_tile_rendered(self, key, image):
+        self._tile_cache.put(key, image)
+        if not self._pyramid.is_level_built(key[0]):
+            self._approximate_keys.add(key)
+        self.update(self._get_tile_rect(*key))
+
+    def _request_tile(self, key):
+        if self._render_queue.is_pending(key):
+            return
+        pyramid = self._pyramid
+        level, tx, ty = key
+        self._render_queue.request(key, lambda: pyramid.create_tile_image(level, tx, ty))
+
+    def _get_fallback_tile(self, level, tx, ty):
+        # A cached tile of a coarser level which covers the given tile.
+        for coarser_level in range(level + 1, self._pyramid.num_levels):
+            shift = coarser_level - level
+            key = (coarser_level, tx >> shift, ty >> shift)
+            image = self._tile_cache.get(key)
+            if image is not None:
+                return key, image
+        return None, None
+
+    def paint(self, painter, option, widget=None):
+        from pyvmmonitor_qt.qt.QtGui import QPainter
+
+        pyramid = self._pyramid
+        level = self.get_level_for_zoom(painter.worldTransform().m11())
+        scale = 2 ** level
+        tile_scene_size = pyramid.TILE_SIZE * scale
+        tiles_x, tiles_y = pyramid.get_tiles_count(level)
+
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        tx0 = max(0, int(exposed.x() // tile_scene_size))
+        ty0 = max(0, int(exposed.y() // tile_scene_size))
+        tx1 = min(tiles_x - 1, int((exposed.x() + exposed.width()) // tile_scene_size))
+        ty1 = min(tiles_y - 1, int((exposed.y() + exposed.height()) // tile_scene_size))
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+        tile_cache = self._tile_cache
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                key = (level, tx, ty)
+                image = tile_cache.get(key)
+                if image is None:
+                    self._request_tile(key)
+                    fallback_key, image = self._get_fallback_tile(level, tx, ty)
+                    if image is None:
+                        continue
+
+                    # Draw only the part of the coarser tile related to this tile.
+                    target = self._get_tile_rect(level, tx, ty)
+                    fallback_rect = self._get_tile_rect(*fallback_key)
+                    fallback_scale = 2 ** fallback_key[0]
+                    source = QRectF(
+                        (target.x() - fallback_rect.x()) / fallback_scale,
+                        (target.y() - fallback_rect.y()) / fallback_scale,
+                        target.width() / fallback_scale,
+                        target.height() / fallback_scale)
+                    painter.drawImage(target, image, source)
+                    continue
+
+                painter.drawImage(
+                    self._get_tile_rect(level, tx, ty),
+                    image,
+                    QRectF(0, 0, image.width(), image.height()))
+
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.ItemSceneHasChanged and value is None:
+            # Removed from the scene: no need to keep the tiles.
+            self._render_queue.cancel_all()
+            self._tile_cache.clear()
+            self._approximate_keys.clear()
+        return QGraphicsItem.itemChange(self, change, value)
+
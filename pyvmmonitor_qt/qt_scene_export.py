@@ -0,0 +1,321 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+Helpers to export a QGraphicsScene (i.e.: ZoomableGraphicsView.get_scene()) to an image which may
+be larger than what fits in a single QImage (i.e.: exporting at print resolution).
+
+The image is split in horizontal strips: each strip is recorded into a QPicture in the UI thread
+(as QGraphicsScene isn't thread-safe) and the picture is replayed into a QImage and written to
+disk in a worker thread, so, only a few strips are in memory at any time.
+
+Supported formats:
+
+'raw': a single file with the RGBA8888 rows (width * height * 4 bytes, without any header).
+'png': one png file for each strip (see: SceneExporter.get_strip_filename).
+
+i.e.:
+
+exporter = export_scene(
+    view.get_scene(), 'scene.raw', scale=4., on_progress=lambda done, total: ...)
+assert exporter.is_finished() and not exporter.is_cancelled()
+
+Note: works with the `offscreen` QPA platform (no widget needs to be shown).
+'''
+import math
+import os
+import threading
+
+from pyvmmonitor_core.log_utils import get_logger
+from pyvmmonitor_qt.qt_tiles import TileRenderQueue
+
+logger = get_logger(__name__)
+
+FORMAT_RAW = 'raw'
+FORMAT_PNG = 'png'
+
+
+def _get_image_data(image):
+    from pyvmmonitor_qt.qt_tiles import get_image_bytes
+    bits = image.constBits()
+    if hasattr(bits, 'setsize'):
+        bits.setsize(get_image_bytes(image))
+    return bytes(bits)
+
+
+class SceneExporter(object):
+    '''
+    Exports a scene asynchronously (results are reported in the UI thread, so, the event loop
+    must be running -- see export_scene to export synchronously).
+    '''
+
+    STRIP_HEIGHT = 256
+
+    def __init__(
+            self,
+            scene,
+            filename,
+            scene_rect=None,
+            scale=1.,
+            file_format=FORMAT_RAW,
+            strip_height=None,
+            background_color=None,
+            on_progress=None,
+            is_cancelled=None,
+            on_finished=None,
+            max_pending_strips=None,
+            thread_pool=None):
+        '''
+        :param QGraphicsScene scene:
+            The scene to be exported.
+
+        :param str filename:
+            The target file (for png, the base name for the strips).
+
+        :param QRectF scene_rect:
+            The area of the scene to be exported (if not given, scene.sceneRect() is used).
+
+        :param float scale:
+            The number of pixels in the image for each unit in the scene.
+
+        :param QColor background_color:
+            If not given the background is transparent.
+
+        :param callable on_progress:
+            Called as on_progress(exported_strips, total_strips) in the UI thread.
+
+        :param callable is_cancelled:
+            Called before each strip is scheduled: if it returns True the export is cancelled.
+
+        :param callable on_finished:
+            Called as on_finished(exporter) in the UI thread after all the strips are written
+            (or the export is cancelled).
+
+        :param int max_pending_strips:
+            The maximum number of strips being rendered at the same time (if not given, twice the
+            number of threads in the thread pool).
+
+        :param QThreadPool thread_pool:
+            If not given, a new thread pool is used for the export.
+        '''
+        from pyvmmonitor_qt.qt.QtCore import QThreadPool
+
+        assert file_format in (FORMAT_RAW, FORMAT_PNG), 'Unexpected format: %s' % (file_format,)
+        assert scale > 0
+
+        if scene_rect is None:
+            scene_rect = scene.sceneRect()
+
+        self._scene = scene
+        self._filename = filename
+        self._scene_rect = scene_rect
+        self._scale = float(scale)
+        self._file_format = file_format
+        self._strip_height = strip_height or self.STRIP_HEIGHT
+        self._background_color = background_color
+        self._on_progress = on_progress
+        self._is_cancelled = is_cancelled
+        self._on_finished = on_finished
+
+        self.width = max(1, int(math.ceil(scene_rect.width() * self._scale)))
+        self.height = max(1, int(math.ceil(scene_rect.height() * self._scale)))
+        self.total_strips = (self.height + self._strip_height - 1) // self._strip_height
+
+        if thread_pool is None:
+            thread_pool = QThreadPool()
+        if max_pending_strips is None:
+            max_pending_strips = max(1, thread_pool.maxThreadCount() * 2)
+        self._max_pending_strips = max_pending_strips
+        self._render_queue = TileRenderQueue(self._on_strip_written, thread_pool)
+
+        self._next_strip = 0
+        self._exported_strips = 0
+        self._errors = []
+        self._cancelled = False
+        self._finished = False
+        self._started = False
+        self._wait_loop = None
+
+        self._stream = None
+        self._stream_lock = threading.Lock()
+
+    def get_strip_filename(self, strip):
+        '''
+        :return str:
+            The filename used for the given strip when exporting to png.
+        '''
+        base, ext = os.path.splitext(self._filename)
+        return '%s_%05d%s' % (base, strip, ext or '.png')
+
+    def get_strip_rect(self, strip):
+        '''
+        :return tuple(int, int, int, int):
+            The x, y, w, h of the strip in the image.
+        '''
+        y = strip * self._strip_height
+        return 0, y, self.width, min(self._strip_height, self.height - y)
+
+    def get_errors(self):
+        return self._errors[:]
+
+    def is_finished(self):
+        return self._finished
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def start(self):
+        assert not self._started, 'Export already started.'
+        self._started = True
+        if self._file_format == FORMAT_RAW:
+            self._stream = open(self._filename, 'wb')
+            # Pre-allocate the file so that strips may be written in any order.
+            self._stream.truncate(self.width * self.height * 4)
+        self._schedule_strips()
+
+    def cancel(self):
+        if self._finished:
+            return
+        self._cancelled = True
+        self._render_queue.cancel_all()
+        self._finish()
+
+    def wait(self):
+        '''
+        Runs an event loop until the export finishes.
+        '''
+        from pyvmmonitor_qt.qt.QtCore import QEventLoop
+
+        if self._finished:
+            return
+        self._wait_loop = QEventLoop()
+        try:
+            self._wait_loop.exec_()
+        finally:
+            self._wait_loop = None
+
+    def _schedule_strips(self):
+        render_queue = self._render_queue
+        while (not self._cancelled and self._next_strip < self.total_strips and
+               len(render_queue.get_pending_keys()) < self._max_pending_strips):
+            if self._is_cancelled is not None and self._is_cancelled():
+                self.cancel()
+                return
+
+            strip = self._next_strip
+            self._next_strip += 1
+            render_queue.request(strip, self._create_render(strip, self._record_strip(strip)))
+
+        if not self._cancelled and self._exported_strips == self.total_strips:
+            self._finish()
+
+    def _record_strip(self, strip):
+        # Must be called in the UI thread.
+        from pyvmmonitor_qt.qt.QtCore import QRectF, Qt
+        from pyvmmonitor_qt.qt.QtGui import QPainter, QPicture
+
+        _x, y, w, h = self.get_strip_rect(strip)
+        scale = self._scale
+        scene_rect = self._scene_rect
+        target = QRectF(0, 0, w, h)
+        source = QRectF(
+            scene_rect.x(), scene_rect.y() + y / scale, w / scale, h / scale)
+
+        picture = QPicture()
+        painter = QPainter(picture)
+        try:
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+            painter.setClipRect(target)
+            self._scene.render(painter, target, source, Qt.IgnoreAspectRatio)
+        finally:
+            painter.end()
+        return picture
+
+    def _create_render(self, strip, picture):
+        from pyvmmonitor_qt.qt.QtGui import QPicture
+
+        # The worker thread gets its own instance (see: qt_static_layer).
+        picture = QPicture(picture)
+        _x, y, w, h = self.get_strip_rect(strip)
+        background_color = self._background_color
+
+        def render():
+            from pyvmmonitor_qt.qt.QtCore import Qt
+            from pyvmmonitor_qt.qt.QtGui import QImage, QPainter
+
+            try:
+                image = QImage(w, h, QImage.Format_ARGB32_Premultiplied)
+                image.fill(background_color if background_color is not None else Qt.transparent)
+                painter = QPainter(image)
+                try:
+                    picture.play(painter)
+                finally:
+                    painter.end()
+                self._write_strip(strip, y, image)
+            except Exception as e:
+                logger.exception('Error exporting strip: %s', strip)
+                return e
+            return True
+
+        return render
+
+    def _write_strip(self, strip, y, image):
+        # Called in a worker thread.
+        if self._file_format == FORMAT_PNG:
+            if not image.save(self.get_strip_filename(strip), 'PNG'):
+                raise IOError('Unable to save: %s' % (self.get_strip_filename(strip),))
+            return
+
+        from pyvmmonitor_qt.qt.QtGui import QImage
+        data = _get_image_data(image.convertToFormat(QImage.Format_RGBA8888))
+        with self._stream_lock:
+            stream = self._stream
+            if stream is None:
+                return  # Cancelled.
+            stream.seek(y * self.width * 4)
+            stream.write(data)
+
+    def _on_strip_written(self, strip, result):
+        # Called in the UI thread.
+        if self._finished:
+            return
+        if result is not True:
+            self._errors.append(result)
+
+        self._exported_strips += 1
+        if self._on_progress is not None:
+            self._on_progress(self._exported_strips, self.total_strips)
+        self._schedule_strips()
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+
+        # Wait for the strips being written before closing the file.
+        self._render_queue.wait_for_done()
+        with self._stream_lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+        if self._on_finished is not None:
+            self._on_finished(self)
+
+        if self._wait_loop is not None:
+            self._wait_loop.quit()
+
+
+def export_scene(scene, filename, **kwargs):
+    '''
+    Exports the scene synchronously (see SceneExporter for the parameters).
+
+    :return SceneExporter:
+        The exporter used (may be used to check whether the export was cancelled or if there
+        were errors).
+    '''
+    exporter = SceneExporter(scene, filename, **kwargs)
+    exporter.start()
+    exporter.wait()
+    return exporter
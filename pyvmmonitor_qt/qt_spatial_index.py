@@ -0,0 +1,292 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+'''
+import math
+
+
+class GridSpatialIndex(object):
+    '''
+    A spatial index which maps keys to points using a uniform grid.
+
+    It's meant to answer nearest/within radius/rect queries (i.e.: for picking) without having to
+    go through all the points.
+
+    i.e.:
+
+    index = GridSpatialIndex(cell_size=20)
+    index.add('a', (10, 10))
+    index.add('b', (100, 100))
+    assert index.nearest((12, 12), max_distance=5) == 'a'
+    '''
+
+    def __init__(self, cell_size=50.):
+        assert cell_size > 0
+        self._cell_size = float(cell_size)
+        self._cells = {}
+        self._key_to_point = {}
+
+    @property
+    def cell_size(self):
+        return self._cell_size
+
+    def _cell(self, x, y):
+        cell_size = self._cell_size
+        return int(math.floor(x / cell_size)), int(math.floor(y / cell_size))
+
+    def add(self, key, point):
+        '''
+        Adds (or moves if it was already added) the given key to the given point.
+        '''
+        x, y = point
+        cell = self._cell(x, y)
+        old_point = self._key_to_point.get(key)
+        if old_point is not None:
+            old_cell = self._cell(*old_point)
+            if old_cell == cell:
+                self._key_to_point[key] = (x, y)
+                return
+            self._remove_from_cell(key, old_cell)
+
+        self._key_to_point[key] = (x, y)
+        cell_keys = self._cells.get(cell)
+        if cell_keys is None:
+            cell_keys = self._cells[cell] = set()
+        cell_keys.add(key)
+
+    def remove(self, key):
+        point = self._key_to_point.pop(key, None)
+        if point is not None:
+            self._remove_from_cell(key, self._cell(*point))
+
+    def _remove_from_cell(self, key, cell):
+        cell_keys = self._cells[cell]
+        cell_keys.discard(key)
+        if not cell_keys:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._key_to_point.clear()
+
+    def rebuild(self, cell_size):
+        '''
+        Rebuilds the index with a new cell size.
+        '''
+        key_to_point = self._key_to_point
+        self._key_to_point = {}
+        self._cells = {}
+        self._cell_size = float(cell_size)
+        for key, point in key_to_point.items():
+            self.add(key, point)
+
+    def __len__(self):
+        return len(self._key_to_point)
+
+    def __contains__(self, key):
+        return key in self._key_to_point
+
+    def get_point(self, key):
+        return self._key_to_point[key]
+
+    def _iter_cells_keys_in_rect(self, x0, y0, x1, y1):
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        num_cells = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+        cells = self._cells
+        if num_cells > len(cells):
+            # Faster to go through the existing cells.
+            for (cx, cy), cell_keys in cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield cell_keys
+        else:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    cell_keys = cells.get((cx, cy))
+                    if cell_keys is not None:
+                        yield cell_keys
+
+    def iter_in_rect(self, x, y, w, h):
+        '''
+        :return iterator(key):
+            The keys whose points are inside the given rect (note: the index must not be changed
+            while iterating).
+        '''
+        x1 = x + w
+        y1 = y + h
+        key_to_point = self._key_to_point
+        for cell_keys in self._iter_cells_keys_in_rect(x, y, x1, y1):
+            for key in cell_keys:
+                px, py = key_to_point[key]
+                if x <= px <= x1 and y <= py <= y1:
+                    yield key
+
+    def iter_within_radius(self, point, radius):
+        '''
+        :return iterator(tuple(float, key)):
+            The (squared distance, key) for the keys whose points are within the given radius
+            (in no particular order -- note: the index must not be changed while iterating).
+        '''
+        x, y = point
+        radius_sq = radius * radius
+        key_to_point = self._key_to_point
+        for cell_keys in self._iter_cells_keys_in_rect(x - radius, y - radius, x + radius, y + radius):
+            for key in cell_keys:
+                px, py = key_to_point[key]
+                dist_sq = (px - x) ** 2 + (py - y) ** 2
+                if dist_sq <= radius_sq:
+                    yield dist_sq, key
+
+    def nearest(self, point, max_distance):
+        '''
+        :return key:
+            The key nearest to the given point (or None if there's no key within the given
+            max_distance).
+        '''
+        found = None
+        found_dist_sq = None
+        for dist_sq, key in self.iter_within_radius(point, max_distance):
+            if found_dist_sq is None or dist_sq < found_dist_sq:
+                found = key
+                found_dist_sq = dist_sq
+        return found
+
+    def get_bounds(self):
+        '''
+        :return tuple(float, float, float, float):
+            The x, y, w, h of the bounding rect of all the points (or None if empty).
+        '''
+        points = self._key_to_point.values()
+        if not points:
+            return None
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        x0 = min(xs)
+        y0 = min(ys)
+        return x0, y0, max(xs) - x0, max(ys) - y0
+
+
+class ViewSpatialIndex(object):
+    '''
+    A spatial index of the items in a ZoomableGraphicsView (kept up to date by the custom items
+    from qt_graphics_items when their position changes).
+
+    Queries receive points in scene coordinates and tolerances in screen pixels (which are
+    converted to the scene based on the current zoom of the view).
+
+    Note: only weak-references to the items are kept and items which are no longer in the scene
+    of the view are not reported.
+    '''
+
+    def __init__(self, view, cell_size=50.):
+        import weakref
+        self._view = weakref.ref(view)
+        self._index = GridSpatialIndex(cell_size)
+        self._items = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._index)
+
+    def rebuild(self, cell_size):
+        self._index.rebuild(cell_size)
+
+    def update_item(self, item, scene_point):
+        '''
+        :param QGraphicsItem item:
+            The item to be added/moved.
+
+        :param tuple(float, float) scene_point:
+            The point to be used for the item in the scene.
+        '''
+        key = id(item)
+        self._items[key] = item
+        self._index.add(key, scene_point)
+
+    def remove_item(self, item):
+        key = id(item)
+        self._items.pop(key, None)
+        self._index.remove(key)
+
+    def get_item_point(self, item):
+        return self._index.get_point(id(item))
+
+    def _px_to_scene(self):
+        from pyvmmonitor_qt.qt_transform import calculate_size_for_value_in_px
+        view = self._view()
+        if view is None:
+            return 1.
+        return calculate_size_for_value_in_px(view.transform(), 1.0)
+
+    def _get_item(self, key, scene):
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+        item = self._items.get(key)
+        if item is None or not is_qobject_alive(item):
+            # i.e.: the item was garbage-collected.
+            self._index.remove(key)
+            self._items.pop(key, None)
+            return None
+        if item.scene() != scene:
+            return None
+        return item
+
+    def _get_scene(self):
+        view = self._view()
+        if view is None:
+            return None
+        return view.scene()
+
+    def within_radius(self, scene_point, radius_px):
+        '''
+        :return list(tuple(float, QGraphicsItem)):
+            A list with (distance in pixels, item) sorted by the distance.
+        '''
+        scene = self._get_scene()
+        if scene is None:
+            return []
+        px_to_scene = self._px_to_scene()
+        ret = []
+        # Note: materialized as _get_item may remove the keys of dead items from the index.
+        for dist_sq, key in list(
+                self._index.iter_within_radius(scene_point, radius_px * px_to_scene)):
+            item = self._get_item(key, scene)
+            if item is not None:
+                ret.append((dist_sq ** .5 / px_to_scene, item))
+        ret.sort(key=lambda tup: tup[0])
+        return ret
+
+    def nearest(self, scene_point, tolerance_px):
+        '''
+        :return QGraphicsItem:
+            The item nearest to the given point within the given tolerance (or None).
+        '''
+        found = self.within_radius(scene_point, tolerance_px)
+        if found:
+            return found[0][1]
+        return None
+
+    def in_rect(self, x, y, w, h):
+        '''
+        :return list(QGraphicsItem):
+            The items whose points are inside the given rect (in scene coordinates).
+        '''
+        scene = self._get_scene()
+        if scene is None:
+            return []
+        ret = []
+        for key in list(self._index.iter_in_rect(x, y, w, h)):
+            item = self._get_item(key, scene)
+            if item is not None:
+                ret.append(item)
+        return ret
+
+    def snap(self, scene_point, tolerance_px):
+        '''
+        :return tuple(float, float):
+            The point of the nearest item within the given tolerance (or the passed point if
+            there's no item near it).
+        '''
+        item = self.nearest(scene_point, tolerance_px)
+        if item is None:
+            return scene_point
+        return self._index.get_point(id(item))
@@ -0,0 +1,307 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+A static layer for a ZoomableGraphicsView: the items of the layer are kept in a separate
+QGraphicsScene which is rendered into tiles (per zoom level) which are composited in the
+background of the view (so, only the interactive items in the scene of the view are live).
+
+i.e.:
+
+static_layer = view.get_static_layer()
+static_layer.get_scene().addItem(create_graphics_item_rect((0, 0, 5000, 5000)))
+
+The items are recorded into a QPicture in the UI thread (as QGraphicsScene isn't thread-safe)
+and the picture is replayed into a QImage in a worker thread (so, items in the static layer
+shouldn't draw QPixmaps -- use QImages instead -- as QPixmaps may not be used outside of the UI
+thread in some platforms).
+
+Tiles are rendered only for the zoom levels of the view (the tiles of the next zoom level are
+drawn scaled for the zooms in between, i.e.: while the zoom is animated) and while the tiles of
+the current level are rendered, the tiles of the nearest zoom level available are shown scaled.
+
+Tiles are invalidated when the related area of the static scene changes and evicted (LRU) when
+the memory budget is reached.
+
+Note: only zoom/translation is supported in the view (i.e.: the tiles are not rotated).
+'''
+import bisect
+import math
+
+from pyvmmonitor_qt.qt_tiles import TileCache, TileRenderQueue
+
+
+class StaticTiledLayer(object):
+
+    TILE_SIZE = 256
+
+    def __init__(self, view, max_bytes=64 * 1024 * 1024, use_threads=True, zoom_levels=None):
+        '''
+        :param ZoomableGraphicsView view:
+            The view where the layer is shown.
+
+        :param int max_bytes:
+            The memory budget for the tiles.
+
+        :param bool use_threads:
+            If False, missing tiles are rendered synchronously when painting.
+
+        :param list(float) zoom_levels:
+            The zoom levels for which tiles are rendered (by default view.ZOOM_LEVELS).
+        '''
+        from pyvmmonitor_core.weak_utils import get_weakref
+        from pyvmmonitor_qt.qt.QtWidgets import QGraphicsScene
+
+        if zoom_levels is None:
+            zoom_levels = view.ZOOM_LEVELS
+        self._zoom_levels = tuple(sorted(zoom_levels))
+        self._tile_zoom = None
+
+        self._view = get_weakref(view)
+        self._scene = QGraphicsScene()
+        self._scene.changed.connect(self._on_scene_changed)
+        self._tile_cache = TileCache(max_bytes)
+        self._render_queue = TileRenderQueue(self._on_tile_rendered)
+        self.use_threads = use_threads
+
+    def get_scene(self):
+        '''
+        :return QGraphicsScene:
+            The scene where the static items should be added.
+        '''
+        return self._scene
+
+    def get_tile_cache(self):
+        return self._tile_cache
+
+    def get_render_queue(self):
+        return self._render_queue
+
+    def invalidate(self, scene_rect=None):
+        '''
+        Invalidates the tiles in the given scene rect (or all the tiles if not given).
+        '''
+        if scene_rect is None:
+            self._tile_cache.clear()
+            self._render_queue.cancel_all()
+        else:
+            self._invalidate_rects([scene_rect])
+
+        view = self._view()
+        if view is not None:
+            view.viewport().update()
+
+    def _on_scene_changed(self, rects):
+        if rects:
+            self._invalidate_rects(rects)
+            view = self._view()
+            if view is not None:
+                view.viewport().update()
+
+    def _invalidate_rects(self, rects):
+        tile_size = self.TILE_SIZE
+
+        def intersects(key):
+            zoom, tx, ty = key
+            tile_scene_size = tile_size / zoom
+            x = tx * tile_scene_size
+            y = ty * tile_scene_size
+            for rect in rects:
+                if (rect.x() < x + tile_scene_size and x < rect.x() + rect.width() and
+                        rect.y() < y + tile_scene_size and y < rect.y() + rect.height()):
+                    return True
+            return False
+
+        self._tile_cache.discard_matching(intersects)
+        for key in self._render_queue.get_pending_keys():
+            if intersects(key):
+                self._render_queue.cancel(key)
+
+    def get_tile_zoom(self, zoom):
+        '''
+        :return float:
+            The zoom level for which the tiles are rendered to be shown at the given zoom (the
+            zoom level itself or the next one, so, tiles are only scaled down -- besides zooms
+            above the max zoom level).
+        '''
+        zoom_levels = self._zoom_levels
+        # Note: a small tolerance so that a zoom level with floating point errors is still used.
+        i = bisect.bisect_left(zoom_levels, zoom * (1 - 1e-6))
+        if i >= len(zoom_levels):
+            return zoom_levels[-1]
+        return zoom_levels[i]
+
+    def _iter_tile_keys(self, zoom, scene_rect):
+        tile_scene_size = self.TILE_SIZE / zoom
+        tx0 = int(math.floor(scene_rect.x() / tile_scene_size))
+        ty0 = int(math.floor(scene_rect.y() / tile_scene_size))
+        tx1 = int(math.floor((scene_rect.x() + scene_rect.width()) / tile_scene_size))
+        ty1 = int(math.floor((scene_rect.y() + scene_rect.height()) / tile_scene_size))
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                yield zoom, tx, ty
+
+    def _record_tile(self, key):
+        # Must be called in the UI thread.
+        from pyvmmonitor_qt.qt.QtCore import QRectF
+        from pyvmmonitor_qt.qt.QtGui import QPainter, QPicture
+
+        zoom, tx, ty = key
+        tile_size = self.TILE_SIZE
+        tile_scene_size = tile_size / zoom
+        source = QRectF(tx * tile_scene_size, ty * tile_scene_size, tile_scene_size,
+                        tile_scene_size)
+        if not self._scene.sceneRect().intersects(source):
+            return None
+
+        picture = QPicture()
+        painter = QPainter(picture)
+        try:
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+            painter.setClipRect(QRectF(0, 0, tile_size, tile_size))
+            self._scene.render(painter, QRectF(0, 0, tile_size, tile_size), source)
+        finally:
+            painter.end()
+        return picture
+
+    def _create_render(self, picture):
+        from pyvmmonitor_qt.qt.QtGui import QPicture
+
+        # The worker thread gets its own instance (QPicture is implicitly shared, which is
+        # thread-safe as long as each thread uses a different instance).
+        picture = QPicture(picture)
+        tile_size = self.TILE_SIZE
+
+        def render():
+            from pyvmmonitor_qt.qt.QtCore import Qt
+            from pyvmmonitor_qt.qt.QtGui import QImage, QPainter
+            image = QImage(tile_size, tile_size, QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+            painter = QPainter(image)
+            try:
+                picture.play(painter)
+            finally:
+                painter.end()
+            return image
+
+        return render
+
+    def _on_tile_rendered(self, key, image):
+        self._tile_cache.put(key, image)
+        view = self._view()
+        if view is not None and self._tile_zoom == key[0]:
+            view.viewport().update()
+
+    def paint(self, painter, scene_rect):
+        '''
+        Paints the tiles available in the given scene rect (tiles which are still not available
+        are requested to be rendered and the tiles of the nearest zoom level available are shown
+        scaled in the meanwhile).
+
+        :param QPainter painter:
+            A painter with the transform of the view.
+        '''
+        from pyvmmonitor_qt.qt.QtCore import QPointF
+
+        transform = painter.transform()
+        zoom = transform.m11()
+        if zoom <= 0 or self._scene.sceneRect().isEmpty():
+            return
+
+        tile_zoom = self.get_tile_zoom(zoom)
+        render_queue = self._render_queue
+        if tile_zoom != self._tile_zoom:
+            self._tile_zoom = tile_zoom
+            # Tiles requested for another zoom level are no longer needed.
+            for key in render_queue.get_pending_keys():
+                if key[0] != tile_zoom:
+                    render_queue.cancel(key)
+
+        tile_size = self.TILE_SIZE
+        # i.e.: when the zoom is a zoom level the tiles are drawn without scaling.
+        scaled = abs(zoom / tile_zoom - 1) > 1e-6
+        # Use integer offsets so that the tiles are aligned to the device pixels.
+        dx = round(transform.dx())
+        dy = round(transform.dy())
+
+        tile_cache = self._tile_cache
+        missing = []
+        painter.save()
+        try:
+            painter.resetTransform()
+            for key in self._iter_tile_keys(tile_zoom, scene_rect):
+                image = tile_cache.get(key)
+                if image is None:
+                    if self.use_threads:
+                        if not render_queue.is_pending(key):
+                            picture = self._record_tile(key)
+                            if picture is None:
+                                continue  # Nothing in this tile.
+                            render_queue.request(key, self._create_render(picture))
+                        missing.append(key)
+                        continue
+
+                    # A request done while using threads is replaced by the synchronous render.
+                    render_queue.cancel(key)
+                    picture = self._record_tile(key)
+                    if picture is None:
+                        continue  # Nothing in this tile.
+                    image = self._create_render(picture)()
+                    tile_cache.put(key, image)
+
+                _zoom, tx, ty = key
+                if scaled:
+                    painter.drawImage(self._get_tile_device_rect(key, zoom, dx, dy), image)
+                else:
+                    painter.drawImage(QPointF(tx * tile_size + dx, ty * tile_size + dy), image)
+
+            if missing:
+                self._paint_fallback_tiles(painter, missing, zoom, dx, dy)
+        finally:
+            painter.restore()
+
+    def _get_tile_device_rect(self, key, zoom, dx, dy):
+        from pyvmmonitor_qt.qt.QtCore import QRectF
+        tile_zoom, tx, ty = key
+        device_size = self.TILE_SIZE * zoom / tile_zoom
+        return QRectF(tx * device_size + dx, ty * device_size + dy, device_size, device_size)
+
+    def _paint_fallback_tiles(self, painter, missing, zoom, dx, dy):
+        # Shows the tiles of the nearest zoom level available (scaled) where the tiles of the
+        # current zoom level are still being rendered.
+        from pyvmmonitor_qt.qt.QtCore import QRectF, Qt
+
+        tile_zoom = missing[0][0]
+        available_zooms = set(key[0] for key in self._tile_cache.keys())
+        available_zooms.discard(tile_zoom)
+        if not available_zooms:
+            return
+        available_zooms = sorted(
+            available_zooms, key=lambda level: abs(math.log(level / tile_zoom)))
+
+        tile_cache = self._tile_cache
+        tile_scene_size = self.TILE_SIZE / tile_zoom
+        for key in missing:
+            _tile_zoom, tx, ty = key
+            # Note: shrink the rect a bit so that the neighbouring tiles aren't included.
+            tile_scene_rect = QRectF(
+                tx * tile_scene_size, ty * tile_scene_size,
+                tile_scene_size, tile_scene_size).adjusted(0, 0, -1e-6, -1e-6)
+            for fallback_zoom in available_zooms:
+                images = []
+                for fallback_key in self._iter_tile_keys(fallback_zoom, tile_scene_rect):
+                    image = tile_cache.get(fallback_key)
+                    if image is not None:
+                        images.append((fallback_key, image))
+                if images:
+                    painter.save()
+                    try:
+                        painter.setClipRect(
+                            self._get_tile_device_rect(key, zoom, dx, dy), Qt.IntersectClip)
+                        for fallback_key, image in images:
+                            painter.drawImage(
+                                self._get_tile_device_rect(fallback_key, zoom, dx, dy), image)
+                    finally:
+                        painter.restore()
+                    break
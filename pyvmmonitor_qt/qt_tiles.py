@@ -0,0 +1,207 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+Helpers to deal with images split into tiles (a LRU cache bounded by memory and a queue which
+renders tiles in worker threads).
+'''
+import threading
+from collections import OrderedDict
+
+from pyvmmonitor_core.log_utils import get_logger
+from pyvmmonitor_qt.qt.QtCore import QRunnable
+
+logger = get_logger(__name__)
+
+
+def get_image_bytes(image):
+    '''
+    :param QImage image:
+    '''
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+class TileCache(object):
+    '''
+    A LRU cache of tiles (QImages) which keeps the total memory used by the tiles below a
+    budget.
+
+    Note: should only be used from the UI thread.
+    '''
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._tiles = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def keys(self):
+        return list(self._tiles.keys())
+
+    def get_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        '''
+        :return QImage:
+            The tile or None if it's not in the cache.
+        '''
+        tiles = self._tiles
+        image = tiles.get(key)
+        if image is not None:
+            # Move to the end (most recently used).
+            del tiles[key]
+            tiles[key] = image
+        return image
+
+    def put(self, key, image):
+        self.discard(key)
+        self._tiles[key] = image
+        self._bytes += get_image_bytes(image)
+
+        tiles = self._tiles
+        while self._bytes > self.max_bytes and len(tiles) > 1:
+            _key, old_image = tiles.popitem(last=False)
+            self._bytes -= get_image_bytes(old_image)
+
+    def discard(self, key):
+        image = self._tiles.pop(key, None)
+        if image is not None:
+            self._bytes -= get_image_bytes(image)
+
+    def discard_matching(self, accept_key):
+        '''
+        :param callable accept_key:
+            Called as accept_key(key) for each key: if it returns True the tile is removed.
+        '''
+        for key in self.keys():
+            if accept_key(key):
+                self.discard(key)
+
+    def clear(self):
+        self._tiles.clear()
+        self._bytes = 0
+
+
+class TileRenderQueue(object):
+    '''
+    Renders tiles in a QThreadPool.
+
+    The render function is called in a worker thread and must only do thread-safe operations
+    (i.e.: painting on a QImage through a QPainter or replaying a QPicture there).
+
+    The `on_tile_rendered(key, image)` callback is always called in the UI thread and isn't
+    called for tiles whose request was cancelled after the render started.
+    '''
+
+    def __init__(self, on_tile_rendered, thread_pool=None):
+        from pyvmmonitor_core.weak_utils import get_weakref
+        self._on_tile_rendered = get_weakref(on_tile_rendered)
+        self._thread_pool = thread_pool
+        self._lock = threading.Lock()
+
+        # key -> request id (only the result from the latest request for a key is reported).
+        self._pending = {}
+        self._next_request_id = 0
+
+        # The runnables are kept alive until they finish.
+        self._runnables = set()
+
+    def _get_thread_pool(self):
+        if self._thread_pool is None:
+            from pyvmmonitor_qt.qt.QtCore import QThreadPool
+            self._thread_pool = QThreadPool.globalInstance()
+        return self._thread_pool
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def get_pending_keys(self):
+        with self._lock:
+            return list(self._pending.keys())
+
+    def request(self, key, render):
+        '''
+        :param key:
+            The key of the tile.
+
+        :param callable render:
+            A function which returns a QImage (or any other result to be reported) and is called
+            in a worker thread.
+        '''
+        with self._lock:
+            self._next_request_id += 1
+            request_id = self._next_request_id
+            self._pending[key] = request_id
+
+        runnable = _TileRunnable(self, key, request_id, render)
+        self._runnables.add(runnable)
+        self._get_thread_pool().start(runnable)
+
+    def cancel(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def cancel_all(self):
+        with self._lock:
+            self._pending.clear()
+
+    def wait_for_done(self, msecs=-1):
+        '''
+        Waits until the worker threads finish (note that results are only reported in the next
+        event loop).
+        '''
+        return self._get_thread_pool().waitForDone(msecs)
+
+    def _on_rendered(self, runnable, image):
+        # Called in a worker thread.
+        from functools import partial
+        from pyvmmonitor_qt.qt_event_loop import execute_on_next_event_loop
+        execute_on_next_event_loop(partial(self._report, runnable, image))
+
+    def _report(self, runnable, image):
+        # Called in the UI thread.
+        self._runnables.discard(runnable)
+        key = runnable.key
+        with self._lock:
+            if self._pending.get(key) != runnable.request_id:
+                return  # Cancelled or there's a newer request.
+            del self._pending[key]
+
+        if image is None:
+            return
+
+        on_tile_rendered = self._on_tile_rendered()
+        if on_tile_rendered is not None:
+            on_tile_rendered(key, image)
+
+
+class _TileRunnable(QRunnable):
+
+    def __init__(self, queue, key, request_id, render):
+        QRunnable.__init__(self)
+        # We keep the reference ourselves (until the result is reported in the UI thread).
+        self.setAutoDelete(False)
+        self.queue = queue
+        self.key = key
+        self.request_id = request_id
+        self._render = render
+
+    def run(self):
+        image = None
+        try:
+            image = self._render()
+        except Exception:
+            logger.exception('Error rendering tile: %s', self.key)
+        finally:
+            self._render = None
+            self.queue._on_rendered(self, image)
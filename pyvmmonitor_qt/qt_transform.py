@@ -72,6 +72,10 @@ def calc_angle_in_radians_from_qtransform(qtransform):
 
 
 def calculate_size_for_value_in_px(transform, value_in_px):
+    if transform.isAffine():
+        # The x of map(1, 0) - map(0, 0) is m11 (no need to actually map the points).
+        return value_in_px / transform.m11()
+
     p0 = transform.map(0.0, 0.0)
     p1 = transform.map(1.0, 0.0)
 
@@ -79,3 +83,150 @@ def calculate_size_for_value_in_px(transform, value_in_px):
     size *= value_in_px
 
     return size
+
+
+def calculate_px_to_scene_and_rotation(transform):
+    '''
+    Computes (only once for the transform) the size in the scene which 1 pixel maps to and the
+    rotation in radians (same as calculate_size_for_value_in_px(transform, 1) and
+    calc_angle_in_radians_from_qtransform(transform)).
+
+    :param QTransform|Transform transform:
+
+    :return tuple(float, float):
+        The px_to_scene and the rotation in radians.
+    '''
+    from pyvmmonitor_core.math_utils import calc_angle_in_radians
+
+    if not isinstance(transform, tuple):
+        if transform.isAffine():
+            # Only the values needed to map (0, 0), (1, 0) and (0, 1) are read.
+            m11, m21, m22 = transform.m11(), transform.m21(), transform.m22()
+            dx, dy = transform.dx(), transform.dy()
+            return 1.0 / m11, calc_angle_in_radians((dx, dy), (m21 + dx, m22 + dy))
+        transform = qtransform_to_tuple(transform)
+    m11, m12, m13, m21, m22, m23, m31, m32, m33 = transform
+
+    def map_point(x, y):
+        tx = m11 * x + m21 * y + m31
+        ty = m12 * x + m22 * y + m32
+        if m13 != 0 or m23 != 0 or m33 != 1:
+            w = m13 * x + m23 * y + m33
+            tx /= w
+            ty /= w
+        return tx, ty
+
+    p0 = map_point(0., 0.)
+    p1 = map_point(1., 0.)
+    p2 = map_point(0., 1.)  # Note: the angle is computed based on y (as in calc_angle...).
+    return 1.0 / (p1[0] - p0[0]), calc_angle_in_radians(p0, p2)
+
+
+# ==================================================================================================
+# NumPy helpers (numpy is only imported when those are actually used).
+# ==================================================================================================
+def _as_numpy_matrix(transform):
+    import numpy
+    if isinstance(transform, numpy.ndarray):
+        return transform
+    return qtransform_to_numpy(transform)
+
+
+def qtransform_to_numpy(transform):
+    '''
+    :param QTransform|Transform transform:
+
+    :return numpy.ndarray:
+        A 3x3 matrix (to be used with row vectors: [x, y, 1] * matrix).
+    '''
+    import numpy
+    if not isinstance(transform, tuple):
+        transform = qtransform_to_tuple(transform)
+    return numpy.array(transform, dtype=numpy.float64).reshape(3, 3)
+
+
+def transform_points_array(points, transform):
+    '''
+    Applies the transform to all the points at once (same as iter_transform_list_tuple, but
+    without creating a Python object for each point).
+
+    :param numpy.ndarray|list(tuple(float, float)) points:
+        The (N, 2) points to be transformed.
+
+    :param QTransform|Transform|numpy.ndarray transform:
+        The transform (a 3x3 numpy matrix as returned from qtransform_to_numpy may also be
+        passed to avoid converting it on each call).
+
+    :return numpy.ndarray:
+        A new (N, 2) float64 array with the transformed points.
+    '''
+    import numpy
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    m = _as_numpy_matrix(transform)
+
+    ret = numpy.dot(points, m[:2, :2])
+    ret += m[2, :2]
+    if m[0, 2] != 0 or m[1, 2] != 0 or m[2, 2] != 1:
+        # Projective transform.
+        w = numpy.dot(points, m[:2, 2])
+        w += m[2, 2]
+        ret /= w[:, numpy.newaxis]
+    return ret
+
+
+def _qpolygonf_as_array(polygon):
+    # Returns an (N, 2) array which shares the memory with the polygon (or None if the Qt bindings
+    # don't give us access to its memory).
+    import numpy
+    size = polygon.size()
+    if size == 0:
+        return numpy.empty((0, 2), dtype=numpy.float64)
+
+    ptr = polygon.data()
+    if not hasattr(ptr, 'setsize'):  # Only available in sip.voidptr.
+        return None
+    ptr.setsize(size * 2 * 8)
+    return numpy.frombuffer(ptr, dtype=numpy.float64).reshape(size, 2)
+
+
+def qpolygonf_to_array(polygon):
+    '''
+    :param QPolygonF polygon:
+
+    :return numpy.ndarray:
+        A new (N, 2) float64 array with the points of the polygon.
+    '''
+    import numpy
+    arr = _qpolygonf_as_array(polygon)
+    if arr is not None:
+        return arr.copy()
+    return numpy.array([(p.x(), p.y()) for p in polygon], dtype=numpy.float64).reshape(-1, 2)
+
+
+def array_to_qpolygonf(points):
+    '''
+    :param numpy.ndarray|list(tuple(float, float)) points:
+        The (N, 2) points.
+
+    :return QPolygonF:
+        A polygon with the given points (when possible, the points are copied directly to the
+        polygon memory without creating a QPointF for each point).
+    '''
+    import numpy
+    from pyvmmonitor_qt.qt.QtCore import QPointF
+    from pyvmmonitor_qt.qt.QtGui import QPolygonF
+
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+    polygon = QPolygonF()
+    size = len(points)
+    if size == 0:
+        return polygon
+
+    if hasattr(polygon, 'fill'):
+        polygon.fill(QPointF(), size)
+        arr = _qpolygonf_as_array(polygon)
+        if arr is not None:
+            arr[:] = points
+            return polygon
+
+    return QPolygonF([QPointF(x, y) for x, y in points.tolist()])
@@ -20,6 +20,7 @@ from pyvmmonitor_core.weak_utils import get_weakref
 from pyvmmonitor_qt import compat
 from pyvmmonitor_qt.qt import QtCore, qt_api
 from pyvmmonitor_qt.qt.QtCore import QModelIndex, Qt, QTimer
+from pyvmmonitor_qt.qt.QtGui import QPainter
 from pyvmmonitor_qt.qt.QtWidgets import QDialog
 
 logger = get_logger(__name__)
@@ -1077,6 +1078,41 @@ def _is_opengl_available():
         return _is_opengl_available.__cached__
 
 
+# The render hints changed by set_painter_antialiased.
+_ANTIALIAS_RENDER_HINTS = (
+    QPainter.Antialiasing |
+    QPainter.TextAntialiasing |
+    QPainter.SmoothPixmapTransform
+    # | QPainter.HighQualityAntialiasing
+)
+
+# GL widget -> the antialias GL state set in the current frame (None if still not set). Only
+# widgets whose frames are marked with mark_gl_frame_started are tracked.
+_gl_antialias_state = weakref.WeakKeyDictionary()
+
+_NOT_TRACKED = object()
+
+
+def mark_gl_frame_started(widget):
+    '''
+    Should be called when a new frame starts to be painted in the given OpenGL widget (Qt resets
+    the GL state when the painting starts), so that set_painter_antialiased only changes the GL
+    state (and makes the context current) when needed in the frame instead of on each call.
+    '''
+    _gl_antialias_state[widget] = None
+
+
+def _set_gl_antialiased(widget, antialias):
+    from OpenGL import GL
+    widget.makeCurrent()
+    if antialias:
+        GL.glEnable(GL.GL_MULTISAMPLE)
+        GL.glEnable(GL.GL_LINE_SMOOTH)
+    else:
+        GL.glDisable(GL.GL_MULTISAMPLE)
+        GL.glDisable(GL.GL_LINE_SMOOTH)
+
+
 def set_painter_antialiased(painter, antialias, widget):
 
     '''
@@ -1086,30 +1122,33 @@ def set_painter_antialiased(painter, antialias, widget):
     In the case that there's no related widget (such as drawing to a QImage), the widget should be
     None (it's not default because it's really important to pass it in the case that there's a
     widget, so, making it required so that each case actually takes it into account).
+
+    Note: this is called for each item painted, so, the render hints are only set if they changed
+    and the OpenGL state is only changed once per frame (see: mark_gl_frame_started).
     '''
-    from pyvmmonitor_qt.qt.QtGui import QPainter
-    RENDER_HINTS = (QPainter.Antialiasing | 
-                    QPainter.TextAntialiasing | 
-                    QPainter.SmoothPixmapTransform  
-                    # | QPainter.HighQualityAntialiasing
-                    )
+    render_hints = _ANTIALIAS_RENDER_HINTS
     # painter.setRenderHint(QPainter.NonCosmeticDefaultPen, False)
-    use_opengl = hasattr(widget, 'makeCurrent') and _is_opengl_available()
-
-    if use_opengl:
-        from OpenGL import GL
-        widget.makeCurrent()
 
+    curr_hints = painter.renderHints()
     if antialias:
-        painter.setRenderHints(RENDER_HINTS)
-        if use_opengl:
-            GL.glEnable(GL.GL_MULTISAMPLE)
-            GL.glEnable(GL.GL_LINE_SMOOTH)
+        new_hints = curr_hints | render_hints
     else:
-        painter.setRenderHints(RENDER_HINTS, False)
-        if use_opengl:
-            GL.glDisable(GL.GL_MULTISAMPLE)
-            GL.glDisable(GL.GL_LINE_SMOOTH)
+        new_hints = curr_hints & ~render_hints
+    if new_hints != curr_hints:
+        if isinstance(painter, QPainter):
+            painter.setRenderHints(render_hints, antialias)
+        else:
+            # i.e.: QGraphicsView.setRenderHints() has no `on` parameter (it sets all the hints).
+            painter.setRenderHints(new_hints)
+
+    if hasattr(widget, 'makeCurrent') and _is_opengl_available():
+        gl_state = _gl_antialias_state.get(widget, _NOT_TRACKED)
+        if gl_state is _NOT_TRACKED:
+            _set_gl_antialiased(widget, antialias)
+
+        elif gl_state != antialias:
+            _set_gl_antialiased(widget, antialias)
+            _gl_antialias_state[widget] = antialias
 
 
 def create_painter_path_from_points(points, clockwise=None):
@@ -1128,6 +1167,16 @@ def create_qpolygon_from_points(points, clockwise=None):
     return QPolygonF([QPointF(*point) for point in points])
 
 
+def create_painter_path_from_array(points, clockwise=None):
+    from pyvmmonitor_qt import qt_painter_path
+    return qt_painter_path.create_painter_path_from_array(points, clockwise)
+
+
+def create_qpolygon_from_array(points, clockwise=None):
+    from pyvmmonitor_qt import qt_painter_path
+    return qt_painter_path.create_qpolygonf_from_array(points, clockwise)
+
+
 @contextmanager
 def painter_on(device, antialias, widget=None):
     if device.width() <= 0 or device.height() <= 0:
@@ -0,0 +1,364 @@
+'''
+License: LGPL
+
+Copyright: Brainwy Software Ltda
+
+Selection of the viewport configuration (OpenGL or raster viewport, viewport update mode and
+item cache mode) used by a ZoomableGraphicsView.
+
+Which configuration is faster depends a lot on the machine (GPU, drivers, screen), so, in the
+auto-tune mode the candidate configurations are benchmarked (on first use) painting a
+representative scene while items move, the view scrolls and zooms and the fastest one is
+persisted in the QSettings (so, the benchmark only runs again if the Qt binding, the platform
+or the OpenGL availability changes).
+
+i.e.:
+
+class MyView(ZoomableGraphicsView):
+    VIEWPORT_AUTO_TUNE = True
+
+or, to benchmark explicitly:
+
+best, results = tune_viewport_config(frames=60)
+view.set_viewport_config(best)
+'''
+from pyvmmonitor_core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+SETTINGS_KEY_CONFIG = 'pyvmmonitor_qt/viewport_config'
+SETTINGS_KEY_ENVIRONMENT = 'pyvmmonitor_qt/viewport_environment'
+
+# The config chosen in this process (so, the settings are only read once).
+_tuned_config = None
+
+
+def _get_update_modes():
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsView
+    return (
+        ('minimal', QGraphicsView.MinimalViewportUpdate),
+        ('smart', QGraphicsView.SmartViewportUpdate),
+        ('full', QGraphicsView.FullViewportUpdate),
+    )
+
+
+def _get_cache_modes():
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem
+    return (
+        ('none', QGraphicsItem.NoCache),
+        ('device', QGraphicsItem.DeviceCoordinateCache),
+    )
+
+
+def _get_name(modes, mode):
+    for name, value in modes:
+        if value == mode:
+            return name
+    raise ValueError('Unexpected mode: %s' % (mode,))
+
+
+def _get_mode(modes, name):
+    for mode_name, value in modes:
+        if mode_name == name:
+            return value
+    raise ValueError('Unexpected mode: %s' % (name,))
+
+
+class ViewportConfig(object):
+
+    __slots__ = ['use_opengl', 'update_mode', 'cache_mode']
+
+    def __init__(self, use_opengl, update_mode, cache_mode):
+        '''
+        :param bool use_opengl:
+            Whether an OpenGL viewport should be used (otherwise the raster QWidget is used).
+
+        :param QGraphicsView.ViewportUpdateMode update_mode:
+            The viewport update mode of the view.
+
+        :param QGraphicsItem.CacheMode cache_mode:
+            The cache mode of the custom items added to the view.
+        '''
+        self.use_opengl = bool(use_opengl)
+        self.update_mode = update_mode
+        self.cache_mode = cache_mode
+
+    def to_string(self):
+        return '%s;%s;%s' % (
+            'opengl' if self.use_opengl else 'raster',
+            _get_name(_get_update_modes(), self.update_mode),
+            _get_name(_get_cache_modes(), self.cache_mode))
+
+    @classmethod
+    def from_string(cls, s):
+        '''
+        :return ViewportConfig:
+            The config or None if the string isn't valid.
+        '''
+        try:
+            viewport, update_mode, cache_mode = s.split(';')
+            if viewport not in ('opengl', 'raster'):
+                return None
+            return cls(
+                viewport == 'opengl',
+                _get_mode(_get_update_modes(), update_mode),
+                _get_mode(_get_cache_modes(), cache_mode))
+        except (ValueError, AttributeError):
+            return None
+
+    def __eq__(self, o):
+        if not isinstance(o, ViewportConfig):
+            return False
+        return (self.use_opengl, self.update_mode, self.cache_mode) == (
+            o.use_opengl, o.update_mode, o.cache_mode)
+
+    def __ne__(self, o):
+        return not self == o
+
+    def __hash__(self):
+        return hash((self.use_opengl, int(self.update_mode), int(self.cache_mode)))
+
+    def __repr__(self):
+        return 'ViewportConfig(%s)' % (self.to_string(),)
+
+
+def is_opengl_available():
+    from pyvmmonitor_qt.qt.QtOpenGL import is_good_opengl_version
+    return bool(is_good_opengl_version())
+
+
+def get_default_viewport_config():
+    '''
+    :return ViewportConfig:
+        The config used when not auto-tuning: OpenGL if available with the Qt defaults.
+    '''
+    from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem, QGraphicsView
+    return ViewportConfig(
+        is_opengl_available(), QGraphicsView.MinimalViewportUpdate, QGraphicsItem.NoCache)
+
+
+def get_candidate_configs(use_opengl=None):
+    '''
+    :param bool use_opengl:
+        Whether OpenGL configs should be candidates (if None, only if OpenGL is available).
+
+    :return list(ViewportConfig):
+        All the combinations of viewport, update mode and cache mode to be benchmarked.
+    '''
+    if use_opengl is None:
+        use_opengl = is_opengl_available()
+
+    viewports = (False, True) if use_opengl else (False,)
+    return [
+        ViewportConfig(opengl, update_mode, cache_mode)
+        for opengl in viewports
+        for _name, update_mode in _get_update_modes()
+        for _name, cache_mode in _get_cache_modes()]
+
+
+def populate_benchmark_scene(scene, width=2000, height=2000, items_count=1500):
+    '''
+    Adds a representative set of items (antialiased outlines, fills, paths and texts) to the
+    given scene (the items are created with a fixed seed, so, all the configs paint the same
+    scene).
+
+    :return list(QGraphicsItem):
+        The items added.
+    '''
+    import random
+    from pyvmmonitor_qt.qt.QtCore import QPointF
+    from pyvmmonitor_qt.qt.QtGui import QBrush, QColor, QPainterPath, QPen
+    from pyvmmonitor_qt.qt.QtWidgets import (
+        QGraphicsEllipseItem, QGraphicsPathItem, QGraphicsRectItem, QGraphicsSimpleTextItem)
+
+    rnd = random.Random(0)
+    items = []
+    for i in range(items_count):
+        x = rnd.uniform(0, width)
+        y = rnd.uniform(0, height)
+        size = rnd.uniform(5, 40)
+        color = QColor(rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255), 200)
+        kind = i % 4
+        if kind == 0:
+            item = QGraphicsRectItem(0, 0, size, size)
+        elif kind == 1:
+            item = QGraphicsEllipseItem(0, 0, size, size)
+        elif kind == 2:
+            path = QPainterPath(QPointF(0, 0))
+            for _j in range(8):
+                path.lineTo(rnd.uniform(0, size * 2), rnd.uniform(0, size * 2))
+            item = QGraphicsPathItem(path)
+        else:
+            item = QGraphicsSimpleTextItem('Item %s' % (i,))
+
+        pen = QPen(color.darker())
+        pen.setWidthF(1.5)
+        item.setPen(pen)
+        if kind != 2:
+            item.setBrush(QBrush(color))
+        item.setPos(x, y)
+        scene.addItem(item)
+        items.append(item)
+    return items
+
+
+def _create_benchmark_view():
+    from pyvmmonitor_qt.zoomable_graphics_view import ZoomableGraphicsView
+
+    class _BenchmarkView(ZoomableGraphicsView):
+
+        # Must not auto-tune (or we'd recurse while tuning).
+        VIEWPORT_AUTO_TUNE = False
+
+    return _BenchmarkView()
+
+
+def _process_events():
+    from pyvmmonitor_qt.qt.QtWidgets import QApplication
+    # The changes in the scene are notified in the next event loop and then the paint of the
+    # viewport is scheduled (so, process twice).
+    QApplication.sendPostedEvents()
+    QApplication.processEvents()
+    QApplication.sendPostedEvents()
+    QApplication.processEvents()
+
+
+def benchmark_viewport_config(
+        config, frames=30, size=(800, 600), populate_scene=populate_benchmark_scene):
+    '''
+    Paints the given number of frames with the given config (in each frame some items move and
+    the view is scrolled, with a zoom change every few frames).
+
+    :param callable populate_scene:
+        Called as populate_scene(scene) to add the items to the scene (returning the items
+        which should move during the benchmark).
+
+    :return float:
+        The median time (in seconds) of a frame.
+    '''
+    from pyvmmonitor_qt.qt.QtCore import Qt
+    from pyvmmonitor_qt.qt_animation_clock import get_time
+    from pyvmmonitor_qt.qt_paint_profiler import PERCENTILE_50, calculate_percentiles
+
+    view = _create_benchmark_view()
+    try:
+        view.setAttribute(Qt.WA_DontShowOnScreen, True)
+        view.resize(*size)
+        view.set_viewport_config(config)
+
+        scene = view.get_scene()
+        items = list(populate_scene(scene) or ())
+        view.apply_item_cache_mode(scene.items())
+        rect = scene.itemsBoundingRect()
+        view.setSceneRect(rect)
+        view.show()
+        _process_events()  # Initial paint (not measured).
+
+        moving = items[::20]
+        zoom_levels = (1.0, 0.75, 1.25)
+        times = []
+        h_scroll_bar = view.horizontalScrollBar()
+        v_scroll_bar = view.verticalScrollBar()
+        for frame in range(frames):
+            start = get_time()
+            delta = 3 if frame % 2 == 0 else -3
+            for item in moving:
+                item.moveBy(delta, delta)
+            h_scroll_bar.setValue(h_scroll_bar.value() + 7)
+            v_scroll_bar.setValue(v_scroll_bar.value() + 5)
+            if frame % 10 == 9:
+                view.zoom_to(zoom_levels[(frame // 10) % len(zoom_levels)])
+            _process_events()
+            times.append(get_time() - start)
+        return calculate_percentiles(times, (PERCENTILE_50,))[PERCENTILE_50]
+    finally:
+        view.hide()
+        view.deleteLater()
+        _process_events()
+
+
+def tune_viewport_config(candidates=None, **benchmark_kwargs):
+    '''
+    Benchmarks the candidates (see: benchmark_viewport_config for the kwargs).
+
+    :return tuple(ViewportConfig, dict(ViewportConfig, float)):
+        The fastest config and the median frame time of each candidate (candidates which failed
+        aren't in the dict). If all the candidates fail, the default config is returned.
+    '''
+    if candidates is None:
+        candidates = get_candidate_configs()
+
+    results = {}
+    for config in candidates:
+        try:
+            results[config] = benchmark_viewport_config(config, **benchmark_kwargs)
+        except Exception:
+            logger.exception('Error benchmarking viewport config: %s', config)
+
+    if not results:
+        return get_default_viewport_config(), results
+
+    best = min(candidates, key=lambda config: results.get(config, float('inf')))
+    logger.info('Viewport config chosen: %s (frame times: %s)', best, results)
+    return best, results
+
+
+def _get_environment():
+    from pyvmmonitor_qt.qt import qt_api
+    from pyvmmonitor_qt.qt.QtGui import QGuiApplication
+    return '%s;%s;%s' % (qt_api, QGuiApplication.platformName(), is_opengl_available())
+
+
+def _create_settings():
+    from pyvmmonitor_qt.qt.QtCore import QSettings
+    return QSettings('Brainwy', 'pyvmmonitor_qt')
+
+
+def get_tuned_viewport_config(settings=None, force=False, **tune_kwargs):
+    '''
+    :param QSettings settings:
+        Where the chosen config is persisted (if not given, the 'Brainwy/pyvmmonitor_qt'
+        user settings are used).
+
+    :param bool force:
+        If True, the candidates are benchmarked again even if a config was already chosen.
+
+    :return ViewportConfig:
+        The config chosen in a previous run (for the same environment) or the fastest config
+        (which is benchmarked and persisted on first use).
+    '''
+    global _tuned_config
+    if _tuned_config is not None and not force:
+        return _tuned_config
+
+    if settings is None:
+        settings = _create_settings()
+
+    environment = _get_environment()
+    config = None
+    if not force and settings.value(SETTINGS_KEY_ENVIRONMENT) == environment:
+        config = ViewportConfig.from_string(settings.value(SETTINGS_KEY_CONFIG))
+        if config is not None and config.use_opengl and not is_opengl_available():
+            config = None
+
+    if config is None:
+        config, _results = tune_viewport_config(**tune_kwargs)
+        settings.setValue(SETTINGS_KEY_CONFIG, config.to_string())
+        settings.setValue(SETTINGS_KEY_ENVIRONMENT, environment)
+        settings.sync()
+
+    _tuned_config = config
+    return config
+
+
+def clear_tuned_viewport_config(settings=None):
+    '''
+    Forgets the chosen config (so, the next call to get_tuned_viewport_config benchmarks again).
+    '''
+    global _tuned_config
+    _tuned_config = None
+    if settings is None:
+        settings = _create_settings()
+    settings.remove(SETTINGS_KEY_CONFIG)
+    settings.remove(SETTINGS_KEY_ENVIRONMENT)
+    settings.sync()
@@ -3,6 +3,8 @@ License: LGPL
 
 Copyright: Brainwy Software Ltda
 '''
+import math
+import weakref
 
 from pyvmmonitor_qt.qt.QtCore import Qt
 from pyvmmonitor_qt.qt.QtWidgets import QGraphicsView
@@ -21,9 +23,13 @@ class ZoomableGraphicsView(QGraphicsView):
     A graphics view which provides zooming by default.
 
     Other properties:
-        - OpenGL enabled if available
+        - OpenGL enabled if available (or the fastest viewport config if VIEWPORT_AUTO_TUNE).
         - Antialiased by default.
         - Keeps center on resize.
+        - Wheel events are coalesced and the zoom is animated (see: ZoomController).
+        - Dragging with the PAN_BUTTON (if set) pans the view with inertia (see: PanController).
+        - With INDEXED_RUBBER_BAND_SELECTION the rubber band selects the items through the spatial
+          index (see: RubberBandSelection).
         - Subclasses can specify a different background mode based on BackgroundMode.
 
     Some notes:
@@ -36,27 +42,72 @@ class ZoomableGraphicsView(QGraphicsView):
 
     BACKGROUND_MODE = BackgroundMode.TILED_TRANSPARENT_BACKGROUND
 
+    # Default tolerance (in screen pixels) used when picking/snapping to items.
+    SNAP_TOLERANCE_IN_PX = 8
+
+    # If False, each wheel event zooms to the next zoom level right away.
+    SMOOTH_ZOOM = True
+
+    # If True, when the drag mode is QGraphicsView.RubberBandDrag the rubber band selects the
+    # items whose positions in the spatial index are inside it (instead of Qt testing the shape of
+    # the items in the rubber band area on each mouse move). Note: items which aren't in the
+    # spatial index aren't selected by the rubber band in this mode.
+    INDEXED_RUBBER_BAND_SELECTION = False
+
+    # The mouse button used to pan the view (i.e.: Qt.MiddleButton). None by default as presses
+    # of that button are taken by the view and not forwarded to the items.
+    PAN_BUTTON = None
+
+    # If True, the viewport config (OpenGL or raster, viewport update mode and item cache mode)
+    # is the fastest one in a benchmark done on first use (see: qt_viewport_tuning).
+    VIEWPORT_AUTO_TUNE = False
+
     def __init__(self, *args, **kwargs):
         from pyvmmonitor_qt.qt.QtWidgets import QGraphicsScene
         from pyvmmonitor_core.callback import Callback
         self.on_zoom = Callback()
         self._old_size = None
 
+        # Items whose representation depends on the zoom (i.e.: sizes in pixels) which are
+        # updated in a single pass when the zoom changes.
+        self._fixed_pixels_items = weakref.WeakSet()
+
         scene = QGraphicsScene()
         QGraphicsView.__init__(self, scene, *args, **kwargs)
         self._scene = scene
 
-        qglwidget = None
-        from pyvmmonitor_qt.qt.QtOpenGL import is_good_opengl_version, create_gl_widget
-        if is_good_opengl_version():
-            qglwidget = create_gl_widget()
-            self.setViewport(qglwidget)
+        # Index with the positions of the custom items (used for picking/snapping/rubber band).
+        from pyvmmonitor_qt.qt_spatial_index import ViewSpatialIndex
+        self._spatial_index = ViewSpatialIndex(self)
+
+        # Only set while dragging the indexed rubber band (see: INDEXED_RUBBER_BAND_SELECTION).
+        self._rubber_band_selection = None
 
-        from pyvmmonitor_qt.qt_utils import set_painter_antialiased
-        set_painter_antialiased(self, True, qglwidget)
+        from pyvmmonitor_qt.qt_level_of_detail import LevelOfDetailPolicy
+        self._level_of_detail_policy = LevelOfDetailPolicy()
+        self._level_of_detail_band = self._level_of_detail_policy.get_band(self.curr_zoom)
+
+        self._qglwidget = None
+        self._viewport_config = None
+        if self.VIEWPORT_AUTO_TUNE:
+            from pyvmmonitor_qt.qt_viewport_tuning import get_tuned_viewport_config
+            self.set_viewport_config(get_tuned_viewport_config())
+        else:
+            from pyvmmonitor_qt.qt_viewport_tuning import get_default_viewport_config
+            self.set_viewport_config(get_default_viewport_config())
 
         self._background_painter = BackgroundPainter(self.BACKGROUND_MODE)
 
+        # Only created when requested (see: get_static_layer).
+        self._static_layer = None
+
+        self._zoom_controller = ZoomController(self)
+        self._pan_controller = PanController(self)
+
+        # Only set when measuring (see: set_frame_time_counter/set_paint_profiler).
+        self._frame_time_counter = None
+        self._paint_profiler = None
+
         # self.setMouseTracking(True) -- enable if we want to receive mouse events
         # even without a click
 
@@ -81,7 +132,80 @@ class ZoomableGraphicsView(QGraphicsView):
 
     @handle_exception_in_method
     def drawBackground(self, painter, rect):
+        profiler = self._paint_profiler
+        if profiler is not None:
+            from pyvmmonitor_qt.qt_animation_clock import get_time
+            start = get_time()
+
         self._background_painter.paint(self, painter, rect)
+        if self._static_layer is not None:
+            self._static_layer.paint(painter, rect)
+
+        if profiler is not None:
+            profiler.add_section_time('drawBackground', get_time() - start)
+
+    @handle_exception_in_method
+    def drawForeground(self, painter, rect):
+        profiler = self._paint_profiler
+        if profiler is not None and profiler.show_hud:
+            profiler.paint_hud(painter, self.viewport().rect())
+
+    def set_viewport_config(self, viewport_config):
+        '''
+        :param pyvmmonitor_qt.qt_viewport_tuning.ViewportConfig viewport_config:
+            The viewport (OpenGL or raster), viewport update mode and item cache mode to be used.
+        '''
+        old_config = self._viewport_config
+        if viewport_config == old_config:
+            return
+        self._viewport_config = viewport_config
+
+        if old_config is None or old_config.use_opengl != viewport_config.use_opengl:
+            qglwidget = None
+            if viewport_config.use_opengl:
+                from pyvmmonitor_qt.qt.QtOpenGL import create_gl_widget
+                qglwidget = create_gl_widget()
+                self.setViewport(qglwidget)
+            elif old_config is not None:
+                # Note: initially the viewport is already a raster QWidget.
+                from pyvmmonitor_qt.qt.QtWidgets import QWidget
+                self.setViewport(QWidget())
+            self._qglwidget = qglwidget
+
+            from pyvmmonitor_qt.qt_utils import set_painter_antialiased
+            set_painter_antialiased(self, self._level_of_detail_band.antialiased, qglwidget)
+
+        self.setViewportUpdateMode(viewport_config.update_mode)
+        if old_config is not None and old_config.cache_mode != viewport_config.cache_mode:
+            self.apply_item_cache_mode(self._scene.items())
+
+    def get_viewport_config(self):
+        '''
+        :rtype: pyvmmonitor_qt.qt_viewport_tuning.ViewportConfig
+        '''
+        return self._viewport_config
+
+    def apply_item_cache_mode(self, items):
+        '''
+        Sets the item cache mode of the viewport config in the given items (called for the custom
+        items from qt_graphics_items when they're created).
+        '''
+        cache_mode = self._viewport_config.cache_mode
+        for item in items:
+            item.setCacheMode(cache_mode)
+
+    def get_static_layer(self):
+        '''
+        :return pyvmmonitor_qt.qt_static_layer.StaticTiledLayer:
+            A layer whose items are rendered in tiles (in worker threads) and composited in
+            the background (only the items in the scene of the view are live).
+
+            Note: the scene rect of the view must also contain the static layer items.
+        '''
+        if self._static_layer is None:
+            from pyvmmonitor_qt.qt_static_layer import StaticTiledLayer
+            self._static_layer = StaticTiledLayer(self)
+        return self._static_layer
 
     @property
     def curr_zoom(self):
@@ -94,12 +218,33 @@ class ZoomableGraphicsView(QGraphicsView):
         self.zoom_to(self.next_zoom_level(self.curr_zoom, 'in'), anchor)
 
     def zoom_to(self, zoom, anchor=ANCHOR_CENTER):
+        # An explicit zoom overrides any zoom animation in progress.
+        self._zoom_controller.stop()
+        self._apply_zoom(zoom, anchor)
+
+    def _apply_zoom(self, zoom, anchor=ANCHOR_CENTER, anchor_points=None):
+        '''
+        :param tuple(QPointF, QPointF) anchor_points:
+            If given, the (viewport point, scene point) so that the scene point is kept at the
+            viewport point after the zoom.
+        '''
         factor = zoom / self.curr_zoom
-        if anchor == self.ANCHOR_MOUSE:
+        if anchor == self.ANCHOR_MOUSE and anchor_points is None:
             self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         else:
             self.setTransformationAnchor(QGraphicsView.AnchorViewCenter)
         self.scale(factor, factor)
+        if anchor_points is not None:
+            viewport_point, scene_point = anchor_points
+            mapped = self.viewportTransform().map(scene_point)
+            h_scroll_bar = self.horizontalScrollBar()
+            v_scroll_bar = self.verticalScrollBar()
+            h_scroll_bar.setValue(
+                h_scroll_bar.value() + int(round(mapped.x() - viewport_point.x())))
+            v_scroll_bar.setValue(
+                v_scroll_bar.value() + int(round(mapped.y() - viewport_point.y())))
+        self._update_level_of_detail()
+        self.update_fixed_pixels_items()
         self.on_zoom(self.transform())
 
     @classmethod
@@ -132,17 +277,227 @@ class ZoomableGraphicsView(QGraphicsView):
         rect = self.sceneRect()
         x, y, width, height = rect.x(), rect.y(), rect.width(), rect.height()
         self.fitInView(x, y, width, height, Qt.KeepAspectRatio)
+        self._update_level_of_detail()
+        self.update_fixed_pixels_items()
         self.on_zoom(self.transform())
 
     def get_scene(self):
         return self._scene
 
+    def get_zoom_controller(self):
+        '''
+        :return ZoomController:
+            The controller which coalesces wheel events and animates the zoom.
+        '''
+        return self._zoom_controller
+
+    def get_pan_controller(self):
+        '''
+        :return PanController:
+            The controller which applies the drag deltas once per frame (with inertia).
+        '''
+        return self._pan_controller
+
+    def set_frame_time_counter(self, frame_time_counter):
+        '''
+        :param pyvmmonitor_qt.qt_animation_clock.FrameTimeCounter frame_time_counter:
+            If given, a frame is added to the counter each time the view is painted (None to stop
+            measuring).
+        '''
+        self._frame_time_counter = frame_time_counter
+
+    def get_frame_time_counter(self):
+        return self._frame_time_counter
+
+    def set_paint_profiler(self, paint_profiler):
+        '''
+        :param pyvmmonitor_qt.qt_paint_profiler.PaintProfiler paint_profiler:
+            If given, the paint of each frame is profiled (None to stop profiling).
+        '''
+        self._paint_profiler = paint_profiler
+        self.viewport().update()
+
+    def get_paint_profiler(self):
+        return self._paint_profiler
+
+    def paintEvent(self, event):
+        if self._qglwidget is not None:
+            from pyvmmonitor_qt.qt_utils import mark_gl_frame_started
+            mark_gl_frame_started(self._qglwidget)
+
+        profiler = self._paint_profiler
+        if profiler is None:
+            ret = QGraphicsView.paintEvent(self, event)
+        else:
+            from pyvmmonitor_qt.qt_paint_profiler import get_region_area
+            profiler.start_frame(get_region_area(event.region()))
+            try:
+                ret = QGraphicsView.paintEvent(self, event)
+            finally:
+                profiler.end_frame()
+
+        if self._frame_time_counter is not None:
+            self._frame_time_counter.add_frame()
+        return ret
+
+    @property
+    def level_of_detail_policy(self):
+        '''
+        :rtype: pyvmmonitor_qt.qt_level_of_detail.LevelOfDetailPolicy
+        '''
+        return self._level_of_detail_policy
+
+    @level_of_detail_policy.setter
+    def level_of_detail_policy(self, level_of_detail_policy):
+        self._level_of_detail_policy = level_of_detail_policy
+        self._update_level_of_detail()
+
+    def get_level_of_detail_band(self):
+        '''
+        :return pyvmmonitor_qt.qt_level_of_detail.LevelOfDetailBand:
+            The band (based on the current zoom) which items should use to paint themselves.
+        '''
+        return self._level_of_detail_band
+
+    def _update_level_of_detail(self):
+        band = self._level_of_detail_policy.get_band(self.curr_zoom)
+        if band != self._level_of_detail_band:
+            old_band = self._level_of_detail_band
+            self._level_of_detail_band = band
+            if band.antialiased != old_band.antialiased:
+                from pyvmmonitor_qt.qt_utils import set_painter_antialiased
+                set_painter_antialiased(self, band.antialiased, self._qglwidget)
+            self.viewport().update()
+
+    def get_spatial_index(self):
+        '''
+        :rtype: pyvmmonitor_qt.qt_spatial_index.ViewSpatialIndex
+        '''
+        return self._spatial_index
+
+    def get_items_near(self, scene_point, tolerance_px=SNAP_TOLERANCE_IN_PX):
+        '''
+        :return list(tuple(float, QGraphicsItem)):
+            The indexed items near the given point (distance in pixels, item) sorted by the
+            distance.
+        '''
+        return self._spatial_index.within_radius(scene_point, tolerance_px)
+
+    def snap_to_items(self, scene_point, tolerance_px=SNAP_TOLERANCE_IN_PX):
+        '''
+        :return tuple(float, float):
+            The position of the indexed item nearest to the given point (or the point itself if
+            there's no item within the given tolerance).
+        '''
+        return self._spatial_index.snap(scene_point, tolerance_px)
+
+    def select_items_in_scene_rect(self, x, y, w, h):
+        '''
+        Selects the (selectable) indexed items whose position is inside the given rect.
+
+        :return list(QGraphicsItem):
+            The items selected.
+        '''
+        from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem
+        selected = []
+        for item in self._spatial_index.in_rect(x, y, w, h):
+            if item.flags() & QGraphicsItem.ItemIsSelectable:
+                item.setSelected(True)
+                selected.append(item)
+        return selected
+
+    def register_fixed_pixels_item(self, item):
+        '''
+        Registers an item which should be updated whenever the zoom changes.
+
+        The item must provide an `_update_with_transform(transform, px_to_scene)` method, where
+        `px_to_scene` is the size in the scene which 1 pixel maps to.
+
+        Note: only a weak-reference to the item is kept.
+        '''
+        self._fixed_pixels_items.add(item)
+
+    def unregister_fixed_pixels_item(self, item):
+        self._fixed_pixels_items.discard(item)
+
+    def update_fixed_pixels_items(self):
+        '''
+        Updates all the registered fixed pixels items based on the current transform (the
+        px->scene scale is computed only once for all the items).
+        '''
+        from pyvmmonitor_qt.qt_transform import calculate_size_for_value_in_px
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+
+        transform = self.transform()
+        px_to_scene = calculate_size_for_value_in_px(transform, 1.0)
+        for item in list(self._fixed_pixels_items):
+            if is_qobject_alive(item):
+                item._update_with_transform(transform, px_to_scene)
+
     @handle_exception_in_method
     def wheelEvent(self, event, anchor=ANCHOR_MOUSE):
-        if event.angleDelta().y() < 0:
-            self.zoom_out(anchor)
-        else:
-            self.zoom_in(anchor)
+        delta = event.angleDelta().y()
+        if not self.SMOOTH_ZOOM:
+            if delta < 0:
+                self.zoom_out(anchor)
+            else:
+                self.zoom_in(anchor)
+            return
+
+        if delta:
+            viewport_point = event.pos() if anchor == self.ANCHOR_MOUSE else None
+            self._zoom_controller.add_wheel_delta(delta, viewport_point)
+
+    @handle_exception_in_method
+    def mousePressEvent(self, event):
+        if self.PAN_BUTTON is not None and event.button() == self.PAN_BUTTON:
+            self._pan_controller.start_drag(event.pos())
+            event.accept()
+            return
+
+        if self.INDEXED_RUBBER_BAND_SELECTION and self.dragMode() == QGraphicsView.RubberBandDrag:
+            # Qt's rubber band is disabled while the press is handled (if no item accepts it, the
+            # indexed rubber band is started).
+            self.setDragMode(QGraphicsView.NoDrag)
+            try:
+                ret = QGraphicsView.mousePressEvent(self, event)
+            finally:
+                self.setDragMode(QGraphicsView.RubberBandDrag)
+            if (not event.isAccepted() and event.button() == Qt.LeftButton and
+                    self.isInteractive()):
+                extend = bool(event.modifiers() & Qt.ControlModifier)
+                self._rubber_band_selection = RubberBandSelection(self, event.pos(), extend)
+                event.accept()
+            return ret
+
+        return QGraphicsView.mousePressEvent(self, event)
+
+    @handle_exception_in_method
+    def mouseMoveEvent(self, event):
+        if self._pan_controller.is_dragging():
+            self._pan_controller.drag_to(event.pos())
+            event.accept()
+            return
+        if self._rubber_band_selection is not None:
+            self._rubber_band_selection.drag_to(event.pos())
+            event.accept()
+            return
+        return QGraphicsView.mouseMoveEvent(self, event)
+
+    @handle_exception_in_method
+    def mouseReleaseEvent(self, event):
+        if self._pan_controller.is_dragging() and event.button() == self.PAN_BUTTON:
+            self._pan_controller.release()
+            event.accept()
+            return
+        if self._rubber_band_selection is not None and event.button() == Qt.LeftButton:
+            rubber_band_selection = self._rubber_band_selection
+            self._rubber_band_selection = None
+            rubber_band_selection.drag_to(event.pos())
+            rubber_band_selection.finish()
+            event.accept()
+            return
+        return QGraphicsView.mouseReleaseEvent(self, event)
 
     @handle_exception_in_method
     def keyPressEvent(self, event):
@@ -156,9 +511,15 @@ class ZoomableGraphicsView(QGraphicsView):
         else:
             return QGraphicsView.keyPressEvent(self, event)
 
+    def _map_to_scene(self, x, y):
+        # Note: mapToScene only accepts ints in newer PyQt5 versions (the inverted viewport
+        # transform is used to keep the fractional part).
+        from pyvmmonitor_qt.qt.QtCore import QPointF
+        return self.viewportTransform().inverted()[0].map(QPointF(x, y))
+
     def get_center(self):
         size = self.size()
-        curr_center = self.mapToScene(size.width() / 2.0, size.height() / 2.0)
+        curr_center = self._map_to_scene(size.width() / 2.0, size.height() / 2.0)
         return curr_center.x(), curr_center.y()
 
     def get_scene_visible_rect(self):
@@ -166,7 +527,7 @@ class ZoomableGraphicsView(QGraphicsView):
         w_and_h = self.mapToScene(size.width(), size.height())
         w_and_h.x(), w_and_h.y()
 
-        x_and_y = self.mapToScene(0.0, 0.0)
+        x_and_y = self.mapToScene(0, 0)
         return x_and_y.x(), x_and_y.y(), w_and_h.x(), w_and_h.y()
 
     @handle_exception_in_method
@@ -176,8 +537,8 @@ class ZoomableGraphicsView(QGraphicsView):
         if self._old_size is not None:
             old_size = self._old_size
             # Get the center before and after
-            c0 = self.mapToScene(old_size[0] / 2.0, old_size[1] / 2.0)
-            c1 = self.mapToScene(new_size[0] / 2.0, new_size[1] / 2.0)
+            c0 = self._map_to_scene(old_size[0] / 2.0, old_size[1] / 2.0)
+            c1 = self._map_to_scene(new_size[0] / 2.0, new_size[1] / 2.0)
 
             diff_x = c1.x() - c0.x()
             diff_y = c1.y() - c0.y()
@@ -189,26 +550,397 @@ class ZoomableGraphicsView(QGraphicsView):
         return QGraphicsView.resizeEvent(self, event)
 
 
+class RubberBandSelection(object):
+    '''
+    The rubber band of a ZoomableGraphicsView with INDEXED_RUBBER_BAND_SELECTION: on each drag the
+    selectable items in the spatial index whose positions are inside the rubber band are selected
+    (and the ones which it selected before which are no longer inside it are unselected).
+    '''
+
+    def __init__(self, view, viewport_point, extend_selection=False):
+        from pyvmmonitor_qt.qt.QtCore import QRect, QSize
+        from pyvmmonitor_qt.qt.QtWidgets import QRubberBand
+
+        self._view = weakref.ref(view)
+        self._origin = viewport_point
+        if extend_selection:
+            self._initial_selection = set(view.scene().selectedItems())
+        else:
+            view.scene().clearSelection()
+            self._initial_selection = set()
+        self._selected = set()
+
+        self._rubber_band = QRubberBand(QRubberBand.Rectangle, view.viewport())
+        self._rubber_band.setGeometry(QRect(viewport_point, QSize()))
+        self._rubber_band.show()
+
+    def get_selected(self):
+        '''
+        :return set(QGraphicsItem):
+            The items selected by the rubber band.
+        '''
+        return self._selected
+
+    def drag_to(self, viewport_point):
+        from pyvmmonitor_qt.qt.QtCore import QRect
+        from pyvmmonitor_qt.qt.QtWidgets import QGraphicsItem
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+
+        view = self._view()
+        if view is None:
+            return
+        rect = QRect(self._origin, viewport_point).normalized()
+        self._rubber_band.setGeometry(rect)
+
+        scene_rect = view.mapToScene(rect).boundingRect()
+        in_rect = set(
+            item for item in view.get_spatial_index().in_rect(
+                scene_rect.x(), scene_rect.y(), scene_rect.width(), scene_rect.height())
+            if item.flags() & QGraphicsItem.ItemIsSelectable)
+
+        for item in self._selected - in_rect - self._initial_selection:
+            if is_qobject_alive(item):
+                item.setSelected(False)
+        for item in in_rect - self._selected:
+            item.setSelected(True)
+        self._selected = in_rect
+
+    def finish(self):
+        self._rubber_band.hide()
+        self._rubber_band.deleteLater()
+        self._rubber_band = None
+
+
+class ZoomController(object):
+    '''
+    Coalesces the wheel events received in a frame (i.e.: touchpads send many events with small
+    deltas) and animates the zoom to the target zoom in the frames of the shared animation clock
+    (so, the view is scaled and `on_zoom` is called at most once per frame).
+
+    A wheel delta of 120 (one step in a regular mouse wheel) goes to the next zoom level (smaller
+    deltas go to a zoom proportionally between the zoom levels).
+    '''
+
+    WHEEL_DELTA_PER_ZOOM_LEVEL = 120.
+
+    # The time for the zoom to get halfway to the target.
+    HALF_LIFE_IN_SECONDS = 0.02
+
+    # When the zoom is closer than this (relative) difference to the target it snaps to it.
+    SNAP_DIFF = 0.005
+
+    def __init__(self, view, clock=None):
+        from pyvmmonitor_qt.qt_animation_clock import get_animation_clock
+        if clock is None:
+            clock = get_animation_clock()
+        self._view = weakref.ref(view)
+        self._clock = clock
+        self._pending_delta = 0
+        self._target_zoom = None
+        self._anchor_points = None
+        self._last_frame_time = None
+
+    def is_animating(self):
+        return self._clock.has_frame_callback(self._on_frame)
+
+    def get_target_zoom(self):
+        '''
+        :return float:
+            The zoom being animated to (or None if there's no animation in progress).
+        '''
+        return self._target_zoom
+
+    def add_wheel_delta(self, delta, viewport_point=None):
+        '''
+        :param int delta:
+            The angle delta of the wheel event (positive to zoom in).
+
+        :param QPoint viewport_point:
+            The point in the viewport to be kept fixed while zooming (if None the center of the
+            view is used).
+        '''
+        view = self._view()
+        if view is None:
+            return
+        self._pending_delta += delta
+        self._set_anchor(view, viewport_point)
+        self._start()
+
+    def animate_to(self, zoom, viewport_point=None):
+        '''
+        Animates the zoom to the given zoom.
+        '''
+        view = self._view()
+        if view is None:
+            return
+        self._pending_delta = 0
+        self._target_zoom = zoom
+        self._set_anchor(view, viewport_point)
+        self._start()
+
+    def _set_anchor(self, view, viewport_point):
+        if viewport_point is None:
+            self._anchor_points = None
+        else:
+            from pyvmmonitor_qt.qt.QtCore import QPointF
+            viewport_point = QPointF(viewport_point)
+            self._anchor_points = (viewport_point, view.mapToScene(viewport_point.toPoint()))
+
+    def stop(self):
+        self._pending_delta = 0
+        self._target_zoom = None
+        self._anchor_points = None
+        self._last_frame_time = None
+        self._clock.remove_frame_callback(self._on_frame)
+
+    def _start(self):
+        if not self.is_animating():
+            self._last_frame_time = None
+            self._clock.add_frame_callback(self._on_frame)
+
+    def _apply_wheel_delta(self, view, zoom, delta):
+        steps = delta / self.WHEEL_DELTA_PER_ZOOM_LEVEL
+        while abs(steps) > 1e-6:
+            step = min(1., abs(steps))
+            next_zoom = view.next_zoom_level(zoom, 'in' if steps > 0 else 'out')
+            if next_zoom == zoom:
+                break  # Can't zoom in/out anymore.
+
+            if abs(next_zoom / zoom - 1.) < 1e-6:
+                # The zoom is already at that level (just with some floating point error).
+                zoom = next_zoom
+                continue
+
+            # Interpolate in log scale between the current zoom and the next zoom level.
+            zoom = zoom * (next_zoom / zoom) ** step
+            steps -= step if steps > 0 else -step
+        return zoom
+
+    def _on_frame(self, frame_time):
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+        view = self._view()
+        if view is None or not is_qobject_alive(view):
+            self.stop()
+            return
+
+        if self._pending_delta:
+            zoom = self._target_zoom if self._target_zoom is not None else view.curr_zoom
+            self._target_zoom = self._apply_wheel_delta(view, zoom, self._pending_delta)
+            self._pending_delta = 0
+
+        target_zoom = self._target_zoom
+        if target_zoom is None:
+            self.stop()
+            return
+
+        if self._last_frame_time is None:
+            elapsed = self._clock.frame_interval_in_ms / 1000.
+        else:
+            elapsed = max(0., frame_time - self._last_frame_time)
+        self._last_frame_time = frame_time
+
+        curr_zoom = view.curr_zoom
+        log_diff = math.log(target_zoom / curr_zoom)
+        alpha = 1. - 0.5 ** (elapsed / self.HALF_LIFE_IN_SECONDS)
+        zoom = curr_zoom * math.exp(log_diff * alpha)
+        done = abs(target_zoom / zoom - 1.) < self.SNAP_DIFF
+        if done:
+            zoom = target_zoom
+
+        view._apply_zoom(zoom, anchor_points=self._anchor_points)
+        if done:
+            self.stop()
+
+
+class PanController(object):
+    '''
+    Pans the view with the mouse: drag deltas are accumulated and applied once per frame of the
+    shared animation clock (instead of on each mouse move) and after the release the view keeps
+    moving with the release velocity (decaying until it stops).
+
+    Panning is done through the scroll bars, so, with a raster viewport QGraphicsView scrolls the
+    contents of the viewport and only repaints the newly exposed areas (with an OpenGL viewport
+    the full viewport is repainted).
+    '''
+
+    # The time for the inertia velocity to decay to half of its value.
+    INERTIA_HALF_LIFE_IN_SECONDS = 0.12
+
+    # The inertia stops when the velocity (in pixels/second) is lower than this value.
+    MIN_INERTIA_VELOCITY = 20.
+
+    # The drag samples in this time window (before the release) are used to compute the
+    # velocity of the inertia.
+    VELOCITY_WINDOW_IN_SECONDS = 0.1
+
+    def __init__(self, view, clock=None):
+        from collections import deque
+        from pyvmmonitor_qt.qt_animation_clock import get_animation_clock
+        if clock is None:
+            clock = get_animation_clock()
+        self._view = weakref.ref(view)
+        self._clock = clock
+        self.inertia = True
+
+        self._dragging = False
+        self._last_drag_pos = None
+        self._drag_samples = deque(maxlen=32)
+
+        # Pending deltas (in viewport pixels) and the fractional part which wasn't applied yet.
+        self._pending_dx = 0.
+        self._pending_dy = 0.
+
+        self._velocity = None
+        self._last_frame_time = None
+
+    def is_dragging(self):
+        return self._dragging
+
+    def is_animating(self):
+        return self._clock.has_frame_callback(self._on_frame)
+
+    def get_velocity(self):
+        '''
+        :return tuple(float, float):
+            The inertia velocity (in pixels/second) or None if there's no inertia in progress.
+        '''
+        return self._velocity
+
+    def start_drag(self, pos, event_time=None):
+        from pyvmmonitor_qt.qt_animation_clock import get_time
+        if event_time is None:
+            event_time = get_time()
+        self.stop()
+        self._dragging = True
+        self._last_drag_pos = (pos.x(), pos.y())
+        self._drag_samples.clear()
+        self._drag_samples.append((event_time, 0., 0.))
+
+    def drag_to(self, pos, event_time=None):
+        '''
+        :param QPoint pos:
+            The new position of the mouse in the viewport.
+
+        :param float event_time:
+            The time of the event (in seconds) -- if not given the current time is used.
+        '''
+        from pyvmmonitor_qt.qt_animation_clock import get_time
+        if not self._dragging:
+            return
+        if event_time is None:
+            event_time = get_time()
+        x, y = pos.x(), pos.y()
+        dx = x - self._last_drag_pos[0]
+        dy = y - self._last_drag_pos[1]
+        self._last_drag_pos = (x, y)
+        self._drag_samples.append((event_time, dx, dy))
+        self.pan_by(dx, dy)
+
+    def release(self, event_time=None):
+        from pyvmmonitor_qt.qt_animation_clock import get_time
+        if not self._dragging:
+            return
+        self._dragging = False
+        if event_time is None:
+            event_time = get_time()
+
+        velocity = None
+        if self.inertia:
+            samples = [
+                sample for sample in self._drag_samples
+                if event_time - sample[0] <= self.VELOCITY_WINDOW_IN_SECONDS]
+            if len(samples) > 1:
+                elapsed = max(event_time - samples[0][0], 1e-3)
+                vx = sum(sample[1] for sample in samples[1:]) / elapsed
+                vy = sum(sample[2] for sample in samples[1:]) / elapsed
+                if math.hypot(vx, vy) >= self.MIN_INERTIA_VELOCITY:
+                    velocity = (vx, vy)
+        self._drag_samples.clear()
+
+        self._velocity = velocity
+        if velocity is not None:
+            self._start()
+
+    def pan_by(self, dx, dy):
+        '''
+        Pans the view by the given delta (in viewport pixels) in the next frame.
+        '''
+        self._pending_dx += dx
+        self._pending_dy += dy
+        self._start()
+
+    def stop(self):
+        self._velocity = None
+        self._pending_dx = 0.
+        self._pending_dy = 0.
+        self._last_frame_time = None
+        self._clock.remove_frame_callback(self._on_frame)
+
+    def _start(self):
+        if not self.is_animating():
+            self._last_frame_time = None
+            self._clock.add_frame_callback(self._on_frame)
+
+    def _on_frame(self, frame_time):
+        from pyvmmonitor_qt.qt_utils import is_qobject_alive
+        view = self._view()
+        if view is None or not is_qobject_alive(view):
+            self.stop()
+            return
+
+        if self._last_frame_time is None:
+            elapsed = self._clock.frame_interval_in_ms / 1000.
+        else:
+            elapsed = max(0., frame_time - self._last_frame_time)
+        self._last_frame_time = frame_time
+
+        velocity = self._velocity
+        if velocity is not None and not self._dragging:
+            self._pending_dx += velocity[0] * elapsed
+            self._pending_dy += velocity[1] * elapsed
+            decay = 0.5 ** (elapsed / self.INERTIA_HALF_LIFE_IN_SECONDS)
+            velocity = (velocity[0] * decay, velocity[1] * decay)
+            if math.hypot(*velocity) < self.MIN_INERTIA_VELOCITY:
+                velocity = None
+            self._velocity = velocity
+
+        # Only whole pixels are scrolled (the remainder is kept for the next frame).
+        dx = int(self._pending_dx)
+        dy = int(self._pending_dy)
+        self._pending_dx -= dx
+        self._pending_dy -= dy
+        if dx or dy:
+            h_scroll_bar = view.horizontalScrollBar()
+            v_scroll_bar = view.verticalScrollBar()
+            old_values = (h_scroll_bar.value(), v_scroll_bar.value())
+            # Dragging the contents to the right means scrolling to the left.
+            h_scroll_bar.setValue(h_scroll_bar.value() - dx)
+            v_scroll_bar.setValue(v_scroll_bar.value() - dy)
+            if self._velocity is not None and old_values == (
+                    h_scroll_bar.value(), v_scroll_bar.value()):
+                self._velocity = None  # Reached the limits of the scene.
+
+        if self._velocity is None and not self._dragging:
+            self.stop()
+        elif self._dragging and not dx and not dy:
+            # Nothing else to do until the mouse moves again.
+            self._clock.remove_frame_callback(self._on_frame)
+
+
 class BackgroundPainter(object):
 
     def __init__(self, background_mode):
-        self._cache = None
-        self._cache_key = None
         self.size = 10
         self.background_mode = background_mode
 
-    def _calculate_background_pixmap(self, rect):
-        from pyvmmonitor_qt.qt_pixmap_widget import create_tiled_pixmap
-        cache_key = rect.x(), rect.y(), rect.width(), rect.height()
-        if self._cache_key == cache_key:
-            return self._cache
-
-        size = self.size
-        p2 = create_tiled_pixmap(rect.width() + (size * 2), rect.height() + (size * 2), 10)
-
-        self._cache = p2
-        self._cache_key = cache_key
-        return p2
+    def _get_background_brush(self, painter):
+        # A single (globally cached) texture brush with one period of the tiled pattern is used
+        # and the brush origin is used to align it (so, it doesn't depend on the viewport
+        # position).
+        from pyvmmonitor_qt.qt_pixmap_widget import create_tiled_brush
+        device = painter.device()
+        device_pixel_ratio = device.devicePixelRatioF() if device is not None else 1.
+        return create_tiled_brush(self.size, device_pixel_ratio=device_pixel_ratio)
 
     def paint(self, graphics_view, painter, rect):
         from pyvmmonitor_qt.qt.QtCore import QRectF
@@ -233,26 +965,14 @@ class BackgroundPainter(object):
                 viewport_rect = QRectF(0, 0, graphics_view.width(), graphics_view.height())
                 clip_rect = s.intersected(viewport_rect)
                 painter.setClipRect(clip_rect)
-                painter.fillRect(s, Qt.white)
-                use_rect = clip_rect
-
-                size = self.size
-                p2 = self._calculate_background_pixmap(use_rect)
-                painter.drawPixmap(
-                    use_rect.x() - ((size * 2) - ((s.x() - use_rect.x()) % (size * 2))),
-                    use_rect.y() - ((size * 2) - ((s.y() - use_rect.y()) % (size * 2))),
-                    p2.width(),
-                    p2.height(),
-                    p2)
-
-    # I thought that the code below would give the same results, but it seems it doesn't
-    #             painter.fillRect(
-    #                 use_rect.x() - ((size * 2) - ((s.x() - use_rect.x()) % (size * 2))),
-    #                 use_rect.y() - ((size * 2) - ((s.y() - use_rect.y()) % (size * 2))),
-    #                 use_rect.width() + (size * 2),
-    #                 use_rect.height() + (size * 2),
-    #                 brush
-    #             )
+
+                # The pattern starts at the top-left of the scene rect (in the viewport).
+                old_brush_origin = painter.brushOrigin()
+                painter.setBrushOrigin(s.topLeft())
+                try:
+                    painter.fillRect(clip_rect, self._get_background_brush(painter))
+                finally:
+                    painter.setBrushOrigin(old_brush_origin)
         finally:
             # Restore the previous transform
             painter.setTransform(curr_transform, False)